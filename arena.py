@@ -0,0 +1,384 @@
+import argparse
+import csv
+import json
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import bitboard
+import reversi
+import reversi_bot
+from bitboard import PASS
+from endgame import final_score
+from pattern_eval import PatternEvaluator
+from probcut import ProbCut
+
+
+def parse_engine(text):
+    '''
+    "minimax", "minimax:depth=4" or "mcts:playouts=200,rollout_batch=32"
+    becomes (name, options). depth sets ReversiBot.max_depth,
+    patterns=FILE loads pattern_eval weights as its evaluator and batch=1
+    turns on its batched frontier; the other options are passed to the
+    bot's constructor.
+    '''
+    name, _, option_text = text.partition(':')
+    if name not in reversi_bot.BOTS:
+        raise ValueError(f'unknown bot {name!r}; expected one of {sorted(reversi_bot.BOTS)}')
+    options = {}
+    for item in filter(None, option_text.split(',')):
+        key, _, value = item.partition('=')
+        options[key] = parse_value(value)
+    return name, options
+
+
+def parse_value(value):
+    for kind in (int, float):
+        try:
+            return kind(value)
+        except ValueError:
+            pass
+    return value
+
+
+def engine_label(engine):
+    name, options = engine
+    if not options:
+        return name
+    return name + ':' + ','.join(f'{key}={value}' for key, value in sorted(options.items()))
+
+
+# Pattern weights and ProbCut models loaded in this process, by file
+_pattern_evaluators = {}
+_probcut_models = {}
+
+
+def make_bot(engine, player):
+    name, options = engine
+    options = dict(options)
+    depth = options.pop('depth', None)
+    patterns = options.pop('patterns', None)
+    batch = options.pop('batch', None)
+    probcut = options.pop('probcut', None)
+    lmr = options.pop('lmr', None)
+    bot = reversi_bot.BOTS[name](player, **options)
+    if depth is not None:
+        bot.max_depth = depth
+    if batch is not None:
+        bot.batch_frontier = bool(batch)
+    if patterns is not None:
+        if patterns not in _pattern_evaluators:
+            _pattern_evaluators[patterns] = PatternEvaluator.load(patterns)
+        bot.evaluator = _pattern_evaluators[patterns]
+    if probcut is not None:
+        if probcut not in _probcut_models:
+            _probcut_models[probcut] = ProbCut.load(probcut)
+        bot.probcut = _probcut_models[probcut]
+    if lmr is not None:
+        bot.lmr = bool(lmr)
+    return bot
+
+
+def random_opening(seed, plies):
+    '''
+    Plays "plies" random legal moves from the empty board (the first four
+    are the center placements) and returns the position and its squares.
+    '''
+    rng = random.Random(seed)
+    state = bitboard.BitboardState(0, 0, 1)
+    squares = []
+    for _ in range(plies):
+        moves = state.valid_moves_mask()
+        if not moves:
+            if state.is_game_over():
+                break
+            state.make_pass()
+            squares.append(PASS)
+            continue
+        square = rng.choice(list(bitboard.iter_bits(moves)))
+        state.make_move(square)
+        squares.append(square)
+    return state, squares
+
+
+def play_game(engine_a, engine_b, a_player, opening_seed, opening_plies, clock=None):
+    '''
+    Plays one game between engine_a (as player a_player) and engine_b from
+    a random opening and returns its record. A player without a legal move
+    passes, and the game ends when neither side can move. With a clock (in
+    seconds per player) bots see it like they would from the server and
+    running out, or playing an illegal move, loses the game.
+    '''
+    state, moves = random_opening(opening_seed, opening_plies)
+    b_player = 3 - a_player
+    bots = {a_player: make_bot(engine_a, a_player), b_player: make_bot(engine_b, b_player)}
+    clocks = {1: clock, 2: clock}
+    think_time = {1: 0.0, 2: 0.0}
+    # Per ply, None for the opening and for passes
+    times = [None] * len(moves)
+    depths = [None] * len(moves)
+    loser = None
+    reason = None
+
+    try:
+        while True:
+            valid = state.valid_moves_mask()
+            if not valid:
+                if state.is_game_over():
+                    break
+                state.make_pass()
+                moves.append(PASS)
+                times.append(None)
+                depths.append(None)
+                continue
+
+            player = state.turn
+            if clock is None:
+                query = state.copy()
+            else:
+                query = reversi.ReversiGameState(state.board, player, len(moves), clocks[1], clocks[2])
+            start = time.perf_counter()
+            move = bots[player].make_move(query)
+            elapsed = time.perf_counter() - start
+            think_time[player] += elapsed
+
+            if clock is not None:
+                clocks[player] -= elapsed
+                if clocks[player] < 0:
+                    loser, reason = player, 'time'
+                    break
+            square = bitboard.move_to_square(move) if move is not None else None
+            if square is None or not valid >> square & 1:
+                loser, reason = player, 'illegal move'
+                break
+            state.make_move(square)
+            moves.append(square)
+            times.append(round(elapsed, 4))
+            depths.append(getattr(bots[player], 'depth_reached', 0))
+    finally:
+        for bot in bots.values():
+            bot.close()
+
+    if loser is not None:
+        winner = 3 - loser
+    else:
+        winner = state.determine_winner()
+    own, opp = state.pieces(a_player)
+    if winner == a_player:
+        result = 1.0
+    elif winner == b_player:
+        result = 0.0
+    else:
+        result = 0.5
+    return {
+        'engine_a': engine_label(engine_a),
+        'engine_b': engine_label(engine_b),
+        'a_player': a_player,
+        'opening_seed': opening_seed,
+        'winner': winner,
+        'result_a': result,
+        'disc_margin_a': final_score(own, opp),
+        'reason': reason,
+        'plies': len(moves),
+        'time_a': round(think_time[a_player], 4),
+        'time_b': round(think_time[b_player], 4),
+        'moves': moves,
+        'times': times,
+        'depths': depths,
+    }
+
+
+def score_to_elo(score):
+    if score <= 0:
+        return -math.inf
+    if score >= 1:
+        return math.inf
+    return -400 * math.log10(1 / score - 1)
+
+
+def elo_to_score(elo):
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+class MatchStats:
+    '''Win/draw/loss totals for engine A with Elo and SPRT estimates.'''
+    def __init__(self):
+        self.wins = 0
+        self.draws = 0
+        self.losses = 0
+
+    def add(self, result_a):
+        if result_a == 1:
+            self.wins += 1
+        elif result_a == 0:
+            self.losses += 1
+        else:
+            self.draws += 1
+
+    def games(self):
+        return self.wins + self.draws + self.losses
+
+    def score(self):
+        return (self.wins + 0.5 * self.draws) / self.games()
+
+    def variance(self):
+        '''Per-game variance of engine A's result.'''
+        n = self.games()
+        s = self.score()
+        return (self.wins * (1 - s) ** 2 + self.draws * (0.5 - s) ** 2 + self.losses * s ** 2) / n
+
+    def elo(self):
+        return score_to_elo(self.score())
+
+    def elo_interval(self, z=1.96):
+        '''Elo difference bounds from a normal approximation of the mean score (95% by default).'''
+        margin = z * math.sqrt(self.variance() / self.games())
+        return score_to_elo(self.score() - margin), score_to_elo(self.score() + margin)
+
+    def llr(self, elo0, elo1):
+        '''
+        Log-likelihood ratio of H1 (difference is elo1) against H0 (elo0),
+        using the normal approximation to the game results.
+        '''
+        n = self.games()
+        score = self.score()
+        variance = self.variance()
+        if variance == 0:
+            # Every result so far is the same; count one virtual draw so
+            # the test can still make progress instead of staying at 0
+            shifted = (n * score + 0.5) / (n + 1)
+            variance = (n * (score - shifted) ** 2 + (0.5 - shifted) ** 2) / (n + 1)
+        s0, s1 = elo_to_score(elo0), elo_to_score(elo1)
+        return n * (s1 - s0) * (2 * score - s0 - s1) / (2 * variance)
+
+    def summary(self):
+        low, high = self.elo_interval()
+        return (f'{self.games()} games, +{self.wins} ={self.draws} -{self.losses}, '
+                f'score {100 * self.score():.1f}%, Elo {self.elo():+.1f} '
+                f'(95% CI {low:+.1f} to {high:+.1f})')
+
+
+class SPRT:
+    '''Sequential probability ratio test of H0: elo = elo0 against H1: elo = elo1.'''
+    def __init__(self, elo0, elo1, alpha=0.05, beta=0.05):
+        self.elo0 = elo0
+        self.elo1 = elo1
+        self.lower = math.log(beta / (1 - alpha))
+        self.upper = math.log((1 - beta) / alpha)
+
+    def decision(self, stats):
+        '''Returns 'H0' or 'H1' once a bound is crossed, otherwise None.'''
+        llr = stats.llr(self.elo0, self.elo1)
+        if llr >= self.upper:
+            return 'H1'
+        if llr <= self.lower:
+            return 'H0'
+        return None
+
+    def summary(self, stats):
+        return (f'SPRT [{self.elo0}, {self.elo1}]: LLR {stats.llr(self.elo0, self.elo1):.2f} '
+                f'({self.lower:.2f}, {self.upper:.2f}) -> {self.decision(stats) or "continue"}')
+
+
+CSV_FIELDS = ['engine_a', 'engine_b', 'a_player', 'opening_seed', 'winner', 'result_a',
+              'disc_margin_a', 'reason', 'plies', 'time_a', 'time_b', 'moves']
+
+
+class ResultWriter:
+    '''Writes one game record per line: CSV if the path ends in .csv, otherwise JSONL.'''
+    def __init__(self, path):
+        self.file = open(path, 'w', newline='')
+        self.csv = None
+        if path.endswith('.csv'):
+            # Per-move times and depths only go to JSONL
+            self.csv = csv.DictWriter(self.file, CSV_FIELDS, extrasaction='ignore')
+            self.csv.writeheader()
+
+    def write(self, record):
+        if self.csv is not None:
+            self.csv.writerow(dict(record, moves=' '.join(map(str, record['moves']))))
+        else:
+            self.file.write(json.dumps(record) + '\n')
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def game_tasks(engine_a, engine_b, games, opening_plies, seed, clock):
+    '''
+    Games come in pairs that share an opening with the colors swapped, so
+    a lopsided opening doesn't favor either engine.
+    '''
+    rng = random.Random(seed)
+    tasks = []
+    while len(tasks) < games:
+        opening_seed = rng.getrandbits(32)
+        for a_player in (1, 2):
+            if len(tasks) < games:
+                tasks.append((engine_a, engine_b, a_player, opening_seed, opening_plies, clock))
+    return tasks
+
+
+def run_match(engine_a, engine_b, games, workers=1, opening_plies=8, seed=0, clock=None,
+              sprt=None, output=None, verbose=False):
+    '''
+    Plays engine_a against engine_b and returns (stats, records). With more
+    than one worker, games run in a process pool. With an SPRT the match
+    stops early once it reaches a decision.
+    '''
+    tasks = game_tasks(engine_a, engine_b, games, opening_plies, seed, clock)
+    stats = MatchStats()
+    records = []
+    writer = ResultWriter(output) if output else None
+
+    def record(result):
+        stats.add(result['result_a'])
+        records.append(result)
+        if writer is not None:
+            writer.write(result)
+        if verbose:
+            print(stats.summary() + (' | ' + sprt.summary(stats) if sprt else ''), flush=True)
+        return sprt is not None and sprt.decision(stats) is not None
+
+    try:
+        if workers <= 1:
+            for task in tasks:
+                if record(play_game(*task)):
+                    break
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(play_game, *task) for task in tasks]
+                for future in as_completed(futures):
+                    if record(future.result()):
+                        for pending in futures:
+                            pending.cancel()
+                        break
+    finally:
+        if writer is not None:
+            writer.close()
+    return stats, records
+
+
+# call: python arena.py minimax:depth=3 mcts:playouts=300 --games 1000 --workers 8 --output games.jsonl
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Play two bots against each other in-process.')
+    parser.add_argument('engine_a', type=parse_engine)
+    parser.add_argument('engine_b', type=parse_engine)
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--opening-plies', type=int, default=8,
+                        help='random plies from the empty board, including the 4 center moves')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--clock', type=float, default=None, help='seconds per player per game')
+    parser.add_argument('--sprt', type=float, nargs=2, metavar=('ELO0', 'ELO1'))
+    parser.add_argument('--output', help='game records, .csv or .jsonl')
+    parser.add_argument('--verbose', action='store_true', help='print the running totals after every game')
+    args = parser.parse_args()
+
+    sprt = SPRT(*args.sprt) if args.sprt else None
+    stats, _ = run_match(args.engine_a, args.engine_b, args.games, args.workers, args.opening_plies,
+                         args.seed, args.clock, sprt, args.output, args.verbose)
+    print(f'{engine_label(args.engine_a)} vs {engine_label(args.engine_b)}: {stats.summary()}')
+    if sprt is not None:
+        print(sprt.summary(stats))
@@ -0,0 +1,169 @@
+import argparse
+import asyncio
+import collections
+import socket
+import time
+import numpy as np
+import parallel
+import reversi
+import reversi_bot
+import protocol
+
+# Bots live in the search pool's worker processes, keyed by game. Every
+# move of a game runs in the same process, so its transposition table and
+# tree last for the game; the bot is dropped when the game ends. The cap
+# only matters if games end without saying so (e.g. a crashed client).
+MAX_WORKER_BOTS = 8
+_worker_bots = collections.OrderedDict()
+
+
+def search_move(game_key, bot_name, player, board, turn, round, t1, t2):
+    '''Runs in the game's worker process: picks a move for one game's state.'''
+    bot = _worker_bots.pop(game_key, None)
+    if bot is None:
+        bot = reversi_bot.BOTS[bot_name](player)
+    _worker_bots[game_key] = bot
+    while len(_worker_bots) > MAX_WORKER_BOTS:
+        _worker_bots.popitem(last=False)
+    return bot.make_move(reversi.ReversiGameState(board, turn, round, t1, t2))
+
+
+def forget_bot(game_key):
+    '''Runs in the game's worker process once the game is over.'''
+    bot = _worker_bots.pop(game_key, None)
+    if bot is not None:
+        bot.close()
+
+
+async def read(reader, messages, parse):
+    '''Receives until parse() returns something other than None.'''
+    result = parse()
+    while result is None:
+        data = await reader.read(4096)
+        if not data:
+            raise ConnectionError('server closed the connection')
+        messages.feed(data)
+        result = parse()
+    return result
+
+
+async def play_game(host, port, bot_name, pool, game_key):
+    '''
+    Plays one game on one connection and returns its result. Our player
+    number comes from the server's greeting. Searches run in the pool
+    (a parallel.SearchPool) process that game_key maps to.
+    '''
+    executor = pool.executor_for(game_key)
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.get_extra_info('socket').setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    messages = protocol.MessageBuffer()
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    moves = 0
+    cells = None
+    try:
+        player = int((await read(reader, messages, messages.next_line)).split()[0])
+        while True:
+            turn, round_num, t1, t2, message_cells = await read(reader, messages, messages.next_message)
+            if turn == protocol.GAME_OVER:
+                break
+            cells = message_cells
+            if turn == player:
+                # Flip is necessary because of the way the server does indexing
+                board = np.flip(cells.reshape(8, 8), 0)
+                move = await loop.run_in_executor(executor, search_move, game_key, bot_name,
+                                                  player, board, turn, round_num, t1, t2)
+                writer.write(protocol.format_move(move))
+                await writer.drain()
+                moves += 1
+
+        winner = None
+        try:
+            winner, _, _, cells = await asyncio.wait_for(read(reader, messages, messages.next_final), 5)
+        except (asyncio.TimeoutError, ConnectionError, ValueError):
+            pass
+    finally:
+        writer.close()
+        executor.submit(forget_bot, game_key)
+
+    result = {
+        'host': host,
+        'port': port,
+        'player': player,
+        'bot': bot_name,
+        'moves': moves,
+        'seconds': round(time.perf_counter() - start, 3),
+        'winner': winner,
+    }
+    if cells is not None:
+        result['discs'] = int(np.count_nonzero(cells == player))
+        result['opponent_discs'] = int(np.count_nonzero(cells == 3 - player))
+    return result
+
+
+async def play_seat(host, port, bot_name, pool, games, reconnect_delay, results):
+    '''
+    Plays "games" games in a row on one seat (None means forever),
+    reconnecting for each new game instead of exiting.
+    '''
+    game = 0
+    while games is None or game < games:
+        try:
+            result = await play_game(host, port, bot_name, pool, (host, port, game))
+        except (ConnectionError, OSError):
+            # The server isn't accepting yet (between games); try again
+            await asyncio.sleep(reconnect_delay)
+            continue
+        results.append(result)
+        print(format_result(result), flush=True)
+        game += 1
+        await asyncio.sleep(reconnect_delay)
+
+
+def format_result(result):
+    outcome = 'unknown'
+    if result['winner'] == result['player']:
+        outcome = 'win'
+    elif result['winner'] == 3 - result['player']:
+        outcome = 'loss'
+    elif result['winner'] == 0:
+        outcome = 'draw'
+    return (f"{result['host']}:{result['port']} player {result['player']} ({result['bot']}): "
+            f"{outcome} {result.get('discs', '?')}-{result.get('opponent_discs', '?')} "
+            f"in {result['moves']} moves, {result['seconds']:.1f}s")
+
+
+async def run(seats, bot_name, games, workers, reconnect_delay=0.5):
+    '''Plays on every (host, port) seat concurrently; returns all game results.'''
+    results = []
+    pool = parallel.SearchPool(workers)
+    try:
+        await asyncio.gather(*(play_seat(host, port, bot_name, pool, games,
+                                         reconnect_delay, results)
+                               for host, port in seats))
+    finally:
+        pool.shutdown()
+    return results
+
+
+def parse_seat(text):
+    '''"host:port", or "host:1" / "host:2" for the usual 3334 / 3335 ports.'''
+    host, _, port = text.rpartition(':')
+    port = int(port)
+    if port in (1, 2):
+        port += 3333
+    return host or 'localhost', port
+
+
+# call: python async_client.py localhost:1 localhost:2 otherhost:4001 --games 10
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Play many Reversi games from one process.')
+    parser.add_argument('seats', nargs='+', type=parse_seat, help='host:port or host:player')
+    parser.add_argument('--bot', choices=sorted(reversi_bot.BOTS), default='minimax')
+    parser.add_argument('--games', type=int, default=None, help='games per seat (default: forever)')
+    parser.add_argument('--workers', type=int, default=None, help='search processes (default: all cores)')
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.seats, args.bot, args.games, args.workers))
+    wins = sum(1 for r in results if r['winner'] == r['player'])
+    print(f'{wins}/{len(results)} games won')
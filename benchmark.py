@@ -0,0 +1,232 @@
+import argparse
+import json
+import platform
+import sys
+import time
+import numpy as np
+import bitboard
+import reversi
+from bitboard import BitboardState, moves_mask, popcount
+from reversi_bot import ReversiBot, MonteCarloReversiBot
+
+INF = float('inf')
+
+# Positions with known leaf counts. A pass counts as a move, and a
+# finished game counts as one leaf at whatever depth it ends.
+# "start" is the usual four-disc start; its counts are the published
+# Othello perft numbers. "empty" is the server's empty board, where the
+# first four moves must fill the center.
+PERFT_POSITIONS = {
+    'start': (BitboardState(0x810000000, 0x1008000000, 1),
+              [4, 12, 56, 244, 1396, 8200, 55092, 390216, 3005288]),
+    'empty': (BitboardState(0, 0, 1),
+              [4, 12, 24, 24, 96, 320, 1536, 6624]),
+}
+
+# Fixed positions for the speed runs: 44, 34 and 24 empty squares
+BENCH_POSITIONS = [
+    BitboardState(0x20400244a1820, 0x8283a58000000, 1),
+    BitboardState(0x1030105860708804, 0x88446a269a000000, 1),
+    BitboardState(0x3039bff060a000, 0xf90684400d140e00, 1),
+]
+
+
+def perft(state, depth):
+    '''Counts the leaves of the game tree under state to the given depth.'''
+    moves = state.valid_moves_mask()
+    if not moves:
+        own, opp = state.pieces(state.turn)
+        if depth == 1 or not moves_mask(opp, own):
+            return 1
+        state.make_pass()
+        total = perft(state, depth - 1)
+        state.make_pass()
+        return total
+    if depth == 1:
+        return popcount(moves)
+    total = 0
+    for square in bitboard.iter_bits(moves):
+        flipped = state.make_move(square)
+        total += perft(state, depth - 1)
+        state.unmake_move(square, flipped)
+    return total
+
+
+def check_perft(max_depth):
+    '''Returns a list of (position, depth, expected, got) for every wrong count.'''
+    failures = []
+    for name, (state, expected) in PERFT_POSITIONS.items():
+        for depth, count in enumerate(expected[:max_depth], 1):
+            got = perft(state.copy(), depth)
+            if got != count:
+                failures.append((name, depth, count, got))
+    return failures
+
+
+def result(value, unit, higher_is_better):
+    return {'value': value, 'unit': unit, 'higher_is_better': higher_is_better}
+
+
+def per_call(fn, calls, repeat=3):
+    '''Best time for one call of fn over a few repeats, in microseconds.'''
+    best = INF
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        best = min(best, time.perf_counter() - start)
+    return result(best / calls * 1e6, 'us/call', False)
+
+
+def bench_perft(depth):
+    state = PERFT_POSITIONS['start'][0].copy()
+    start = time.perf_counter()
+    leaves = perft(state, depth)
+    return result(leaves / (time.perf_counter() - start), 'leaves/s', True)
+
+
+def bench_minimax(depth):
+    '''Nodes per second of a fixed-depth minmax call from each bench position.'''
+    nodes = 0
+    elapsed = 0.0
+    for position in BENCH_POSITIONS:
+        bot = ReversiBot(position.turn)
+        state = position.copy().with_hash()
+        start = time.perf_counter()
+        bot.minmax(state, depth, True, -INF, INF)
+        elapsed += time.perf_counter() - start
+        nodes += bot.nodes
+    return result(nodes / elapsed, 'nodes/s', True)
+
+
+def bench_minimax_time(depth, batch_frontier=False, lmr=False):
+    '''
+    Seconds for a fixed-depth minmax call from each bench position. The
+    batched frontier scores leaves that plain alpha-beta would prune, and
+    late-move reductions skip nodes, so nodes per second can't compare
+    the modes; time to depth can.
+    '''
+    elapsed = 0.0
+    for position in BENCH_POSITIONS:
+        bot = ReversiBot(position.turn)
+        bot.batch_frontier = batch_frontier
+        bot.lmr = lmr
+        state = position.copy().with_hash()
+        start = time.perf_counter()
+        bot.minmax(state, depth, True, -INF, INF)
+        elapsed += time.perf_counter() - start
+    return result(elapsed, 's', False)
+
+
+def bench_playouts(playouts, rollout_batch=None):
+    '''Playouts per second of a MonteCarloReversiBot move from each bench position.'''
+    total = 0
+    elapsed = 0.0
+    for position in BENCH_POSITIONS:
+        bot = MonteCarloReversiBot(position.turn, playouts=playouts, rollout_batch=rollout_batch)
+        start = time.perf_counter()
+        bot.make_move(position.copy())
+        elapsed += time.perf_counter() - start
+        total += bot.mcts.playouts
+    return result(total / elapsed, 'playouts/s', True)
+
+
+def bench_calls(calls):
+    state = BENCH_POSITIONS[1].copy()
+    game_state = state.to_game_state()
+    square = next(bitboard.iter_bits(state.valid_moves_mask()))
+    bot = ReversiBot(state.turn)
+
+    def make_unmake():
+        state.unmake_move(square, state.make_move(square))
+
+    return {
+        'get_valid_moves': per_call(state.get_valid_moves, calls),
+        # Fresh states, so the array board's per-state cache doesn't answer
+        'get_valid_moves_array': per_call(lambda: reversi.ReversiGameState(game_state.board, game_state.turn)
+                                          .get_valid_moves(), max(1, calls // 10)),
+        'apply_move_array': per_call(lambda: reversi.ReversiGameState(game_state.board, game_state.turn)
+                                     .apply_move(bitboard.square_to_move(square)), max(1, calls // 10)),
+        'simulate_move': per_call(lambda: state.play(square), calls),
+        'make_unmake_move': per_call(make_unmake, calls),
+        'evaluate': per_call(lambda: bot.evaluate(state), calls),
+    }
+
+
+def run(quick=False):
+    '''Runs every benchmark and returns {name: result}.'''
+    results = {}
+    results['perft_start'] = bench_perft(6 if quick else 8)
+    results['minimax_nps'] = bench_minimax(3 if quick else 5)
+    results['minimax_seconds'] = bench_minimax_time(3 if quick else 5)
+    results['minimax_frontier_seconds'] = bench_minimax_time(3 if quick else 5, batch_frontier=True)
+    results['minimax_lmr_seconds'] = bench_minimax_time(3 if quick else 5, lmr=True)
+    results['mcts_playouts_per_s'] = bench_playouts(100 if quick else 1000)
+    results['mcts_batch_playouts_per_s'] = bench_playouts(1000 if quick else 10000, rollout_batch=64)
+    results.update(bench_calls(1000 if quick else 20000))
+    return results
+
+
+def compare(results, baseline, tolerance=0.1):
+    '''
+    Compares results against a baseline run. Returns a list of
+    (name, baseline value, value, change, regressed); change is the
+    relative improvement, so negative numbers are slowdowns.
+    '''
+    rows = []
+    for name, current in results.items():
+        if name not in baseline:
+            continue
+        base = baseline[name]['value']
+        value = current['value']
+        if current['higher_is_better']:
+            change = value / base - 1
+        else:
+            change = base / value - 1
+        rows.append((name, base, value, change, change < -tolerance))
+    return rows
+
+
+def metadata():
+    return {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'platform': platform.platform(),
+    }
+
+
+# call: python benchmark.py --output bench.json --baseline baseline.json
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check perft and measure engine speed.')
+    parser.add_argument('--quick', action='store_true', help='smaller runs, for a fast sanity check')
+    parser.add_argument('--perft-depth', type=int, default=None, help='deepest perft depth to check')
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', help='earlier results file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='slowdown allowed before a result counts as a regression')
+    args = parser.parse_args()
+
+    perft_depth = args.perft_depth or (6 if args.quick else 8)
+    failures = check_perft(perft_depth)
+    for name, depth, expected, got in failures:
+        print(f'PERFT MISMATCH {name} depth {depth}: expected {expected}, got {got}')
+    if not failures:
+        print(f'perft ok to depth {perft_depth}')
+
+    results = run(args.quick)
+    for name, item in results.items():
+        print(f"{name:28} {item['value']:14.2f} {item['unit']}")
+    with open(args.output, 'w') as f:
+        json.dump({'meta': metadata(), 'perft_ok': not failures, 'results': results}, f, indent=2)
+
+    regressed = False
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        print(f'\ncompared with {args.baseline}:')
+        for name, base, value, change, slower in compare(results, baseline, args.tolerance):
+            regressed |= slower
+            print(f"{name:28} {base:14.2f} -> {value:14.2f} {100 * change:+7.1f}%{'  REGRESSION' if slower else ''}")
+    sys.exit(1 if failures or regressed else 0)
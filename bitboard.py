@@ -0,0 +1,352 @@
+import random
+import numpy as np
+
+# Square numbering follows the client's numpy board (after the server flip):
+# square = row * 8 + col, so bit 0 is board[0, 0] and bit 63 is board[7, 7].
+FULL = 0xFFFFFFFFFFFFFFFF
+NOT_COL_0 = 0xFEFEFEFEFEFEFEFE
+NOT_COL_7 = 0x7F7F7F7F7F7F7F7F
+
+CENTER = (1 << 27) | (1 << 28) | (1 << 35) | (1 << 36)
+CORNERS = (1 << 0) | (1 << 7) | (1 << 56) | (1 << 63)
+EDGES = 0xFF000000000000FF | 0x0101010101010101 | 0x8080808080808080
+
+PASS = -1 # square of a move list entry or tree node whose player had no legal move
+
+# (shift, mask) pairs. The mask clears squares a shift would wrap onto.
+LEFT_SHIFTS = ((1, NOT_COL_0), (8, FULL), (9, NOT_COL_0), (7, NOT_COL_7))
+RIGHT_SHIFTS = ((1, NOT_COL_7), (8, FULL), (9, NOT_COL_7), (7, NOT_COL_0))
+
+popcount = int.bit_count
+
+# Zobrist keys. PLACE_KEYS[player][square] marks a stone of player on the
+# square; a flip toggles both players' keys at once, so FLIP_KEYS caches
+# their XOR. The generator is seeded so hashes are stable between runs.
+_zobrist_rng = random.Random(0x5EED)
+PLACE_KEYS = (None,
+              [_zobrist_rng.getrandbits(64) for _ in range(64)],
+              [_zobrist_rng.getrandbits(64) for _ in range(64)])
+FLIP_KEYS = [PLACE_KEYS[1][sq] ^ PLACE_KEYS[2][sq] for sq in range(64)]
+SIDE_KEY = _zobrist_rng.getrandbits(64)
+
+
+def iter_bits(mask):
+    '''Yields the square index of every set bit, lowest first.'''
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def square_to_move(square):
+    return divmod(square, 8)
+
+
+def move_to_square(move):
+    return move[0] * 8 + move[1]
+
+
+def moves_mask(own, opp):
+    '''
+    Returns a bitmask of the squares where "own" can play. Until the four
+    center squares are filled the only legal moves are the empty ones among
+    them, matching the server's opening rule.
+    '''
+    occupied = own | opp
+    if occupied & CENTER != CENTER:
+        return CENTER & ~occupied
+
+    empty = ~occupied & FULL
+    moves = 0
+    for shift, mask in LEFT_SHIFTS:
+        m = opp & mask
+        t = (own << shift) & m
+        t |= (t << shift) & m
+        t |= (t << shift) & m
+        t |= (t << shift) & m
+        t |= (t << shift) & m
+        t |= (t << shift) & m
+        moves |= (t << shift) & empty & mask
+    for shift, mask in RIGHT_SHIFTS:
+        m = opp & mask
+        t = (own >> shift) & m
+        t |= (t >> shift) & m
+        t |= (t >> shift) & m
+        t |= (t >> shift) & m
+        t |= (t >> shift) & m
+        t |= (t >> shift) & m
+        moves |= (t >> shift) & empty & mask
+    return moves
+
+
+def flips_mask(square, own, opp):
+    '''Returns the opponent stones flipped when "own" plays on square.'''
+    flipped = 0
+    bit = 1 << square
+    for shift, mask in LEFT_SHIFTS:
+        line = 0
+        x = (bit << shift) & mask
+        while x & opp:
+            line |= x
+            x = (x << shift) & mask
+        if x & own:
+            flipped |= line
+    for shift, mask in RIGHT_SHIFTS:
+        line = 0
+        x = (bit >> shift) & mask
+        while x & opp:
+            line |= x
+            x = (x >> shift) & mask
+        if x & own:
+            flipped |= line
+    return flipped
+
+
+def zobrist_hash(p1, p2, turn):
+    '''Computes the Zobrist hash of a position from scratch.'''
+    key = SIDE_KEY if turn == 2 else 0
+    for sq in iter_bits(p1):
+        key ^= PLACE_KEYS[1][sq]
+    for sq in iter_bits(p2):
+        key ^= PLACE_KEYS[2][sq]
+    return key
+
+
+def board_to_bitboards(board):
+    '''Converts an 8x8 numpy board of 0s, 1s and 2s to (p1, p2) bitmasks.'''
+    cells = np.asarray(board).ravel()
+    p1 = int.from_bytes(np.packbits(cells == 1, bitorder='little').tobytes(), 'little')
+    p2 = int.from_bytes(np.packbits(cells == 2, bitorder='little').tobytes(), 'little')
+    return p1, p2
+
+
+def bitboards_to_board(p1, p2):
+    '''Converts (p1, p2) bitmasks back to an 8x8 numpy board.'''
+    bits1 = np.unpackbits(np.frombuffer(p1.to_bytes(8, 'little'), dtype=np.uint8), bitorder='little')
+    bits2 = np.unpackbits(np.frombuffer(p2.to_bytes(8, 'little'), dtype=np.uint8), bitorder='little')
+    return (bits1.astype(int) + 2 * bits2.astype(int)).reshape(8, 8)
+
+
+# Board symmetries. Flipping the rows reverses the byte order, mirroring the
+# columns reverses the bits of every byte, and the transpose swaps
+# board[r, c] with board[c, r].
+REVERSED_BYTES = bytes(int(f'{b:08b}'[::-1], 2) for b in range(256))
+
+
+def flip_vertical(bits):
+    return int.from_bytes(bits.to_bytes(8, 'little'), 'big')
+
+
+def mirror_horizontal(bits):
+    return int.from_bytes(bits.to_bytes(8, 'little').translate(REVERSED_BYTES), 'little')
+
+
+def transpose(bits):
+    t = 0x0F0F0F0F00000000 & (bits ^ (bits << 28))
+    bits ^= t ^ (t >> 28)
+    t = 0x3333000033330000 & (bits ^ (bits << 14))
+    bits ^= t ^ (t >> 14)
+    t = 0x5500550055005500 & (bits ^ (bits << 7))
+    bits ^= t ^ (t >> 7)
+    return bits
+
+
+def _compose(*transforms):
+    def apply(bits):
+        for transform in transforms:
+            bits = transform(bits)
+        return bits
+    return apply
+
+
+# The 8 symmetries of the square, identity first
+SYMMETRIES = (
+    lambda bits: bits,
+    mirror_horizontal,
+    flip_vertical,
+    _compose(flip_vertical, mirror_horizontal),
+    transpose,
+    _compose(transpose, mirror_horizontal),
+    _compose(transpose, flip_vertical),
+    _compose(transpose, flip_vertical, mirror_horizontal),
+)
+# SYMMETRY_SQUARES[s][sq] is where symmetry s sends square sq, and
+# INVERSE_SQUARES[s] undoes it
+SYMMETRY_SQUARES = tuple(tuple(symmetry(1 << sq).bit_length() - 1 for sq in range(64))
+                         for symmetry in SYMMETRIES)
+INVERSE_SQUARES = tuple(tuple(squares.index(sq) for sq in range(64)) for squares in SYMMETRY_SQUARES)
+
+
+def canonical(own, opp):
+    '''
+    Returns (own, opp, symmetry) for the smallest of the 8 symmetric images
+    of the position, so all of them share one representative.
+    '''
+    best = None
+    for index, symmetry in enumerate(SYMMETRIES):
+        image = (symmetry(own), symmetry(opp), index)
+        if best is None or image[:2] < best[:2]:
+            best = image
+    return best
+
+
+class BitboardState:
+    '''
+    Game state stored as two 64-bit integers, one per player. It offers the
+    same queries as ReversiGameState but every operation is a handful of
+    shifts and masks, so search code can create and discard these cheaply.
+
+    "key" is the Zobrist hash of the position. It is None unless requested
+    with with_hash(); once set, play() keeps it up to date incrementally.
+    '''
+    __slots__ = ('p1', 'p2', 'turn', 'key')
+
+    def __init__(self, p1, p2, turn, key=None):
+        self.p1 = p1
+        self.p2 = p2
+        self.turn = turn
+        self.key = key
+
+    def with_hash(self):
+        return BitboardState(self.p1, self.p2, self.turn, zobrist_hash(self.p1, self.p2, self.turn))
+
+    @classmethod
+    def from_game_state(cls, state):
+        p1, p2 = board_to_bitboards(state.board)
+        return cls(p1, p2, state.turn)
+
+    @classmethod
+    def from_board(cls, board, turn):
+        p1, p2 = board_to_bitboards(board)
+        return cls(p1, p2, turn)
+
+    def to_game_state(self):
+        import reversi # reversi imports the bots, which import this module
+        return reversi.ReversiGameState(bitboards_to_board(self.p1, self.p2), self.turn)
+
+    @property
+    def board(self):
+        return bitboards_to_board(self.p1, self.p2)
+
+    def pieces(self, player):
+        '''Returns (own, opp) bitmasks from the point of view of player.'''
+        if player == 1:
+            return self.p1, self.p2
+        return self.p2, self.p1
+
+    def valid_moves_mask(self):
+        own, opp = self.pieces(self.turn)
+        return moves_mask(own, opp)
+
+    def get_valid_moves(self):
+        return [square_to_move(sq) for sq in iter_bits(self.valid_moves_mask())]
+
+    def copy(self):
+        return BitboardState(self.p1, self.p2, self.turn, self.key)
+
+    def copy_from(self, other):
+        '''Overwrites this state with other's position, in place.'''
+        self.p1 = other.p1
+        self.p2 = other.p2
+        self.turn = other.turn
+        self.key = other.key
+
+    def make_move(self, square):
+        '''
+        Plays square for the player to move, in place, and returns the mask of
+        flipped stones. That mask is the whole undo record: pass it back to
+        unmake_move to restore the position exactly.
+        '''
+        bit = 1 << square
+        turn = self.turn
+        if turn == 1:
+            flipped = flips_mask(square, self.p1, self.p2)
+            self.p1 |= bit | flipped
+            self.p2 ^= flipped
+        else:
+            flipped = flips_mask(square, self.p2, self.p1)
+            self.p2 |= bit | flipped
+            self.p1 ^= flipped
+        self.turn = 3 - turn
+
+        key = self.key
+        if key is not None:
+            key ^= PLACE_KEYS[turn][square] ^ SIDE_KEY
+            for sq in iter_bits(flipped):
+                key ^= FLIP_KEYS[sq]
+            self.key = key
+        return flipped
+
+    def unmake_move(self, square, flipped):
+        '''Takes back the last make_move(square), which returned flipped.'''
+        bit = 1 << square
+        turn = 3 - self.turn
+        if turn == 1:
+            self.p1 ^= bit | flipped
+            self.p2 |= flipped
+        else:
+            self.p2 ^= bit | flipped
+            self.p1 |= flipped
+        self.turn = turn
+
+        key = self.key
+        if key is not None:
+            key ^= PLACE_KEYS[turn][square] ^ SIDE_KEY
+            for sq in iter_bits(flipped):
+                key ^= FLIP_KEYS[sq]
+            self.key = key
+
+    def play(self, square):
+        '''Returns the state after the player to move places on square.'''
+        child = self.copy()
+        child.make_move(square)
+        return child
+
+    def apply_move(self, move):
+        return self.play(move_to_square(move))
+
+    def make_pass(self):
+        '''Hands the turn to the other player in place. Undo by calling it again.'''
+        self.turn = 3 - self.turn
+        if self.key is not None:
+            self.key ^= SIDE_KEY
+
+    def pass_turn(self):
+        key = self.key ^ SIDE_KEY if self.key is not None else None
+        return BitboardState(self.p1, self.p2, 3 - self.turn, key)
+
+    def center_filled(self):
+        return (self.p1 | self.p2) & CENTER == CENTER
+
+    def is_game_over(self):
+        return not moves_mask(self.p1, self.p2) and not moves_mask(self.p2, self.p1)
+
+    def empties(self):
+        return 64 - popcount(self.p1 | self.p2)
+
+    def count(self, player):
+        return popcount(self.p1 if player == 1 else self.p2)
+
+    def determine_winner(self):
+        """
+        Returns 1 if player 1 wins, 2 if player 2 wins, or 0 for a tie.
+        """
+        player1_count = popcount(self.p1)
+        player2_count = popcount(self.p2)
+
+        if player1_count > player2_count:
+            return 1
+        elif player2_count > player1_count:
+            return 2
+        else:
+            return 0
+
+    def get_final_score(self, player):
+        return self.count(player)
+
+
+def as_bitboard(state):
+    '''Accepts either a ReversiGameState or a BitboardState.'''
+    if isinstance(state, BitboardState):
+        return state
+    return BitboardState.from_game_state(state)
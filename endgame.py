@@ -0,0 +1,196 @@
+import time
+import bitboard
+from bitboard import popcount, moves_mask, flips_mask
+from time_manager import SearchTimeout
+from transposition import TranspositionTable, EXACT, LOWER, UPPER
+from move_ordering import SQUARE_WEIGHTS
+
+# The four 4x4 quadrants, used for parity ordering
+QUADRANTS = (0x0F0F0F0F, 0xF0F0F0F0, 0x0F0F0F0F << 32, 0xF0F0F0F0 << 32)
+
+
+def final_score(own, opp):
+    '''
+    Disc differential for "own" at the end of the game. As on the server,
+    the empty squares go to the winner.
+    '''
+    own_count = popcount(own)
+    opp_count = popcount(opp)
+    empties = 64 - own_count - opp_count
+    if own_count > opp_count:
+        return own_count - opp_count + empties
+    if opp_count > own_count:
+        return own_count - opp_count - empties
+    return 0
+
+
+class EndgameSolver:
+    '''
+    Perfect-play search for the last few empty squares. solve() finds the
+    exact final disc differential; solve_wld() only proves win, draw or
+    loss, which is much cheaper because it searches with a (-1, 1) window.
+
+    With many empties moves are tried fastest-first (fewest replies for the
+    opponent); near the end, moves in quadrants with an odd number of empty
+    squares go first. Results are cached in the solver's own small
+    transposition table, separate from the midgame table.
+    '''
+    def __init__(self, tt_size_bits=16, fastest_first_empties=7, hash_empties=6):
+        self.tt = TranspositionTable(tt_size_bits)
+        self.fastest_first_empties = fastest_first_empties
+        self.hash_empties = hash_empties
+        self.deadline = None
+        self.nodes = 0
+        self.elapsed = 0.0
+
+    def nodes_per_second(self):
+        return self.nodes / self.elapsed if self.elapsed > 0 else 0.0
+
+    def solve(self, state, deadline=None):
+        '''Returns (best square, exact disc differential for the player to move).'''
+        return self.search_root(state, -64, 64, deadline)
+
+    def solve_wld(self, state, deadline=None):
+        '''Returns (best square, score) where only the sign of score is exact.'''
+        return self.search_root(state, -1, 1, deadline)
+
+    def search_root(self, state, alpha, beta, deadline):
+        self.deadline = deadline
+        self.nodes = 0
+        self.tt.new_search()
+        start = time.perf_counter()
+        board = state.copy() if state.key is not None else state.with_hash()
+        try:
+            own, opp = board.pieces(board.turn)
+            moves = moves_mask(own, opp)
+            if not moves:
+                return None, self.search(board, alpha, beta)
+
+            best_square = None
+            best_value = -65
+            for i, square in enumerate(self.order(board, moves)):
+                flipped = board.make_move(square)
+                if i == 0:
+                    value = -self.search(board, -beta, -alpha)
+                else:
+                    value = -self.search(board, -alpha - 1, -alpha)
+                    if alpha < value < beta:
+                        value = -self.search(board, -beta, -value)
+                board.unmake_move(square, flipped)
+
+                if value > best_value:
+                    best_value = value
+                    best_square = square
+                    if value > alpha:
+                        alpha = value
+                        if alpha >= beta:
+                            break
+            return best_square, best_value
+        finally:
+            self.elapsed = time.perf_counter() - start
+            self.deadline = None
+
+    def search(self, board, alpha, beta):
+        self.nodes += 1
+        if self.deadline is not None and self.nodes & 1023 == 0 \
+                and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+
+        own, opp = board.pieces(board.turn)
+        empty = ~(own | opp) & bitboard.FULL
+
+        # With one square left there is nothing to order or cache
+        if empty & (empty - 1) == 0 and empty:
+            return self.last_square(own, opp, empty.bit_length() - 1)
+
+        moves = moves_mask(own, opp)
+        if not moves:
+            if not moves_mask(opp, own):
+                return final_score(own, opp)
+            board.make_pass()
+            value = -self.search(board, -beta, -alpha)
+            board.make_pass()
+            return value
+
+        empties = popcount(empty)
+        use_hash = empties >= self.hash_empties
+        alpha_orig = alpha
+        hash_square = None
+        if use_hash:
+            entry = self.tt.probe(board.key)
+            if entry is not None:
+                _, bound, score, hash_square, _ = entry
+                if bound == EXACT:
+                    return score
+                if bound == LOWER:
+                    alpha = max(alpha, score)
+                else:
+                    beta = min(beta, score)
+                if alpha >= beta:
+                    return score
+
+        best_value = -65
+        best_square = None
+        for i, square in enumerate(self.order(board, moves, hash_square, empty)):
+            flipped = board.make_move(square)
+            if i == 0:
+                value = -self.search(board, -beta, -alpha)
+            else:
+                value = -self.search(board, -alpha - 1, -alpha)
+                if alpha < value < beta:
+                    value = -self.search(board, -beta, -value)
+            board.unmake_move(square, flipped)
+
+            if value > best_value:
+                best_value = value
+                best_square = square
+                if value > alpha:
+                    alpha = value
+                    if alpha >= beta:
+                        break
+
+        if use_hash:
+            if best_value <= alpha_orig:
+                bound = UPPER
+            elif best_value >= beta:
+                bound = LOWER
+            else:
+                bound = EXACT
+            self.tt.store(board.key, empties, bound, best_value, best_square)
+        return best_value
+
+    def last_square(self, own, opp, square):
+        '''Final score when exactly one empty square is left.'''
+        flipped = flips_mask(square, own, opp)
+        if flipped:
+            return final_score(own | flipped | (1 << square), opp & ~flipped)
+        flipped = flips_mask(square, opp, own)
+        if flipped:
+            return final_score(own & ~flipped, opp | flipped | (1 << square))
+        return final_score(own, opp)
+
+    def order(self, board, moves, hash_square=None, empty=None):
+        if empty is None:
+            empty = ~(board.p1 | board.p2) & bitboard.FULL
+        squares = list(bitboard.iter_bits(moves))
+        if len(squares) < 2:
+            return squares
+
+        if popcount(empty) > self.fastest_first_empties:
+            # Fastest first: fewest replies for the opponent, then square weight
+            scored = []
+            for square in squares:
+                flipped = board.make_move(square)
+                replies = popcount(board.valid_moves_mask())
+                board.unmake_move(square, flipped)
+                scored.append((square != hash_square, replies, -SQUARE_WEIGHTS[square], square))
+        else:
+            # Parity: squares in quadrants with an odd number of empties first
+            odd = 0
+            for quadrant in QUADRANTS:
+                if popcount(empty & quadrant) & 1:
+                    odd |= quadrant
+            scored = [(square != hash_square, not odd >> square & 1, -SQUARE_WEIGHTS[square], square)
+                      for square in squares]
+        scored.sort()
+        return [entry[-1] for entry in scored]
@@ -0,0 +1,93 @@
+import numpy as np
+import bitboard
+import batch_rollout
+from bitboard import popcount
+
+# Square weights that reproduce the original hand-written evaluation: one
+# point per disc, ten more for an edge square and seventy more for a corner
+# (fifty as a corner plus ten for each of its two edges). Row-major in the
+# client's board orientation.
+DEFAULT_WEIGHTS = (
+    71, 11, 11, 11, 11, 11, 11, 71,
+    11,  1,  1,  1,  1,  1,  1, 11,
+    11,  1,  1,  1,  1,  1,  1, 11,
+    11,  1,  1,  1,  1,  1,  1, 11,
+    11,  1,  1,  1,  1,  1,  1, 11,
+    11,  1,  1,  1,  1,  1,  1, 11,
+    11,  1,  1,  1,  1,  1,  1, 11,
+    71, 11, 11, 11, 11, 11, 11, 71,
+)
+
+
+def byte_tables(weights):
+    '''
+    Precomputes, for each board row and each of the 256 ways that row can be
+    occupied, the sum of the occupied squares' weights. Entry row * 256 + b
+    belongs to row "row" with occupancy byte b.
+    '''
+    tables = []
+    for row in range(8):
+        for occupancy in range(256):
+            tables.append(sum(weights[row * 8 + col] for col in range(8) if occupancy >> col & 1))
+    return tables
+
+
+class Evaluator:
+    '''
+    Interface for static evaluation. evaluate() scores a position for the
+    player owning "own"; own_moves is that player's move mask if the
+    caller already generated it, so it isn't generated twice.
+    '''
+    def evaluate(self, own, opp, own_moves=None):
+        raise NotImplementedError
+
+    def evaluate_many(self, own, opp):
+        '''
+        Scores uint64 arrays of positions with the center filled, returning
+        an array of values. This default calls evaluate on each one;
+        evaluators with vectorized code override it.
+        '''
+        return np.array([self.evaluate(int(o), int(p)) for o, p in zip(own, opp)])
+
+
+class WeightedEvaluator(Evaluator):
+    '''
+    Square-weight table plus a mobility term. The table is summed eight
+    squares at a time through precomputed per-row lookups, so the
+    positional and material part costs sixteen list lookups and the only
+    move generation is the opponent's.
+    '''
+    def __init__(self, square_weights=DEFAULT_WEIGHTS, mobility_weight=5):
+        self.square_weights = tuple(square_weights)
+        self.mobility_weight = mobility_weight
+        self.tables = byte_tables(self.square_weights)
+        self.weight_vector = np.array(self.square_weights, dtype=np.int64)
+
+    def positional(self, bits):
+        t = self.tables
+        return (t[bits & 255] + t[256 + (bits >> 8 & 255)] +
+                t[512 + (bits >> 16 & 255)] + t[768 + (bits >> 24 & 255)] +
+                t[1024 + (bits >> 32 & 255)] + t[1280 + (bits >> 40 & 255)] +
+                t[1536 + (bits >> 48 & 255)] + t[1792 + (bits >> 56)])
+
+    def evaluate(self, own, opp, own_moves=None):
+        if own_moves is None:
+            own_moves = bitboard.moves_mask(own, opp)
+        opp_moves = bitboard.moves_mask(opp, own)
+        score = self.positional(own) - self.positional(opp)
+        score += (popcount(own_moves) - popcount(opp_moves)) * self.mobility_weight
+        return score
+
+    def evaluate_many(self, own, opp):
+        '''
+        The same score for arrays of positions: both sides' squares are
+        unpacked into one (2N, 64) matrix and multiplied by the weights, and
+        both sides' mobility comes from one vectorized moves_mask call.
+        '''
+        n = len(own)
+        sides = np.concatenate([own, opp]).astype('<u8')
+        others = np.concatenate([opp, own]).astype('<u8')
+        mobility = batch_rollout.popcount(batch_rollout.moves_mask(sides, others))
+        squares = np.unpackbits(sides.view(np.uint8).reshape(-1, 8), axis=1, bitorder='little')
+        positional = squares @ self.weight_vector
+        return positional[:n] - positional[n:] + (mobility[:n] - mobility[n:]) * self.mobility_weight
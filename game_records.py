@@ -0,0 +1,299 @@
+import argparse
+import json
+import math
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import numpy as np
+import bitboard
+import opening_book
+import reversi
+from bitboard import BitboardState, PASS
+from reversi_bot import ReversiBot, INF
+
+# Record file: a header, then every game as a fixed-size game header, its
+# squares (PASS included) as int8 and, if the flags say so, one float32
+# time and one uint8 search depth per ply. Unknown times are NaN and
+# unknown depths 0. Games are read back one at a time.
+MAGIC = b'RVGR'
+VERSION = 1
+HEADER = np.dtype([('magic', 'S4'), ('version', '<u4')])
+GAME = np.dtype([('plies', '<u2'), ('winner', 'i1'), ('player', 'u1'), ('flags', 'u1')])
+HAS_TIMES = 1
+HAS_DEPTHS = 2
+
+# Game phases by the number of discs on the board before the move
+PHASES = (('opening', 20), ('midgame', 44), ('endgame', 65))
+PHASE_OF_DISCS = tuple(next(name for name, limit in PHASES if discs < limit) for discs in range(65))
+
+
+class GameRecord:
+    '''
+    One game as a move list. squares holds every ply in order, PASS where
+    the player to move had no move. winner is 1, 2 or 0 for a draw.
+    player is the side whose client recorded the game, or 0 if it was
+    recorded from outside. times and depths are per ply, with None where
+    unknown, or None as a whole.
+    '''
+    def __init__(self, squares, winner, player=0, times=None, depths=None):
+        self.squares = squares
+        self.winner = winner
+        self.player = player
+        self.times = times
+        self.depths = depths
+
+
+def normalize(moves):
+    '''
+    Turns (player, square) pairs, as opening_book reads them, into squares
+    with every pass written out, and returns them with the final state.
+    Like opening_book.replay, the game is cut short at an illegal move.
+    '''
+    state = BitboardState(0, 0, 1)
+    squares = []
+    for player, square in moves:
+        if square == PASS:
+            continue
+        if player != state.turn:
+            squares.append(PASS)
+            state.make_pass()
+        if not state.valid_moves_mask() >> square & 1:
+            break
+        squares.append(square)
+        state.make_move(square)
+    return squares, state
+
+
+def read_game_log_records(lines):
+    '''Yields a GameRecord for every game in a server GameLog, which has no times.'''
+    for moves in opening_book.read_game_log(lines):
+        squares, final = normalize(moves)
+        yield GameRecord(squares, final.determine_winner())
+
+
+def read_jsonl_records(lines):
+    '''Yields a GameRecord for every line of arena, headless server or client records.'''
+    for line in lines:
+        if not line.strip():
+            continue
+        data = json.loads(line)
+        yield GameRecord(data['moves'], data['winner'], data.get('player', 0),
+                         data.get('times'), data.get('depths'))
+
+
+def read_records(path):
+    '''Yields the GameRecords of a record file, one game at a time.'''
+    with open(path, 'rb') as f:
+        header = np.frombuffer(f.read(HEADER.itemsize), dtype=HEADER)
+        if len(header) != 1 or header[0]['magic'] != MAGIC or header[0]['version'] != VERSION:
+            raise ValueError(f'{path} is not a version {VERSION} game record file')
+        while True:
+            data = f.read(GAME.itemsize)
+            if not data:
+                return
+            game = np.frombuffer(data, dtype=GAME)[0]
+            plies = int(game['plies'])
+            squares = np.frombuffer(f.read(plies), dtype=np.int8).tolist()
+            times = depths = None
+            if game['flags'] & HAS_TIMES:
+                times = [None if math.isnan(t) else t
+                         for t in np.frombuffer(f.read(4 * plies), dtype='<f4').tolist()]
+            if game['flags'] & HAS_DEPTHS:
+                depths = [d or None for d in np.frombuffer(f.read(plies), dtype=np.uint8).tolist()]
+            yield GameRecord(squares, int(game['winner']), int(game['player']), times, depths)
+
+
+def iter_records(paths):
+    '''
+    Streams the games of record files (.bin), JSONL records (.jsonl) and
+    server GameLogs (anything else), in order.
+    '''
+    for path in paths:
+        if path.endswith('.bin'):
+            yield from read_records(path)
+            continue
+        with open(path) as f:
+            reader = read_jsonl_records if path.endswith('.jsonl') else read_game_log_records
+            yield from reader(f)
+
+
+class RecordWriter:
+    '''Appends GameRecords to a new record file.'''
+    def __init__(self, path):
+        self.file = open(path, 'wb')
+        self.file.write(np.array([(MAGIC, VERSION)], dtype=HEADER).tobytes())
+        self.games = 0
+
+    def write(self, record):
+        flags = (HAS_TIMES if record.times is not None else 0) | \
+            (HAS_DEPTHS if record.depths is not None else 0)
+        game = np.array([(len(record.squares), record.winner, record.player, flags)], dtype=GAME)
+        self.file.write(game.tobytes())
+        self.file.write(np.array(record.squares, dtype=np.int8).tobytes())
+        if record.times is not None:
+            times = [math.nan if t is None else t for t in record.times]
+            self.file.write(np.array(times, dtype='<f4').tobytes())
+        if record.depths is not None:
+            depths = [d or 0 for d in record.depths]
+            self.file.write(np.array(depths, dtype=np.uint8).tobytes())
+        self.games += 1
+
+    def close(self):
+        self.file.close()
+
+
+def analyze_game(squares, depth=4, evaluator=None):
+    '''
+    Replays a game with ReversiGameState and searches every position after
+    the opening that had a choice of moves. Returns one row per move:
+    (ply, player, discs, square, best_square, loss), where loss is how
+    much worse the played move scored than the best one in a depth-ply
+    search (both None for positions that weren't searched).
+    '''
+    bot = ReversiBot(1, tt_size_bits=16, evaluator=evaluator)
+    state = reversi.ReversiGameState(np.zeros((8, 8), dtype=int), 1)
+    rows = []
+    for ply, square in enumerate(squares):
+        if square == PASS:
+            state = reversi.ReversiGameState(state.board, 3 - state.turn)
+            continue
+        move = bitboard.square_to_move(square)
+        valid = state.get_valid_moves()
+        if move not in valid:
+            break
+        position = bitboard.as_bitboard(state).with_hash()
+        discs = 64 - position.empties()
+        best_square = loss = None
+        if position.center_filled() and len(valid) > 1:
+            bot.tt.new_search()
+            best_move, best_value = bot.search_root(position, bot.order_root_moves(position), depth - 1)
+            played_value = -bot.negamax(position.play(square), depth - 1, -INF, INF)
+            best_square = bitboard.move_to_square(best_move)
+            loss = max(best_value - played_value, 0)
+        rows.append((ply, state.turn, discs, square, best_square, loss))
+        state = state.apply_move(move)
+    return rows
+
+
+def analyze(records, depth=4, workers=1, evaluator=None):
+    '''
+    Yields (index, record, rows) for every record, searched with
+    analyze_game in a pool of "workers" processes. Only a few games per
+    worker are in flight at once, so records can be streamed from disk;
+    with more than one worker they come back in the order they finish.
+    '''
+    if workers <= 1:
+        for index, record in enumerate(records):
+            yield index, record, analyze_game(record.squares, depth, evaluator)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = {}
+        for index, record in enumerate(records):
+            pending[executor.submit(analyze_game, record.squares, depth, evaluator)] = (index, record)
+            if len(pending) >= 4 * workers:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future) + (future.result(),)
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future) + (future.result(),)
+
+
+class PhaseReport:
+    '''
+    Per-phase totals of analyzed games: moves, thinking time, search depth,
+    blunders and the evaluation lost to them. A game recorded by a client
+    only counts that client's moves; other games count both sides'.
+    '''
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.games = 0
+        self.totals = {name: dict.fromkeys(('moves', 'searched', 'timed', 'seconds', 'deep', 'depth',
+                                            'blunders', 'loss'), 0) for name, _ in PHASES}
+
+    def add(self, index, record, rows):
+        '''Adds one game's rows and returns its blunders.'''
+        self.games += 1
+        blunders = []
+        for ply, player, discs, square, best_square, loss in rows:
+            if record.player and player != record.player:
+                continue
+            phase = PHASE_OF_DISCS[discs]
+            totals = self.totals[phase]
+            totals['moves'] += 1
+            if record.times is not None and record.times[ply] is not None:
+                totals['timed'] += 1
+                totals['seconds'] += record.times[ply]
+            if record.depths is not None and record.depths[ply]:
+                totals['deep'] += 1
+                totals['depth'] += record.depths[ply]
+            if loss is None:
+                continue
+            totals['searched'] += 1
+            totals['loss'] += loss
+            if loss >= self.threshold:
+                totals['blunders'] += 1
+                blunders.append({'game': index, 'ply': ply, 'player': player, 'phase': phase,
+                                 'move': list(bitboard.square_to_move(square)),
+                                 'best': list(bitboard.square_to_move(best_square)),
+                                 'loss': round(float(loss), 2)})
+        return blunders
+
+    def summary(self):
+        total_seconds = sum(totals['seconds'] for totals in self.totals.values())
+        lines = [f'{self.games} games']
+        for name, _ in PHASES:
+            totals = self.totals[name]
+            if not totals['moves']:
+                continue
+            line = f"{name}: {totals['moves']} moves"
+            if totals['timed']:
+                share = totals['seconds'] / total_seconds if total_seconds else 0.0
+                line += (f", {totals['seconds']:.1f}s ({100 * share:.0f}% of the time, "
+                         f"{totals['seconds'] / totals['timed']:.3f}s per move)")
+            if totals['deep']:
+                line += f", depth {totals['depth'] / totals['deep']:.1f}"
+            if totals['searched']:
+                line += (f", {totals['blunders']} blunders "
+                         f"({100 * totals['blunders'] / totals['searched']:.1f}%), "
+                         f"mean loss {totals['loss'] / totals['searched']:.1f}")
+            lines.append(line)
+        return '\n'.join(lines)
+
+
+# call: python game_records.py convert games.bin Reversi/ReversiServer/GameLog.txt games.jsonl
+#       python game_records.py analyze games.bin --depth 4 --workers 8 --blunders blunders.jsonl
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Convert and analyze game records.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    convert = commands.add_parser('convert', help='write records to the binary move-list format')
+    convert.add_argument('output')
+    convert.add_argument('records', nargs='+', help='server GameLog files, .jsonl records or .bin files')
+    study = commands.add_parser('analyze', help='search every position and report blunders and time use')
+    study.add_argument('records', nargs='+', help='server GameLog files, .jsonl records or .bin files')
+    study.add_argument('--depth', type=int, default=4, help='plies searched from every position')
+    study.add_argument('--workers', type=int, default=1)
+    study.add_argument('--threshold', type=float, default=100.0,
+                       help='evaluation lost by a move for it to count as a blunder')
+    study.add_argument('--patterns', help='pattern_eval weights to search with')
+    study.add_argument('--blunders', help='JSONL file for every blunder found')
+    args = parser.parse_args()
+
+    if args.command == 'convert':
+        writer = RecordWriter(args.output)
+        for record in iter_records(args.records):
+            writer.write(record)
+        writer.close()
+        print(f'{writer.games} games written to {args.output}')
+    else:
+        from pattern_eval import PatternEvaluator
+        evaluator = PatternEvaluator.load(args.patterns) if args.patterns else None
+        report = PhaseReport(args.threshold)
+        output = open(args.blunders, 'w') if args.blunders else None
+        for index, record, rows in analyze(iter_records(args.records), args.depth, args.workers, evaluator):
+            for blunder in report.add(index, record, rows):
+                if output is not None:
+                    output.write(json.dumps(blunder) + '\n')
+        if output is not None:
+            output.close()
+        print(report.summary())
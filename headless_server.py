@@ -0,0 +1,324 @@
+import argparse
+import asyncio
+import functools
+import json
+import os
+import socket
+import sys
+import time
+import numpy as np
+import async_client
+import parallel
+import protocol
+import reversi_bot
+from bitboard import BitboardState, PASS
+
+TIE = -1 # the winner the Java server reports for a drawn game
+CLIENT_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'reversi_python_client.py')
+
+
+def server_cells(state):
+    '''The 64 cells of state in the server's row order, as sent on the wire.'''
+    return np.flip(state.board, 0).ravel()
+
+
+def format_minutes(minutes):
+    return str(int(minutes)) if minutes == int(minutes) else str(minutes)
+
+
+class HeadlessGame:
+    '''
+    One game played the way Reversi.java plays it, without the window:
+    player N connects to its own listening socket and is greeted with
+    "N minutes". The player to move is sent the state and re-sent it until
+    it answers with a legal move, every move is followed by an update to
+    both players, a player with no move is skipped silently and two skips
+    in a row end the game. The game then ends with -999 and the final
+    board, the empty squares going to the winner.
+
+    Unlike the Java server, the clock is enforced while a player thinks: a
+    player that runs out of time loses at once instead of whenever it
+    finally answers. Either way the loser's discs are taken off the board.
+    Ports of 0 pick free ephemeral ports, so many games can run at once.
+    '''
+    def __init__(self, minutes=5.0, host='127.0.0.1', ports=(0, 0), connect_timeout=30.0):
+        self.minutes = minutes
+        self.host = host
+        self.requested_ports = ports
+        self.connect_timeout = connect_timeout
+        self.ports = None
+        self.servers = []
+        self.connections = {} # player -> future of (reader, writer)
+        self.messages = {}
+        self.invalid_moves = 0
+
+    async def open(self):
+        '''Starts listening for both players and returns their ports.'''
+        loop = asyncio.get_running_loop()
+        self.ports = []
+        for player, port in zip((1, 2), self.requested_ports):
+            connected = loop.create_future()
+            self.connections[player] = connected
+            server = await asyncio.start_server(functools.partial(self.accept, connected), self.host, port)
+            self.servers.append(server)
+            self.ports.append(server.sockets[0].getsockname()[1])
+        return self.ports
+
+    async def accept(self, connected, reader, writer):
+        if connected.done():
+            # The seat is taken
+            writer.close()
+            return
+        writer.get_extra_info('socket').setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        connected.set_result((reader, writer))
+
+    def close(self):
+        for server in self.servers:
+            server.close()
+        self.servers = []
+        for connected in self.connections.values():
+            if connected.done() and not connected.cancelled():
+                connected.result()[1].close()
+
+    async def play(self):
+        '''Plays the game once both players connect and returns its record.'''
+        if self.ports is None:
+            await self.open()
+        try:
+            await asyncio.wait_for(asyncio.gather(*self.connections.values()), self.connect_timeout)
+        finally:
+            # One game per pair of sockets
+            for server in self.servers:
+                server.close()
+        try:
+            return await self.run()
+        finally:
+            self.close()
+
+    async def run(self):
+        start = time.perf_counter()
+        readers = {player: connected.result()[0] for player, connected in self.connections.items()}
+        writers = {player: connected.result()[1] for player, connected in self.connections.items()}
+        self.messages = {player: protocol.MessageBuffer() for player in (1, 2)}
+        for player in (1, 2):
+            writers[player].write(f'{player} {format_minutes(self.minutes)}\n'.encode('ascii'))
+
+        state = BitboardState(0, 0, 1)
+        clocks = {1: self.minutes * 60.0, 2: self.minutes * 60.0}
+        round_num = 0
+        moves = []
+        times = [] # seconds per ply, None for passes
+        loser = reason = None
+        while not state.is_game_over():
+            player = state.turn
+            valid = state.valid_moves_mask()
+            if not valid:
+                moves.append(PASS)
+                times.append(None)
+                state.make_pass()
+                continue
+
+            started = time.perf_counter()
+            try:
+                square = await asyncio.wait_for(
+                    self.take_turn(player, readers[player], writers[player], state, round_num, clocks, valid),
+                    max(clocks[player], 0.0))
+            except asyncio.TimeoutError:
+                square, reason = None, 'time'
+            except (ConnectionError, OSError):
+                square, reason = None, 'disconnected'
+            elapsed = time.perf_counter() - started
+            clocks[player] -= elapsed
+            if square is None or clocks[player] <= 0:
+                loser, reason = player, reason or 'time'
+                break
+
+            state.make_move(square)
+            moves.append(square)
+            times.append(round(elapsed, 4))
+            round_num += 1
+            # Like Java's Player.update, the turn field is 1 - the receiver
+            # (0 for player 1, -1 for player 2), never the player to move
+            for receiver, writer in writers.items():
+                writer.write(protocol.format_message((1 - receiver, round_num, clocks[1], clocks[2]),
+                                                     server_cells(state)))
+
+        winner, final = self.final_board(state, loser, clocks)
+        finale = protocol.format_message((winner, clocks[1], clocks[2]), server_cells(final))
+        for writer in writers.values():
+            try:
+                writer.write(f'{protocol.GAME_OVER}\n'.encode('ascii') + finale)
+                await writer.drain()
+            except (ConnectionError, OSError):
+                pass
+
+        return {
+            'ports': self.ports,
+            'winner': 0 if winner == TIE else winner,
+            'reason': reason,
+            'discs': [final.count(1), final.count(2)],
+            'plies': len(moves),
+            'clocks': [round(clocks[1], 4), round(clocks[2], 4)],
+            'invalid_moves': self.invalid_moves,
+            'seconds': round(time.perf_counter() - start, 4),
+            'moves': moves,
+            'times': times,
+        }
+
+    async def take_turn(self, player, reader, writer, state, round_num, clocks, valid):
+        '''Sends player the state until it answers with a legal move; returns the square.'''
+        message = protocol.format_message((player, round_num, clocks[1], clocks[2]), server_cells(state))
+        messages = self.messages[player]
+        while True:
+            writer.write(message)
+            await writer.drain()
+            row = await async_client.read(reader, messages, messages.next_line)
+            col = await async_client.read(reader, messages, messages.next_line)
+            try:
+                row, col = int(row), int(col)
+            except ValueError:
+                row = col = -1
+            # The client sends rows in the server's order
+            if 0 <= row < 8 and 0 <= col < 8 and valid >> ((7 - row) * 8 + col) & 1:
+                return (7 - row) * 8 + col
+            self.invalid_moves += 1
+
+    @staticmethod
+    def final_board(state, loser, clocks):
+        '''
+        Returns (winner, final state) as the server reports them. A player
+        who lost on time has its clock zeroed and its discs removed;
+        otherwise the empty squares go to the winner. The Java server
+        fills the empties of a tie with its -1 winner; they are left
+        empty here.
+        '''
+        final = state.copy()
+        if loser is not None:
+            clocks[loser] = 0.0
+            if loser == 1:
+                final.p1 = 0
+            else:
+                final.p2 = 0
+            return 3 - loser, final
+
+        winner = state.determine_winner()
+        empty = ~(state.p1 | state.p2) & 0xFFFFFFFFFFFFFFFF
+        if winner == 1:
+            final.p1 |= empty
+        elif winner == 2:
+            final.p2 |= empty
+        return winner or TIE, final
+
+
+async def client_process(host, player, port):
+    '''Runs reversi_python_client.py for one seat, the same as a real match.'''
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, CLIENT_SCRIPT, host, str(player), f'port={port}',
+        stdout=asyncio.subprocess.DEVNULL)
+    await process.wait()
+
+
+def start_clients(client, host, ports, bot, pool, index):
+    '''Connects the chosen kind of client to both seats of a game.'''
+    if client == 'async':
+        return [async_client.play_game(host, port, bot, pool, (index, player))
+                for player, port in zip((1, 2), ports)]
+    if client == 'process':
+        return [client_process(host, player, port) for player, port in zip((1, 2), ports)]
+    print(f'game {index}: waiting for players on ports {ports[0]} and {ports[1]}', flush=True)
+    return []
+
+
+def format_result(result):
+    outcome = f"player {result['winner']} wins" if result['winner'] else 'draw'
+    reason = f" ({result['reason']})" if result['reason'] else ''
+    return (f"game {result['game']}: {outcome}{reason} {result['discs'][0]}-{result['discs'][1]} "
+            f"in {result['plies']} plies, {result['seconds']:.1f}s, "
+            f"clocks {result['clocks'][0]:.1f}/{result['clocks'][1]:.1f}")
+
+
+async def run_games(games, concurrency, minutes, client='async', bot='minimax', workers=None,
+                    records=None, host='127.0.0.1', ports=(0, 0), verbose=False):
+    '''
+    Plays "games" games, up to "concurrency" at a time, and returns their
+    records. client picks who plays them: 'async' runs async_client in this
+    process with a shared pool of search processes, 'process' starts
+    reversi_python_client.py for every seat and 'none' waits for outside
+    clients. records is an optional JSONL file with one line per game, in
+    the arena's format so opening_book.py and pattern_eval.py can read it.
+    '''
+    semaphore = asyncio.Semaphore(concurrency)
+    results = []
+    output = open(records, 'w') if records is not None else None
+    pool = parallel.SearchPool(workers) if client == 'async' else None
+
+    async def play(index):
+        async with semaphore:
+            # Outside clients may take their time to show up
+            game = HeadlessGame(minutes, host, ports, None if client == 'none' else 30.0)
+            await game.open()
+            clients = [asyncio.ensure_future(coroutine)
+                       for coroutine in start_clients(client, host, game.ports, bot, pool, index)]
+            try:
+                result = await game.play()
+            except asyncio.TimeoutError:
+                print(f'game {index}: players never connected', flush=True)
+                return
+            finally:
+                game.close()
+                await asyncio.gather(*clients, return_exceptions=True)
+            result['game'] = index
+            results.append(result)
+            if output is not None:
+                output.write(json.dumps(result) + '\n')
+                output.flush()
+            if verbose:
+                print(format_result(result), flush=True)
+
+    try:
+        await asyncio.gather(*(play(index) for index in range(games)))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        if output is not None:
+            output.close()
+    return results
+
+
+def summary(results, seconds):
+    if not results:
+        return 'no games finished'
+    wins = [sum(1 for r in results if r['winner'] == player) for player in (1, 2)]
+    draws = sum(1 for r in results if r['winner'] == 0)
+    forfeits = sum(1 for r in results if r['reason'])
+    plies = sum(r['plies'] for r in results)
+    return (f'{len(results)} games in {seconds:.1f}s ({60 * len(results) / seconds:.1f} games/min), '
+            f'player 1 {wins[0]}, player 2 {wins[1]}, draws {draws}, forfeits {forfeits}, '
+            f'{plies / len(results):.1f} plies/game')
+
+
+# call: python headless_server.py --games 100 --concurrency 8 --minutes 0.5 --records games.jsonl
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run Reversi games without the Java server.')
+    parser.add_argument('--games', type=int, default=1)
+    parser.add_argument('--concurrency', type=int, default=1, help='games played at once')
+    parser.add_argument('--minutes', type=float, default=5.0, help='each player\'s clock')
+    parser.add_argument('--client', choices=('async', 'process', 'none'), default='async',
+                        help='who plays: async_client in this process, one reversi_python_client.py '
+                             'per seat, or outside clients')
+    parser.add_argument('--bot', choices=sorted(reversi_bot.BOTS), default='minimax',
+                        help='bot for the async client')
+    parser.add_argument('--workers', type=int, default=None, help='search processes for the async client')
+    parser.add_argument('--records', help='JSONL file of game records')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--ports', type=int, nargs=2, default=(0, 0),
+                        help='fixed ports for players 1 and 2 (3334 3335 like the Java server); '
+                             'games are then played one at a time')
+    args = parser.parse_args()
+
+    concurrency = 1 if any(args.ports) else args.concurrency
+    start = time.perf_counter()
+    results = asyncio.run(run_games(args.games, concurrency, args.minutes, args.client, args.bot,
+                                    args.workers, args.records, args.host, tuple(args.ports),
+                                    verbose=True))
+    print(summary(results, time.perf_counter() - start))
@@ -0,0 +1,320 @@
+import math
+import random
+import time
+from array import array
+import bitboard
+from batch_rollout import BatchRollouts
+from bitboard import PASS
+
+NONE = -1 # no node: the end of a child or sibling list, or a failed allocation
+GROW_NODES = 4096 # the pool's arrays grow by this many nodes at a time
+DEFAULT_MAX_NODES = 1 << 20 # about 40 MB of nodes
+
+
+def play_square(board, square):
+    if square == PASS:
+        board.make_pass()
+    else:
+        board.make_move(square)
+
+
+class NodePool:
+    '''
+    Search tree nodes stored column-wise in typed arrays, one entry per node,
+    instead of one Python object per node. A node is an index. Its children
+    form a list through first_child and next_sibling, and its untried moves
+    are a bitmask, plus a flag for a pass. "player" made the move "square"
+    that led to the node, and "wins" counts playout results from that
+    player's point of view (a draw is half a win).
+
+    The arrays grow in steps up to max_nodes and never shrink, so memory is
+    bounded by max_nodes * BYTES_PER_NODE and the garbage collector has
+    nothing to walk. Released subtrees are reclaimed a node at a time as
+    new nodes are needed, so dropping a big tree costs nothing up front.
+    '''
+    COLUMNS = (('square', 'b', 0), ('player', 'b', 0), ('must_pass', 'b', 0),
+               ('parent', 'i', NONE), ('first_child', 'i', NONE), ('next_sibling', 'i', NONE),
+               ('untried', 'Q', 0), ('visits', 'q', 0), ('wins', 'd', 0.0))
+    BYTES_PER_NODE = sum(array(code).itemsize for _, code, _ in COLUMNS)
+
+    def __init__(self, max_nodes=DEFAULT_MAX_NODES):
+        self.max_nodes = max_nodes
+        for name, code, _ in self.COLUMNS:
+            setattr(self, name, array(code))
+        self.allocated = 0 # nodes ever handed out, the high-water mark
+        self.released = [] # roots of released subtrees still to reclaim
+
+    def new_node(self, square, player, parent, board):
+        '''
+        Allocates a node for board, reached by player playing square from
+        parent (NONE for a root). Returns NONE if the pool is full.
+        '''
+        node = self.allocate()
+        if node == NONE:
+            return NONE
+        self.square[node] = square
+        self.player[node] = player
+        self.parent[node] = parent
+        self.first_child[node] = NONE
+        self.next_sibling[node] = NONE
+        self.visits[node] = 0
+        self.wins[node] = 0.0
+        moves = board.valid_moves_mask()
+        self.untried[node] = moves
+        own, opp = board.pieces(board.turn)
+        self.must_pass[node] = not moves and bitboard.moves_mask(opp, own) != 0
+        if parent != NONE:
+            self.next_sibling[node] = self.first_child[parent]
+            self.first_child[parent] = node
+        return node
+
+    def allocate(self):
+        if self.released:
+            # Reuse a released node; its children wait their turn
+            node = self.released.pop()
+            child = self.first_child[node]
+            while child != NONE:
+                self.released.append(child)
+                child = self.next_sibling[child]
+            return node
+        if self.allocated == self.max_nodes:
+            return NONE
+        if self.allocated == len(self.visits):
+            grow = min(GROW_NODES, self.max_nodes - self.allocated)
+            for name, code, fill in self.COLUMNS:
+                getattr(self, name).extend(array(code, [fill]) * grow)
+        self.allocated += 1
+        return self.allocated - 1
+
+    def release(self, node):
+        '''Gives back node and its whole subtree; node must already be detached.'''
+        self.released.append(node)
+
+    def detach(self, node):
+        '''Unlinks node from its parent's children, making it a root.'''
+        parent = self.parent[node]
+        if parent == NONE:
+            return
+        if self.first_child[parent] == node:
+            self.first_child[parent] = self.next_sibling[node]
+        else:
+            child = self.first_child[parent]
+            while self.next_sibling[child] != node:
+                child = self.next_sibling[child]
+            self.next_sibling[child] = self.next_sibling[node]
+        self.parent[node] = NONE
+        self.next_sibling[node] = NONE
+
+    def children(self, node):
+        child = self.first_child[node]
+        while child != NONE:
+            yield child
+            child = self.next_sibling[child]
+
+    def pop_untried(self, node, rng):
+        '''Removes and returns a random untried square of node (PASS for a pass).'''
+        if self.must_pass[node]:
+            self.must_pass[node] = 0
+            return PASS
+        squares = list(bitboard.iter_bits(self.untried[node]))
+        square = squares[rng.randrange(len(squares))]
+        self.untried[node] ^= 1 << square
+        return square
+
+    def push_untried(self, node, square):
+        '''Puts back a square taken by pop_untried that didn't get a node.'''
+        if square == PASS:
+            self.must_pass[node] = 1
+        else:
+            self.untried[node] |= 1 << square
+
+    def occupancy(self):
+        '''
+        Pool usage: nodes handed out so far (released ones are reused
+        before new ones), released subtrees still waiting to be reused, the
+        cap and the bytes the arrays hold.
+        '''
+        return {
+            'allocated': self.allocated,
+            'released_subtrees': len(self.released),
+            'max_nodes': self.max_nodes,
+            'bytes': len(self.visits) * self.BYTES_PER_NODE,
+        }
+
+
+class MCTS:
+    '''
+    UCT search with a persistent tree kept in a NodePool. set_root() moves
+    the root to the position we are asked to play from; if that position is
+    a child or grandchild of the previous root (our move and the opponent's
+    reply), its subtree and statistics are kept and the rest of the old
+    tree is released for reuse. Once the pool is full, leaves are still
+    simulated but no longer expanded.
+
+    With rollout_batch set, every new leaf is scored by that many
+    vectorized playouts from batch_rollout instead of a single Python one.
+    '''
+    def __init__(self, exploration=1.4, rng=None, rollout_batch=None, max_nodes=DEFAULT_MAX_NODES):
+        self.exploration = exploration
+        self.rng = rng or random.Random()
+        self.rollout_batch = rollout_batch
+        self.batch = BatchRollouts(self.rng.getrandbits(32)) if rollout_batch else None
+        self.pool = NodePool(max_nodes)
+        self.root = NONE
+        self.root_state = None
+        self.playouts = 0
+
+    def set_root(self, state):
+        '''Returns True if part of the old tree was reused.'''
+        state = bitboard.BitboardState(state.p1, state.p2, state.turn)
+        pool = self.pool
+        if self.root != NONE:
+            node = self.find(self.root, self.root_state, state, 2)
+            if node != NONE:
+                if node != self.root:
+                    pool.detach(node)
+                    pool.release(self.root)
+                self.root = node
+                self.root_state = state
+                return True
+            pool.release(self.root)
+        self.root = pool.new_node(PASS, 0, NONE, state)
+        self.root_state = state
+        return False
+
+    def find(self, node, node_state, target, depth):
+        if node_state.p1 == target.p1 and node_state.p2 == target.p2 and \
+                node_state.turn == target.turn:
+            return node
+        if depth == 0:
+            return NONE
+        for child in self.pool.children(node):
+            child_state = node_state.copy()
+            play_square(child_state, self.pool.square[child])
+            found = self.find(child, child_state, target, depth - 1)
+            if found != NONE:
+                return found
+        return NONE
+
+    def search(self, deadline=None, max_playouts=None):
+        '''
+        Runs playouts from the root until the deadline passes or max_playouts
+        have been run, whichever comes first. At least one bound is needed.
+        '''
+        board = self.root_state.copy()
+        self.playouts = 0
+        iterations = 0
+        # A batched playout takes as long as many single ones, so the clock
+        # is read before each of them rather than every 16 iterations
+        check = 0 if self.batch is not None else 15
+        while True:
+            if max_playouts is not None and self.playouts >= max_playouts:
+                break
+            if deadline is not None and iterations & check == 0 and time.perf_counter() > deadline:
+                break
+            board.copy_from(self.root_state)
+            self.playouts += self.run_playout(board)
+            iterations += 1
+
+    def run_playout(self, board):
+        '''Runs one selection-expansion-simulation pass; returns the number of games played.'''
+        pool = self.pool
+        node = self.root
+
+        # Selection
+        untried = pool.untried
+        must_pass = pool.must_pass
+        first_child = pool.first_child
+        while not untried[node] and not must_pass[node] and first_child[node] != NONE:
+            node = self.select_child(node)
+            play_square(board, pool.square[node])
+
+        # Expansion. If the pool is full the move is simulated without a
+        # node and stays untried, so no legal move drops out of the tree
+        if untried[node] or must_pass[node]:
+            player = board.turn
+            square = pool.pop_untried(node, self.rng)
+            play_square(board, square)
+            child = pool.new_node(square, player, node, board)
+            if child != NONE:
+                node = child
+            else:
+                pool.push_untried(node, square)
+
+        # Simulation: results[0] counts draws, results[p] wins for player p
+        if self.batch is not None:
+            winners = self.batch.rollout(board, self.rollout_batch)
+            results = [int(count) for count in (winners[:, None] == (0, 1, 2)).sum(axis=0)]
+        else:
+            results = [0, 0, 0]
+            results[self.rollout(board)] = 1
+        games = sum(results)
+
+        # Backpropagation
+        half_draws = 0.5 * results[0]
+        visits = pool.visits
+        wins = pool.wins
+        parent = pool.parent
+        player = pool.player
+        while node != self.root:
+            visits[node] += games
+            wins[node] += results[player[node]] + half_draws
+            node = parent[node]
+        visits[node] += games
+        return games
+
+    def select_child(self, node):
+        pool = self.pool
+        visits = pool.visits
+        wins = pool.wins
+        next_sibling = pool.next_sibling
+        log_visits = math.log(visits[node])
+        c = self.exploration
+        best_child = NONE
+        best_score = -1.0
+        child = pool.first_child[node]
+        while child != NONE:
+            child_visits = visits[child]
+            score = wins[child] / child_visits + c * math.sqrt(log_visits / child_visits)
+            if score > best_score:
+                best_score = score
+                best_child = child
+            child = next_sibling[child]
+        return best_child
+
+    def rollout(self, board):
+        '''Plays random moves until neither player can move; returns the winner.'''
+        rng = self.rng
+        passes = 0
+        while passes < 2:
+            moves = board.valid_moves_mask()
+            if not moves:
+                board.make_pass()
+                passes += 1
+                continue
+            passes = 0
+            squares = list(bitboard.iter_bits(moves))
+            board.make_move(squares[rng.randrange(len(squares))])
+        return board.determine_winner()
+
+    def root_statistics(self):
+        '''{square: (visits, wins)} for the root's expanded moves.'''
+        pool = self.pool
+        return {pool.square[child]: (pool.visits[child], pool.wins[child])
+                for child in pool.children(self.root)}
+
+    def best_square(self):
+        '''The most visited root move, or None if the root is unexpanded.'''
+        stats = self.root_statistics()
+        if not stats:
+            return None
+        return max(stats, key=lambda square: stats[square][0])
+
+    def tree_size(self):
+        count = 0
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            count += 1
+            stack.extend(self.pool.children(node))
+        return count
@@ -0,0 +1,62 @@
+import bitboard
+
+# Static square weights, row-major in the client's board orientation.
+# Corners are best; the X-squares diagonal to a corner and the C-squares
+# next to it hand the corner to the opponent and are tried last.
+SQUARE_WEIGHTS = (
+    100, -20, 10,  5,  5, 10, -20, 100,
+    -20, -50, -2, -2, -2, -2, -50, -20,
+     10,  -2, -1, -1, -1, -1,  -2,  10,
+      5,  -2, -1, -1, -1, -1,  -2,   5,
+      5,  -2, -1, -1, -1, -1,  -2,   5,
+     10,  -2, -1, -1, -1, -1,  -2,  10,
+    -20, -50, -2, -2, -2, -2, -50, -20,
+    100, -20, 10,  5,  5, 10, -20, 100,
+)
+
+HASH_MOVE_SCORE = 1 << 30
+KILLER_SCORES = (1 << 29, 1 << 28)
+MAX_PLY = 64
+
+
+class MoveOrderer:
+    '''
+    Sorts the moves of a search node so that the ones most likely to cause
+    a cutoff come first: the transposition table's move, then the two
+    killer moves of the ply, then moves by history score plus static
+    square weight.
+    '''
+    def __init__(self):
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        # history[player][square], indexed by player number 1 or 2
+        self.history = [None, [0] * 64, [0] * 64]
+
+    def new_search(self):
+        '''Clears killers and ages the history scores between moves.'''
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        for player in (1, 2):
+            self.history[player] = [h >> 1 for h in self.history[player]]
+
+    def order(self, moves, hash_square, ply, turn):
+        history = self.history[turn]
+        killers = self.killers[ply]
+        scored = []
+        for square in bitboard.iter_bits(moves):
+            if square == hash_square:
+                score = HASH_MOVE_SCORE
+            elif square == killers[0]:
+                score = KILLER_SCORES[0]
+            elif square == killers[1]:
+                score = KILLER_SCORES[1]
+            else:
+                score = history[square] + SQUARE_WEIGHTS[square]
+            scored.append((score, square))
+        scored.sort(reverse=True)
+        return [square for _, square in scored]
+
+    def record_cutoff(self, square, ply, depth, turn):
+        killers = self.killers[ply]
+        if killers[0] != square:
+            killers[1] = killers[0]
+            killers[0] = square
+        self.history[turn][square] += depth * depth
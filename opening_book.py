@@ -0,0 +1,190 @@
+import argparse
+import json
+import re
+import numpy as np
+import bitboard
+from bitboard import BitboardState, PASS
+
+# Book file: a header, then one column per field, sorted by (own, opp) of
+# the canonical position. Each row is one move from one position, with the
+# games it was played in and the points it scored for the player making
+# it (2 for a win, 1 for a draw).
+MAGIC = b'RVBK'
+VERSION = 1
+HEADER = np.dtype([('magic', 'S4'), ('version', '<u4'), ('count', '<u8')])
+COLUMNS = (('own', '<u8'), ('opp', '<u8'), ('square', 'u1'), ('games', '<u4'), ('points', '<u4'))
+
+_PLAYER_MOVE = re.compile(r'Player ([12]): (\d), (\d)')
+_PLAYER_PASS = re.compile(r"Player ([12]) can't move")
+
+
+def read_game_log(lines):
+    '''
+    Yields the moves of every game in a server GameLog as a list of
+    (player, square) pairs, square being PASS for "can't move". Games start
+    at each "Round: 0". The server writes rows in its own order, so they
+    are flipped into the client's.
+    '''
+    moves = []
+    for line in lines:
+        if line.startswith('Round: 0') and moves:
+            yield moves
+            moves = []
+        match = _PLAYER_MOVE.match(line)
+        if match:
+            player, row, col = map(int, match.groups())
+            moves.append((player, (7 - row) * 8 + col))
+            continue
+        match = _PLAYER_PASS.match(line)
+        if match:
+            moves.append((int(match.group(1)), PASS))
+    if moves:
+        yield moves
+
+
+def read_arena_records(lines):
+    '''Yields the moves of every game in an arena JSONL file, like read_game_log.'''
+    for line in lines:
+        if not line.strip():
+            continue
+        state = BitboardState(0, 0, 1)
+        moves = []
+        for square in json.loads(line)['moves']:
+            moves.append((state.turn, square))
+            if square == PASS:
+                state.make_pass()
+            else:
+                state.make_move(square)
+        yield moves
+
+
+def replay(moves):
+    '''
+    Returns the positions before every move as (state, square) pairs, and
+    the final state. Passes that the log leaves out are filled in; the game
+    is cut short at the first move that isn't legal.
+    '''
+    state = BitboardState(0, 0, 1)
+    positions = []
+    for player, square in moves:
+        if square == PASS:
+            continue
+        if player != state.turn:
+            state.make_pass()
+        if not state.valid_moves_mask() >> square & 1:
+            break
+        positions.append((state.copy(), square))
+        state.make_move(square)
+    return positions, state
+
+
+class BookBuilder:
+    '''Collects move statistics from games, then writes them as a book file.'''
+    def __init__(self, max_plies=20):
+        self.max_plies = max_plies
+        self.stats = {} # (own, opp, square) -> [games, points]
+        self.games = 0
+
+    def add_game(self, moves):
+        positions, final = replay(moves)
+        winner = final.determine_winner()
+        self.games += 1
+        for state, square in positions[:self.max_plies]:
+            own, opp = state.pieces(state.turn)
+            own, opp, symmetry = bitboard.canonical(own, opp)
+            key = (own, opp, bitboard.SYMMETRY_SQUARES[symmetry][square])
+            entry = self.stats.setdefault(key, [0, 0])
+            entry[0] += 1
+            entry[1] += 2 if winner == state.turn else 1 if winner == 0 else 0
+
+    def write(self, path, min_games=1):
+        rows = sorted((key, value) for key, value in self.stats.items() if value[0] >= min_games)
+        header = np.array([(MAGIC, VERSION, len(rows))], dtype=HEADER)
+        with open(path, 'wb') as f:
+            f.write(header.tobytes())
+            for index, (_, dtype) in enumerate(COLUMNS):
+                if index < 3:
+                    values = [key[index] for key, _ in rows]
+                else:
+                    values = [value[index - 3] for _, value in rows]
+                f.write(np.array(values, dtype=dtype).tobytes())
+        return len(rows)
+
+
+class OpeningBook:
+    '''
+    A book file mapped into memory. Lookups binary-search the sorted own
+    column and then the opp column inside that range, so only a few pages
+    of the file are ever read.
+    '''
+    def __init__(self, path, min_games=2):
+        self.min_games = min_games
+        header = np.fromfile(path, dtype=HEADER, count=1)[0]
+        if header['magic'] != MAGIC or header['version'] != VERSION:
+            raise ValueError(f'{path} is not a version {VERSION} opening book')
+        self.count = int(header['count'])
+        offset = HEADER.itemsize
+        self.columns = {}
+        for name, dtype in COLUMNS:
+            if self.count:
+                self.columns[name] = np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(self.count,))
+            else:
+                self.columns[name] = np.zeros(0, dtype=dtype)
+            offset += np.dtype(dtype).itemsize * self.count
+
+    def __len__(self):
+        return self.count
+
+    def lookup(self, state):
+        '''Returns [(square, games, points)] for the position, in its own orientation.'''
+        own, opp = state.pieces(state.turn)
+        own, opp, symmetry = bitboard.canonical(own, opp)
+        own_column = self.columns['own']
+        low = int(np.searchsorted(own_column, np.uint64(own), 'left'))
+        high = int(np.searchsorted(own_column, np.uint64(own), 'right'))
+        if low == high:
+            return []
+        opp_range = self.columns['opp'][low:high]
+        start = low + int(np.searchsorted(opp_range, np.uint64(opp), 'left'))
+        end = low + int(np.searchsorted(opp_range, np.uint64(opp), 'right'))
+        inverse = bitboard.INVERSE_SQUARES[symmetry]
+        return [(inverse[int(self.columns['square'][i])], int(self.columns['games'][i]),
+                 int(self.columns['points'][i])) for i in range(start, end)]
+
+    def choose(self, state):
+        '''
+        The book move for state, or None if no move has been played there
+        at least min_games times. Moves are ranked by their score with one
+        win and one loss added, so a move that won its only game doesn't
+        beat a move that won 30 of 40.
+        '''
+        best_square = None
+        best_score = None
+        for square, games, points in self.lookup(state):
+            if games < self.min_games:
+                continue
+            score = (points + 2) / (2 * games + 4)
+            if best_score is None or score > best_score:
+                best_square, best_score = square, score
+        if best_square is None or not state.valid_moves_mask() >> best_square & 1:
+            return None
+        return bitboard.square_to_move(best_square)
+
+
+# call: python opening_book.py book.bin Reversi/ReversiServer/GameLog.txt games.jsonl --max-plies 20
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build an opening book from game records.')
+    parser.add_argument('output')
+    parser.add_argument('records', nargs='+', help='server GameLog files or arena .jsonl output')
+    parser.add_argument('--max-plies', type=int, default=20, help='only book moves this early in the game')
+    parser.add_argument('--min-games', type=int, default=1, help='leave out moves played fewer times')
+    args = parser.parse_args()
+
+    builder = BookBuilder(args.max_plies)
+    for path in args.records:
+        with open(path) as f:
+            games = read_arena_records(f) if path.endswith('.jsonl') else read_game_log(f)
+            for moves in games:
+                builder.add_game(moves)
+    rows = builder.write(args.output, args.min_games)
+    print(f'{builder.games} games, {rows} book moves written to {args.output}')
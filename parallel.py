@@ -0,0 +1,112 @@
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+import bitboard
+import mcts
+
+# Per-process search objects. SearchPool sends a task slot to the same
+# process every move, so a worker's bot and tree survive from move to move
+# and transposition tables and MCTS subtrees get reused.
+_worker_bots = {}
+_worker_trees = {} # at most one: the tree of the slot this process serves
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+class SearchPool:
+    '''
+    Worker processes that live as long as the bot that owns them, so worker
+    start-up (interpreter and numpy import) is paid once per game rather
+    than once per move. Each process has its own single-worker executor and
+    map() sends task i to process i, so the state a worker keeps for its
+    slot is there again on the next move.
+    '''
+    def __init__(self, workers=None):
+        self.workers = workers or default_workers()
+        self.executors = [ProcessPoolExecutor(max_workers=1) for _ in range(self.workers)]
+
+    def map(self, fn, tasks):
+        futures = [self.executors[i % self.workers].submit(fn, *task) for i, task in enumerate(tasks)]
+        return [future.result() for future in futures]
+
+    def executor_for(self, key):
+        '''The executor that runs every task for key, e.g. all moves of one game.'''
+        return self.executors[hash(key) % self.workers]
+
+    def shutdown(self):
+        for executor in self.executors:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+def split_round_robin(items, parts):
+    '''Deals items out like cards so every part gets some of the best ones.'''
+    return [items[i::parts] for i in range(parts) if items[i::parts]]
+
+
+def alphabeta_worker(p1, p2, turn, move_num, moves, budget, hard_limit, fixed_depth, evaluator,
+                     probcut=None, lmr=False):
+    '''
+    Searches only the given root moves and returns {depth: (move, value)}
+    for every depth it completed. Values at the same depth are comparable
+    between workers because each root value is exact at that depth.
+    '''
+    import reversi_bot # imported here because reversi_bot imports this module
+    bot = _worker_bots.get(move_num)
+    if bot is None:
+        bot = _worker_bots[move_num] = reversi_bot.ReversiBot(move_num)
+    bot.evaluator = evaluator
+    bot.probcut = probcut
+    bot.lmr = lmr
+    bot.tt.new_search()
+    bot.orderer.new_search()
+    state = bitboard.BitboardState(p1, p2, turn).with_hash()
+
+    if fixed_depth is not None:
+        bot.deadline = None
+        return {fixed_depth: bot.search_root(state, moves, fixed_depth)}
+    return dict(enumerate(bot.deepen(state, moves, budget, hard_limit)))
+
+
+def merge_alphabeta_results(worker_results):
+    '''Picks the best move at the deepest depth every worker completed.'''
+    common = set.intersection(*(set(results) for results in worker_results))
+    if not common:
+        return None
+    depth = max(common)
+    best_move, best_value = None, None
+    for results in worker_results:
+        move, value = results[depth]
+        if best_value is None or value > best_value:
+            best_move, best_value = move, value
+    return best_move
+
+
+def mcts_worker(p1, p2, turn, tree_id, exploration, seconds, max_playouts, rollout_batch, seed,
+                max_nodes=mcts.DEFAULT_MAX_NODES):
+    '''
+    Runs an independent UCT search from the root and returns its root
+    statistics as {square: (visits, wins)}. tree_id names the tree to reuse
+    if this process ran the same task slot on an earlier move; a tree of
+    any other slot or bot is dropped, so a process holds one tree at most.
+    '''
+    deadline = time.perf_counter() + seconds if seconds is not None else None
+    tree = _worker_trees.get(tree_id)
+    if tree is None:
+        _worker_trees.clear()
+        tree = _worker_trees[tree_id] = mcts.MCTS(exploration, random.Random(seed), rollout_batch, max_nodes)
+    tree.set_root(bitboard.BitboardState(p1, p2, turn))
+    tree.search(deadline=deadline, max_playouts=max_playouts)
+    return tree.root_statistics()
+
+
+def merge_root_statistics(worker_stats):
+    '''Sums root visits and wins over workers (root parallelism).'''
+    merged = {}
+    for stats in worker_stats:
+        for square, (visits, wins) in stats.items():
+            total_visits, total_wins = merged.get(square, (0, 0.0))
+            merged[square] = (total_visits + visits, total_wins + wins)
+    return merged
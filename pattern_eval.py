@@ -0,0 +1,325 @@
+import argparse
+import numpy as np
+import bitboard
+from bitboard import FULL, popcount
+from batch_rollout import popcount as popcount_array
+from endgame import final_score
+from evaluation import Evaluator
+
+# Patterns, Logistello style. Each is listed as ordered squares (row, col)
+# for one orientation; its images under the 8 board symmetries share the
+# same weight table, indexed by the base-3 number the squares spell out
+# (0 empty, 1 own, 2 opponent; the first square is the lowest digit).
+PATTERNS = (
+    ('edge_2x', [(0, c) for c in range(8)] + [(1, 1), (1, 6)]),
+    ('corner_3x3', [(r, c) for r in range(3) for c in range(3)]),
+    ('corner_2x5', [(r, c) for r in range(2) for c in range(5)]),
+    ('line2', [(1, c) for c in range(8)]),
+    ('line3', [(2, c) for c in range(8)]),
+    ('line4', [(3, c) for c in range(8)]),
+    ('diag8', [(i, i) for i in range(8)]),
+    ('diag7', [(i, i + 1) for i in range(7)]),
+    ('diag6', [(i, i + 2) for i in range(6)]),
+    ('diag5', [(i, i + 3) for i in range(5)]),
+    ('diag4', [(i, i + 4) for i in range(4)]),
+)
+
+# Weights change over the game, so there is a set of tables per phase,
+# picked by the number of discs on the board
+PHASES = 6
+PHASE_OF_DISCS = tuple(min(max(discs - 4, 0) * PHASES // 60, PHASES - 1) for discs in range(65))
+
+# Weight file: a header, then every phase's parameters as float16, which
+# keeps well under a hundredth of a disc of precision at half the size
+MAGIC = b'RVPW'
+VERSION = 1
+HEADER = np.dtype([('magic', 'S4'), ('version', '<u4'), ('phases', '<u4'), ('params', '<u4')])
+
+
+def _rotate_right(bits, n):
+    return ((bits >> n) | (bits << (64 - n))) & FULL
+
+
+def rotate45_clockwise(bits):
+    '''Permutes the bits so every diagonal (constant row - col) lies inside one byte.'''
+    bits ^= 0xAAAAAAAAAAAAAAAA & (bits ^ _rotate_right(bits, 8))
+    bits ^= 0xCCCCCCCCCCCCCCCC & (bits ^ _rotate_right(bits, 16))
+    bits ^= 0xF0F0F0F0F0F0F0F0 & (bits ^ _rotate_right(bits, 32))
+    return bits
+
+
+def rotate45_anticlockwise(bits):
+    '''Permutes the bits so every anti-diagonal (constant row + col) lies inside one byte.'''
+    bits ^= 0x5555555555555555 & (bits ^ _rotate_right(bits, 8))
+    bits ^= 0x3333333333333333 & (bits ^ _rotate_right(bits, 16))
+    bits ^= 0x0F0F0F0F0F0F0F0F & (bits ^ _rotate_right(bits, 32))
+    return bits
+
+
+# The evaluator reads patterns out of these four views of the board. The
+# functions only use shifts, masks and xors, so they work the same on
+# Python ints and on numpy uint64 arrays (which they modify in place, so
+# arrays are passed as copies).
+VIEWS = (lambda bits: bits, bitboard.transpose, rotate45_clockwise, rotate45_anticlockwise)
+VIEW_SQUARES = tuple(tuple(view(1 << sq).bit_length() - 1 for sq in range(64)) for view in VIEWS)
+
+# Scalar evaluation permutes own and opp at once, packed into one 128-bit
+# int with opp in the high half. Every step only moves bits within a 64-bit
+# half, so the same masks repeated in both halves do both boards.
+LANES = 1 | 1 << 64
+_T28, _T14, _T7 = (m * LANES for m in (0x0F0F0F0F00000000, 0x3333000033330000, 0x5500550055005500))
+_KEEP8, _WRAP8 = ((1 << 56) - 1) * LANES, (0xFF << 56) * LANES
+_KEEP16, _WRAP16 = ((1 << 48) - 1) * LANES, (0xFFFF << 48) * LANES
+_KEEP32, _WRAP32 = ((1 << 32) - 1) * LANES, (0xFFFFFFFF << 32) * LANES
+_CW1, _CW2, _CW4 = (m * LANES for m in (0xAAAAAAAAAAAAAAAA, 0xCCCCCCCCCCCCCCCC, 0xF0F0F0F0F0F0F0F0))
+_ACW1, _ACW2, _ACW4 = (m * LANES for m in (0x5555555555555555, 0x3333333333333333, 0x0F0F0F0F0F0F0F0F))
+
+
+def packed_view_bytes(own, opp):
+    '''
+    The bytes of all four views of both boards: view v's row r is at
+    16 * v + r for own and 16 * v + 8 + r for opp.
+    '''
+    x = own | opp << 64
+    t = _T28 & (x ^ (x << 28))
+    tr = x ^ t ^ (t >> 28)
+    t = _T14 & (tr ^ (tr << 14))
+    tr ^= t ^ (t >> 14)
+    t = _T7 & (tr ^ (tr << 7))
+    tr ^= t ^ (t >> 7)
+
+    cw = x ^ _CW1 & (x ^ ((x >> 8) & _KEEP8 | (x << 56) & _WRAP8))
+    cw ^= _CW2 & (cw ^ ((cw >> 16) & _KEEP16 | (cw << 48) & _WRAP16))
+    cw ^= _CW4 & (cw ^ ((cw >> 32) & _KEEP32 | (cw << 32) & _WRAP32))
+
+    acw = x ^ _ACW1 & (x ^ ((x >> 8) & _KEEP8 | (x << 56) & _WRAP8))
+    acw ^= _ACW2 & (acw ^ ((acw >> 16) & _KEEP16 | (acw << 48) & _WRAP16))
+    acw ^= _ACW4 & (acw ^ ((acw >> 32) & _KEEP32 | (acw << 32) & _WRAP32))
+
+    return (x.to_bytes(16, 'little') + tr.to_bytes(16, 'little') +
+            cw.to_bytes(16, 'little') + acw.to_bytes(16, 'little'))
+
+
+def pattern_instances():
+    '''
+    Returns [(pattern number, parts)] for every symmetric image of every
+    pattern. A part is (view, row, own table, opp table): the two 256-entry
+    tables turn that row of the view's own or opponent discs into its share
+    of the index.
+    '''
+    instances = []
+    for number, (_, cells) in enumerate(PATTERNS):
+        squares = [row * 8 + col for row, col in cells]
+        seen = set()
+        for symmetry in bitboard.SYMMETRY_SQUARES:
+            image = [symmetry[sq] for sq in squares]
+            if frozenset(image) in seen:
+                continue
+            seen.add(frozenset(image))
+            # Read it from whichever view packs it into the fewest bytes
+            view = min(range(len(VIEWS)), key=lambda v: len({VIEW_SQUARES[v][sq] // 8 for sq in image}))
+            positions = [VIEW_SQUARES[view][sq] for sq in image]
+            parts = []
+            for byte in sorted({pos // 8 for pos in positions}):
+                own_table = [0] * 256
+                for value in range(256):
+                    for digit, pos in enumerate(positions):
+                        if pos // 8 == byte and value >> (pos % 8) & 1:
+                            own_table[value] += 3 ** digit
+                parts.append((view, byte, own_table, [2 * x for x in own_table]))
+            instances.append((number, parts))
+    return instances
+
+
+INSTANCES = pattern_instances()
+TABLE_SIZES = tuple(3 ** len(cells) for _, cells in PATTERNS)
+# Parameter vector of one phase: a constant, then each pattern's table
+TABLE_OFFSETS = tuple(1 + sum(TABLE_SIZES[:i]) for i in range(len(PATTERNS)))
+PARAMS = 1 + sum(TABLE_SIZES)
+
+
+class PatternEvaluator(Evaluator):
+    '''
+    Sum of pattern weights for the current phase. A leaf costs four board
+    permutations per side and one table lookup per pattern image (two or
+    three for the corner patterns), with no move generation. Scores are in
+    discs: the expected final disc differential for the player to move.
+    '''
+    def __init__(self, weights=None):
+        if weights is None:
+            weights = np.zeros((PHASES, PARAMS), dtype=np.float32)
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.build_tables()
+
+    def build_tables(self):
+        # Plain lists index faster than numpy arrays one element at a time
+        self.bias = []
+        self.lines = []
+        self.regions = []
+        for phase in range(PHASES):
+            row = self.weights[phase]
+            tables = [row[offset:offset + size].tolist() for offset, size in zip(TABLE_OFFSETS, TABLE_SIZES)]
+            self.bias.append(float(row[0]))
+            self.lines.append([(tables[number], 16 * parts[0][0] + parts[0][1], parts[0][2], parts[0][3])
+                               for number, parts in INSTANCES if len(parts) == 1])
+            self.regions.append([(tables[number], [(16 * view + row, own_table, opp_table)
+                                                   for view, row, own_table, opp_table in parts])
+                                 for number, parts in INSTANCES if len(parts) > 1])
+
+    def __getstate__(self):
+        return {'weights': self.weights}
+
+    def __setstate__(self, state):
+        self.weights = state['weights']
+        self.build_tables()
+
+    @classmethod
+    def load(cls, path):
+        header = np.fromfile(path, dtype=HEADER, count=1)[0]
+        if header['magic'] != MAGIC or header['version'] != VERSION or \
+                header['phases'] != PHASES or header['params'] != PARAMS:
+            raise ValueError(f'{path} is not a weight file for these patterns')
+        weights = np.fromfile(path, dtype='<f2', offset=HEADER.itemsize, count=PHASES * PARAMS)
+        return cls(weights.reshape(PHASES, PARAMS))
+
+    def save(self, path):
+        header = np.array([(MAGIC, VERSION, PHASES, PARAMS)], dtype=HEADER)
+        with open(path, 'wb') as f:
+            f.write(header.tobytes())
+            f.write(self.weights.astype('<f2').tobytes())
+
+    def evaluate(self, own, opp, own_moves=None):
+        phase = PHASE_OF_DISCS[popcount(own | opp)]
+        b = packed_view_bytes(own, opp)
+        score = self.bias[phase]
+        for table, offset, own_table, opp_table in self.lines[phase]:
+            score += table[own_table[b[offset]] + opp_table[b[offset + 8]]]
+        for table, parts in self.regions[phase]:
+            index = 0
+            for offset, own_table, opp_table in parts:
+                index += own_table[b[offset]] + opp_table[b[offset + 8]]
+            score += table[index]
+        return score
+
+
+def feature_columns(own, opp):
+    '''
+    The same pattern indices as PatternEvaluator.evaluate, for arrays of
+    positions at once. Returns an (N, instances) array of columns into a
+    phase's parameter vector.
+    '''
+    own = np.asarray(own, dtype=np.uint64)
+    opp = np.asarray(opp, dtype=np.uint64)
+    own_bytes = np.concatenate([view(own.copy()).astype('<u8').view(np.uint8).reshape(-1, 8) for view in VIEWS], axis=1)
+    opp_bytes = np.concatenate([view(opp.copy()).astype('<u8').view(np.uint8).reshape(-1, 8) for view in VIEWS], axis=1)
+    columns = np.empty((len(own), len(INSTANCES)), dtype=np.int64)
+    for i, (number, parts) in enumerate(INSTANCES):
+        index = np.full(len(own), TABLE_OFFSETS[number], dtype=np.int64)
+        for view, row, own_table, opp_table in parts:
+            offset = 8 * view + row
+            index += np.asarray(own_table)[own_bytes[:, offset]] + np.asarray(opp_table)[opp_bytes[:, offset]]
+        columns[:, i] = index
+    return columns
+
+
+def symmetric_images(own, opp):
+    '''All 8 symmetric images of each position, for training on more data.'''
+    own = np.asarray(own, dtype=np.uint64)
+    opp = np.asarray(opp, dtype=np.uint64)
+    reverse = np.frombuffer(bitboard.REVERSED_BYTES, dtype=np.uint8)
+
+    def mirror(bits):
+        return reverse[bits.astype('<u8').view(np.uint8)].view('<u8').reshape(bits.shape)
+
+    images = []
+    for transposed in (False, True):
+        o = bitboard.transpose(own.copy()) if transposed else own
+        p = bitboard.transpose(opp.copy()) if transposed else opp
+        for flipped in (False, True):
+            fo = o.byteswap() if flipped else o
+            fp = p.byteswap() if flipped else p
+            images.append((fo, fp))
+            images.append((mirror(fo), mirror(fp)))
+    return (np.concatenate([o for o, _ in images]), np.concatenate([p for _, p in images]))
+
+
+def training_positions(games):
+    '''
+    Every position of every game as (own, opp, final disc differential for
+    the player to move), skipping the center-placement opening.
+    '''
+    from opening_book import replay # imported here because opening_book is only needed for training
+    own, opp, targets = [], [], []
+    for moves in games:
+        positions, final = replay(moves)
+        for state, _ in positions:
+            if not state.center_filled():
+                continue
+            o, p = state.pieces(state.turn)
+            f_own, f_opp = final.pieces(state.turn)
+            own.append(o)
+            opp.append(p)
+            targets.append(final_score(f_own, f_opp))
+    return (np.array(own, dtype=np.uint64), np.array(opp, dtype=np.uint64),
+            np.array(targets, dtype=np.float64))
+
+
+def fit(own, opp, targets, epochs=50, learning_rate=0.5, regularization=2.0, symmetries=True):
+    '''
+    Fits the weights of every phase by gradient descent on squared error.
+    Each weight's step is scaled by how often its pattern value occurs
+    (plus "regularization", which keeps rare values near zero), so common
+    and rare table entries learn at comparable rates. Returns
+    (PatternEvaluator, training RMSE per phase).
+    '''
+    if symmetries:
+        own, opp = symmetric_images(own, opp)
+        targets = np.tile(targets, 8)
+    phases = np.array(PHASE_OF_DISCS)[popcount_array(own | opp)]
+    weights = np.zeros((PHASES, PARAMS))
+    errors = [None] * PHASES
+    for phase in range(PHASES):
+        rows = phases == phase
+        if not rows.any():
+            continue
+        columns = feature_columns(own[rows], opp[rows])
+        y = targets[rows]
+        w = weights[phase]
+        w[0] = y.mean()
+        counts = np.bincount(columns.ravel(), minlength=PARAMS)
+        step = learning_rate / (columns.shape[1] * (counts + regularization))
+        for _ in range(epochs):
+            residual = y - w[0] - w[columns].sum(axis=1)
+            gradient = np.bincount(columns.ravel(), weights=np.repeat(residual, columns.shape[1]), minlength=PARAMS)
+            w += step * gradient
+            w[0] += learning_rate * residual.mean()
+        residual = y - w[0] - w[columns].sum(axis=1)
+        errors[phase] = float(np.sqrt(np.mean(residual ** 2)))
+    return PatternEvaluator(weights), errors
+
+
+# call: python pattern_eval.py weights.bin games.jsonl Reversi/ReversiServer/GameLog.txt --epochs 50
+if __name__ == '__main__':
+    import opening_book
+    parser = argparse.ArgumentParser(description='Fit pattern weights to game results.')
+    parser.add_argument('output')
+    parser.add_argument('records', nargs='+', help='arena .jsonl output or server GameLog files')
+    parser.add_argument('--epochs', type=int, default=50)
+    parser.add_argument('--learning-rate', type=float, default=0.5)
+    parser.add_argument('--regularization', type=float, default=2.0)
+    parser.add_argument('--no-symmetries', action='store_true', help="don't train on the 8 images of each position")
+    args = parser.parse_args()
+
+    games = []
+    for path in args.records:
+        with open(path) as f:
+            reader = opening_book.read_arena_records if path.endswith('.jsonl') else opening_book.read_game_log
+            games.extend(reader(f))
+    own, opp, targets = training_positions(games)
+    evaluator, errors = fit(own, opp, targets, args.epochs, args.learning_rate,
+                            args.regularization, not args.no_symmetries)
+    evaluator.save(args.output)
+    print(f'{len(games)} games, {len(targets)} positions')
+    for phase, error in enumerate(errors):
+        if error is not None:
+            print(f'phase {phase}: RMSE {error:.2f} discs')
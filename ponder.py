@@ -0,0 +1,49 @@
+import threading
+
+
+class Ponderer:
+    '''
+    Thinks on the opponent's time. After we send a move, start() runs the
+    bot's ponder() on a background thread; the main thread meanwhile sits
+    in sock.recv, which releases the GIL. When our turn comes, take()
+    stops the thread and returns the precomputed answer for the new
+    position, if there is one (a ponder hit).
+    '''
+    def __init__(self, bot):
+        self.bot = bot
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.answers = {}
+        self.hits = 0
+        self.misses = 0
+
+    def start(self, state, time_left):
+        '''state is the position after our move, with the opponent to move.'''
+        self.stop()
+        self.answers = {}
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.bot.ponder,
+                                       args=(state, time_left, self.answers, self.stop_event),
+                                       daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.thread is None:
+            return
+        self.stop_event.set()
+        self.bot.interrupt()
+        self.thread.join()
+        self.thread = None
+
+    def take(self, state):
+        '''
+        Stops pondering and returns our answer to state if it was found
+        while pondering, otherwise None.
+        '''
+        self.stop()
+        move = self.answers.get((state.p1, state.p2, state.turn))
+        if move is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return move
@@ -0,0 +1,185 @@
+import argparse
+import json
+import random
+import numpy as np
+from bitboard import popcount
+from opening_book import replay
+from reversi_bot import ReversiBot, INF
+
+# How well a shallow search predicts a deeper one changes over the game, so
+# the regressions are fitted per stage, picked by the number of discs
+STAGES = 4
+STAGE_OF_DISCS = tuple(min(max(discs - 4, 0) * STAGES // 60, STAGES - 1) for discs in range(65))
+
+DEFAULT_PAIRS = ((2, 0), (3, 1), (4, 2), (5, 3))
+
+
+class ProbCut:
+    '''
+    Multi-ProbCut model for ReversiBot.negamax. For a node searched to
+    "depth" plies, each check (shallow, a, b, sigma) says the depth-ply
+    value is about a * v + b, v being the "shallow"-ply value, with a
+    residual standard deviation of sigma. The search cuts a node when a
+    shallow search puts the predicted value more than "threshold" sigmas
+    past the window. A depth can have several checks; the cheapest goes
+    first.
+    '''
+    def __init__(self, checks=(), threshold=1.5):
+        self.threshold = threshold
+        self.checks = {} # (depth, stage) -> [(shallow, a, b, sigma)]
+        for check in checks:
+            self.add(**check)
+
+    def add(self, depth, shallow, stage, a, b, sigma, samples=None):
+        checks = self.checks.setdefault((depth, stage), [])
+        checks.append((shallow, a, b, sigma))
+        checks.sort()
+
+    def lookup(self, depth, discs):
+        '''The checks for a node of depth plies with discs on the board, or None.'''
+        return self.checks.get((depth, STAGE_OF_DISCS[discs]))
+
+    def to_dict(self):
+        return {
+            'threshold': self.threshold,
+            'checks': [{'depth': depth, 'shallow': shallow, 'stage': stage, 'a': a, 'b': b, 'sigma': sigma}
+                       for (depth, stage), checks in sorted(self.checks.items())
+                       for shallow, a, b, sigma in checks],
+        }
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        return cls(data['checks'], data['threshold'])
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=1)
+
+
+def record_positions(games):
+    '''Yields the position before every move of the games (move lists as read by opening_book).'''
+    for moves in games:
+        positions, _ = replay(moves)
+        for state, _ in positions:
+            yield state
+
+
+def sample_positions(states, count, min_empties=15, seed=0):
+    '''
+    Picks up to "count" of the states uniformly, reservoir style, so game
+    records are streamed rather than loaded. Only positions after the
+    opening with a move to make and at least min_empties empty squares
+    are kept, since the endgame solver takes over below that.
+    '''
+    rng = random.Random(seed)
+    sample = []
+    seen = 0
+    for state in states:
+        if not state.center_filled() or state.empties() < min_empties or not state.valid_moves_mask():
+            continue
+        seen += 1
+        if len(sample) < count:
+            sample.append(state)
+        else:
+            index = rng.randrange(seen)
+            if index < count:
+                sample[index] = state
+    return sample
+
+
+def search_values(states, depths, evaluator=None):
+    '''
+    Returns an array with the full-window negamax value of every state at
+    every depth, for the player to move, searched with plain alpha-beta
+    (no ProbCut or reductions). Depths are searched shallowest first with
+    one table per position, like iterative deepening would.
+    '''
+    depths = sorted(depths)
+    values = np.zeros((len(states), max(depths) + 1))
+    for row, state in enumerate(states):
+        bot = ReversiBot(state.turn, tt_size_bits=14, evaluator=evaluator)
+        state = state.copy().with_hash()
+        for depth in depths:
+            values[row, depth] = bot.negamax(state, depth, -INF, INF)
+    return values
+
+
+def fit(values, stages, pairs, min_samples=20):
+    '''
+    Fits deep = a * shallow + b by least squares for every (deep, shallow)
+    pair and stage, from search_values output and each position's stage.
+    Stages with fewer than min_samples positions, or where the shallow
+    value doesn't predict the deep one (a <= 0), get no check.
+    '''
+    checks = []
+    for depth, shallow in pairs:
+        for stage in range(STAGES):
+            rows = stages == stage
+            if rows.sum() < min_samples:
+                continue
+            x, y = values[rows, shallow], values[rows, depth]
+            a, b = np.polyfit(x, y, 1)
+            if a <= 0:
+                continue
+            sigma = float(np.std(y - (a * x + b)))
+            checks.append({'depth': depth, 'shallow': shallow, 'stage': stage, 'a': float(a),
+                           'b': float(b), 'sigma': sigma, 'samples': int(rows.sum())})
+    return checks
+
+
+def calibrate(states, pairs=DEFAULT_PAIRS, threshold=1.5, evaluator=None, min_samples=20):
+    '''Searches the positions and returns (ProbCut, fitted checks).'''
+    depths = {depth for pair in pairs for depth in pair}
+    values = search_values(states, depths, evaluator)
+    stages = np.array([STAGE_OF_DISCS[popcount(state.p1 | state.p2)] for state in states])
+    checks = fit(values, stages, pairs, min_samples)
+    return ProbCut(checks, threshold), checks
+
+
+def parse_pair(text):
+    depth, _, shallow = text.partition(':')
+    depth, shallow = int(depth), int(shallow)
+    if not 0 <= shallow < depth:
+        raise argparse.ArgumentTypeError(f'{text}: the shallow depth must be below the deep one')
+    return depth, shallow
+
+
+# call: python probcut.py probcut.json games.jsonl Reversi/ReversiServer/GameLog.txt --positions 1000
+if __name__ == '__main__':
+    import arena
+    import opening_book
+    from pattern_eval import PatternEvaluator
+    parser = argparse.ArgumentParser(description='Calibrate Multi-ProbCut from shallow and deep searches.')
+    parser.add_argument('output')
+    parser.add_argument('records', nargs='*', help='arena .jsonl output or server GameLog files; '
+                                                   'random openings are used if none are given')
+    parser.add_argument('--positions', type=int, default=1000)
+    parser.add_argument('--pairs', type=parse_pair, nargs='+', default=list(DEFAULT_PAIRS),
+                        help='deep:shallow depth pairs, e.g. 4:2 5:1 5:3')
+    parser.add_argument('--threshold', type=float, default=1.5, help='sigmas past the window needed to cut')
+    parser.add_argument('--patterns', help='pattern_eval weights to search with, as the bot will')
+    parser.add_argument('--min-samples', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.records:
+        def positions():
+            for path in args.records:
+                with open(path) as f:
+                    reader = opening_book.read_arena_records if path.endswith('.jsonl') else opening_book.read_game_log
+                    yield from record_positions(reader(f))
+    else:
+        def positions():
+            rng = random.Random(args.seed)
+            for seed in range(args.positions):
+                yield arena.random_opening(seed, rng.randint(8, 44))[0]
+    states = sample_positions(positions(), args.positions, seed=args.seed)
+    evaluator = PatternEvaluator.load(args.patterns) if args.patterns else None
+    model, checks = calibrate(states, args.pairs, args.threshold, evaluator, args.min_samples)
+    model.save(args.output)
+    print(f'{len(states)} positions')
+    for check in checks:
+        print(f"depth {check['depth']} from {check['shallow']}, stage {check['stage']}: "
+              f"a {check['a']:.3f} b {check['b']:.1f} sigma {check['sigma']:.1f} ({check['samples']} positions)")
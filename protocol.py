@@ -0,0 +1,117 @@
+import numpy as np
+
+# The server ends the game with a lone -999 line
+GAME_OVER = -999
+
+# A state message is turn, round, both clocks and the 64 board cells, one
+# per line, followed by the blank line Java's println adds. After -999 the
+# server sends a final message of winner, both clocks and the final board.
+HEADER_FIELDS = 4
+FINAL_HEADER_FIELDS = 3
+
+
+class MessageBuffer:
+    '''
+    Incremental parser for the server's newline-separated messages. Bytes
+    are fed in as they arrive, in whatever chunks TCP delivers them, and
+    next_message() returns complete messages one at a time, so a message
+    split across segments or coalesced with the next one is handled the
+    same as one that arrived alone.
+    '''
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        self.buffer += data
+
+    def skip_blank_lines(self):
+        buf = self.buffer
+        pos = 0
+        while pos < len(buf) and buf[pos] in b' \r\n':
+            pos += 1
+        if pos:
+            del buf[:pos]
+
+    def next_line(self):
+        '''Returns the next non-blank line as a string, or None if incomplete.'''
+        self.skip_blank_lines()
+        end = self.buffer.find(b'\n')
+        if end < 0:
+            return None
+        line = self.buffer[:end].decode('utf-8').strip()
+        del self.buffer[:end + 1]
+        return line
+
+    def next_message(self):
+        '''
+        Returns (turn, round, t1, t2, cells) for the next complete state
+        message, where cells is a flat array of the 64 values in the
+        server's row order. The game-over message returns
+        (GAME_OVER, None, None, None, None). Returns None if the buffer
+        doesn't hold a complete message yet.
+        '''
+        self.skip_blank_lines()
+        buf = self.buffer
+        end = buf.find(b'\n')
+        if end < 0:
+            return None
+        if int(buf[:end]) == GAME_OVER:
+            del buf[:end + 1]
+            return GAME_OVER, None, None, None, None
+
+        fields = self.take_fields(HEADER_FIELDS)
+        if fields is None:
+            return None
+        (turn, round, t1, t2), cells = fields
+        return int(turn), int(round), float(t1), float(t2), cells
+
+    def next_final(self):
+        '''
+        Returns (winner, t1, t2, cells) for the final message the server
+        sends after -999, or None if it hasn't fully arrived.
+        '''
+        self.skip_blank_lines()
+        fields = self.take_fields(FINAL_HEADER_FIELDS)
+        if fields is None:
+            return None
+        (winner, t1, t2), cells = fields
+        return int(winner), float(t1), float(t2), cells
+
+    def take_fields(self, header_count):
+        '''
+        Removes and returns (header tokens, cells) for a message with
+        header_count header lines and 64 cell lines, if it is complete.
+        '''
+        buf = self.buffer
+        header_end = -1
+        for _ in range(header_count):
+            header_end = buf.find(b'\n', header_end + 1)
+            if header_end < 0:
+                return None
+        message_end = header_end
+        for _ in range(64):
+            message_end = buf.find(b'\n', message_end + 1)
+            if message_end < 0:
+                return None
+
+        header = buf[:header_end].split()
+        # The cells are parsed straight from the bytes, without a list of strings
+        cells = np.fromstring(buf[header_end + 1:message_end].decode('ascii'), dtype=int, sep='\n')
+        del buf[:message_end + 1]
+        return header, cells
+
+
+def format_message(header, cells):
+    '''
+    Encodes a server message: the header fields and the 64 cells (in the
+    server's row order) one per line, plus the blank line println adds.
+    '''
+    return ''.join(f'{field}\n' for field in list(header) + list(cells)).encode('ascii') + b'\n'
+
+
+def format_move(move):
+    '''
+    Encodes a (row, col) move in the client's board orientation. The 7 - row
+    is necessary because of the way the server does indexing.
+    '''
+    return (str(7 - move[0]) + '\n' + str(move[1]) + '\n').encode('utf-8')
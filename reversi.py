@@ -1,40 +1,143 @@
 import numpy as np
 import reversi_bot
+import bitboard
+import protocol
+from ponder import Ponderer
+from search_stats import TelemetryLog
+from bitboard import PASS
+from opening_book import OpeningBook
+from pattern_eval import PatternEvaluator
+import json
 import socket
 import sys
 import time
 
 class ReversiServerConnection:
-    def __init__(self, host, bot_move_num):
+    def __init__(self, host, bot_move_num, port=None):
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        server_address = (host, 3333 + bot_move_num)
+        # Send each move as soon as it is written instead of waiting to
+        # coalesce it with more data
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        # The server listens for player N on port 3333 + N unless told otherwise
+        server_address = (host, port if port is not None else 3333 + bot_move_num)
         self.sock.connect(server_address)
-        self.sock.recv(1024)
+        self.messages = protocol.MessageBuffer()
+        self.received_at = None
+        self.latencies = [] # seconds from receiving a state to sending our move
 
-    def get_game_state(self):
-        server_msg = self.sock.recv(1024).decode('utf-8').split('\n')
+        # The server greets us with our player number and the game length
+        self.greeting = self.read(self.messages.next_line)
+
+    def read(self, parse):
+        '''Receives until parse() returns something other than None.'''
+        result = parse()
+        while result is None:
+            data = self.sock.recv(4096)
+            if not data:
+                raise ConnectionError('server closed the connection')
+            self.messages.feed(data)
+            result = parse()
+        return result
 
-        turn = int(server_msg[0])
+    def get_game_state(self):
+        turn, round, t1, t2, cells = self.read(self.messages.next_message)
+        self.received_at = time.perf_counter()
 
         # If the game is over
-        if turn == -999:
+        if turn == protocol.GAME_OVER:
             return ReversiGameState(None, turn)
 
         # Flip is necessary because of the way the server does indexing
-        board = np.flip(np.array([int(x) for x in server_msg[4:68]]).reshape(8, 8), 0)
+        board = np.flip(cells.reshape(8, 8), 0)
 
-        return ReversiGameState(board, turn)
+        return ReversiGameState(board, turn, round, t1, t2)
 
     def send_move(self, move):
-        # The 7 - bit is necessary because of the way the server does indexing
-        move_str = str(7 - move[0]) + '\n' + str(move[1]) + '\n'
-        self.sock.send(move_str.encode('utf-8'))
+        self.sock.sendall(protocol.format_move(move))
+        if self.received_at is not None:
+            self.latencies.append(time.perf_counter() - self.received_at)
+
+    def close(self):
+        self.sock.close()
+
+class GameRecorder:
+    '''
+    Works out the moves of the game from the boards the server sends after
+    every move and, when the game ends, appends them to a JSONL file in
+    the arena's record format, which game_records.py reads. A move's time
+    is what it took off the mover's clock. Its depth is only known for the
+    bot's own moves, and is 0 for book, opening and endgame moves.
+    '''
+    def __init__(self, path, player):
+        self.path = path
+        self.player = player
+        self.state = bitboard.BitboardState(0, 0, 1)
+        self.clocks = None
+        self.moves = []
+        self.times = []
+        self.depths = []
+        self.depth = None # of the bot's last move, until the server shows it
+
+    def observe(self, state):
+        p1, p2 = bitboard.board_to_bitboards(state.board)
+        placed = (p1 | p2) & ~(self.state.p1 | self.state.p2)
+        clocks = (state.t1, state.t2)
+        turn = self.state.turn
+        # Re-sent states place nothing
+        if bitboard.popcount(placed) == 1:
+            square = placed.bit_length() - 1
+            player = 1 if p1 & placed else 2
+            if player != self.state.turn:
+                self.moves.append(PASS)
+                self.times.append(None)
+                self.depths.append(None)
+            elapsed = None
+            if self.clocks is not None:
+                elapsed = round(self.clocks[player - 1] - clocks[player - 1], 4)
+            self.moves.append(square)
+            self.times.append(elapsed)
+            self.depths.append(self.depth if player == self.player else None)
+            self.depth = None
+            turn = 3 - player
+        self.state = bitboard.BitboardState(p1, p2, turn)
+        self.clocks = clocks
+
+    def write(self):
+        record = {
+            'player': self.player,
+            # A loss on time isn't visible from the boards
+            'winner': self.state.determine_winner(),
+            'plies': len(self.moves),
+            'moves': self.moves,
+            'times': self.times,
+            'depths': self.depths,
+        }
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(record) + '\n')
 
 class ReversiGame:
-    def __init__(self, host, bot_move_num):
+    def __init__(self, host, bot_move_num, ponder=False, telemetry=None, profile_dir=None, book=None,
+                 patterns=None, port=None, record=None, workers=1):
         self.bot_move_num = bot_move_num
-        self.server_conn = ReversiServerConnection(host, bot_move_num)
-        self.bot = reversi_bot.ReversiBot(bot_move_num)
+        self.server_conn = ReversiServerConnection(host, bot_move_num, port)
+        # workers above 1 splits each search over that many processes
+        self.bot = reversi_bot.ReversiBot(bot_move_num, workers=workers)
+        # With pondering the bot keeps searching while the opponent thinks
+        self.ponderer = Ponderer(self.bot) if ponder else None
+        # telemetry is a file that gets one JSON line of search stats per move
+        self.telemetry = None
+        if telemetry is not None:
+            self.telemetry = TelemetryLog(telemetry)
+            self.bot.collect_stats = True
+        self.bot.profile_dir = profile_dir
+        # book is an opening book file, mapped into memory once here
+        if book is not None:
+            self.bot.book = OpeningBook(book)
+        # patterns is a weight file for the pattern evaluator
+        if patterns is not None:
+            self.bot.evaluator = PatternEvaluator.load(patterns)
+        # record is a JSONL file that gets the game's moves when it ends
+        self.recorder = GameRecorder(record, bot_move_num) if record is not None else None
 
     def play(self):
         while True:
@@ -42,20 +145,107 @@ class ReversiGame:
 
             # If the game is over
             if state.turn == -999:
+                if self.ponderer is not None:
+                    self.ponderer.stop()
+                if self.telemetry is not None:
+                    self.telemetry.close()
+                if self.recorder is not None:
+                    self.recorder.write()
+                self.bot.close()
+                self.server_conn.close()
                 time.sleep(1)
                 sys.exit()
 
+            if self.recorder is not None:
+                self.recorder.observe(state)
+
             # If it is the bot's turn
             if state.turn == self.bot_move_num:
-                move = self.bot.make_move(state)
+                move = None
+                if self.ponderer is not None:
+                    move = self.ponderer.take(bitboard.as_bitboard(state))
+                ponder_hit = move is not None
+                if move is None:
+                    move = self.bot.make_move(state)
                 #move = self.bot.monte_carlo_move(state)
                 self.server_conn.send_move(move)
+                if self.recorder is not None:
+                    self.recorder.depth = 0 if ponder_hit else self.bot.depth_reached
+
+                if self.telemetry is not None:
+                    stats = self.bot.stats.to_dict() if self.bot.stats is not None and not ponder_hit else {}
+                    self.telemetry.write(round=state.round, player=self.bot_move_num,
+                                         time_left=state.time_remaining(self.bot_move_num),
+                                         move=list(move), ponder_hit=ponder_hit,
+                                         latency=round(self.server_conn.latencies[-1], 6),
+                                         stats=stats)
+
+                if self.ponderer is not None:
+                    after = bitboard.as_bitboard(state).apply_move(move)
+                    self.ponderer.start(after, state.time_remaining(self.bot_move_num))
+
+# Ray tables for the numpy board. RAYS[square, direction] lists the squares
+# met walking from square (row * 8 + col) in that direction, padded with
+# OFF_BOARD: the index of an extra cell appended to the flattened board,
+# which never holds a stone.
+DIRECTIONS = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+OFF_BOARD = 64
+CENTER_SQUARES = np.array([27, 28, 35, 36])
+
+
+def build_rays():
+    rays = np.full((64, len(DIRECTIONS), 7), OFF_BOARD, dtype=np.intp)
+    for square in range(64):
+        for direction, (ydir, xdir) in enumerate(DIRECTIONS):
+            row, col = divmod(square, 8)
+            for step in range(7):
+                row += ydir
+                col += xdir
+                if not (0 <= row < 8 and 0 <= col < 8):
+                    break
+                rays[square, direction, step] = row * 8 + col
+    return rays
+
+
+def ray_flip_count(code):
+    '''
+    Stones flipped along a ray whose cells, nearest first, are the base 3
+    digits of code (0 empty or off the board, 1 ours, 2 the opponent's).
+    '''
+    digits = [code // 3 ** step % 3 for step in range(7)]
+    run = 0
+    while run < 7 and digits[run] == 2:
+        run += 1
+    return run if 0 < run < 7 and digits[run] == 1 else 0
+
+
+RAYS = build_rays()
+RAY_STEPS = np.arange(7)
+RAY_WEIGHTS = 3 ** RAY_STEPS
+RAY_FLIPS = np.array([ray_flip_count(code) for code in range(3 ** 7)], dtype=np.int8)
+# RELATIVE[turn][cell] recodes a board cell as a ray digit for turn; the
+# -1 of the OFF_BOARD cell picks the last entry
+RELATIVE = (None, np.array([0, 1, 2, 0]), np.array([0, 2, 1, 0]))
+
 
 class ReversiGameState:
-    def __init__(self, board, turn):
+    def __init__(self, board, turn, round=None, t1=None, t2=None):
         self.board_dim = 8 # Reversi is played on an 8x8 board
         self.board = board
         self.turn = turn # Whose turn is it
+        self.round = round # Number of moves played so far
+        self.t1 = t1 # Seconds left on player 1's clock
+        self.t2 = t2 # Seconds left on player 2's clock
+        # move_flip_counts() result and the (board bytes, turn) it was computed for
+        self.flips = None
+        self.flips_key = None
+
+    def time_remaining(self, player):
+        '''
+        Returns the seconds left on player's clock, or None if the state did
+        not come from the server.
+        '''
+        return self.t1 if player == 1 else self.t2
 
     def capture_will_occur(self, row, col, xdir, ydir, could_capture=0):
         # We shouldn't be able to leave the board
@@ -96,24 +286,55 @@ class ReversiGameState:
                     if self.capture_will_occur(row + ydir, col + xdir, xdir, ydir):
                         return True
 
-    def get_valid_moves(self):
-        valid_moves = []
+    def move_flip_counts(self):
+        '''
+        Returns (moves, counts): {(row, col): i} for every valid move in
+        row-major order, and an array whose row i holds the stones that move
+        flips in each of the 8 DIRECTIONS. All empty squares are done at
+        once: their rays are gathered from RAYS, each ray's contents are
+        packed into a base 3 code and RAY_FLIPS turns the code into the
+        number of stones it captures. The result is cached until the board
+        or the turn changes.
+        '''
+        key = (self.board.tobytes(), self.turn)
+        if key == self.flips_key:
+            return self.flips
 
+        cells = np.append(self.board.ravel(), -1)
+        empties = np.flatnonzero(cells[:64] == 0)
         # If the middle four squares aren't taken the remaining ones are all
         # that is available
-        if 0 in self.board[3:5, 3:5]:
-            for row in range(3, 5):
-                for col in range(3, 5):
-                    if self.board[row, col] == 0:
-                        valid_moves.append((row, col))
+        if np.count_nonzero(cells[CENTER_SQUARES]) < 4:
+            legal_squares = [square for square in CENTER_SQUARES.tolist() if cells[square] == 0]
+            counts = np.zeros((len(legal_squares), len(DIRECTIONS)), dtype=np.int8)
         else:
-            for row in range(self.board_dim):
-                for col in range(self.board_dim):
-                    if self.is_valid_move(row, col):
-                        valid_moves.append((row, col))
+            counts = RAY_FLIPS[RELATIVE[self.turn][cells][RAYS[empties]] @ RAY_WEIGHTS]
+            # A row of 8 int8 counts read as one uint64 is nonzero exactly
+            # when some direction captures, which beats counts.any(axis=1)
+            legal = counts.view(np.uint64)[:, 0] != 0
+            legal_squares = empties[legal].tolist()
+            counts = counts[legal]
+        moves = {divmod(square, 8): i for i, square in enumerate(legal_squares)}
+
+        self.flips = moves, counts
+        self.flips_key = key
+        return self.flips
+
+    def get_valid_moves(self):
+        return list(self.move_flip_counts()[0])
+
+    def get_flips(self, move):
+        '''Returns the flat indices (row * 8 + col) of the stones the valid move flips.'''
+        moves, counts = self.move_flip_counts()
+        return RAYS[move[0] * 8 + move[1]][RAY_STEPS < counts[moves[move], :, None]]
+
+    def apply_move(self, move):
+        '''Returns the state after the player to move plays the valid move (row, col).'''
+        board = self.board.copy()
+        board.reshape(-1)[self.get_flips(move)] = self.turn
+        board[move] = self.turn
+        return ReversiGameState(board, 3 - self.turn)
 
-        return valid_moves
-    
     def determine_winner(self):
         """
         Determines the winner based on the number of pieces on the board.
@@ -1,12 +1,89 @@
-import numpy as np
+import math
 import random as rand
+import time
+import numpy as np
 import reversi
+import bitboard
+from time_manager import TimeManager, SearchTimeout
+from transposition import TranspositionTable, EXACT, LOWER, UPPER
+from move_ordering import MoveOrderer
+from evaluation import WeightedEvaluator
+from endgame import EndgameSolver
+from mcts import MCTS, DEFAULT_MAX_NODES
+from search_stats import instrumented_move
+import parallel
+
+INF = float('inf')
+MIN_BATCH = 3 # fewer children left than this are scored one at a time
 
 class ReversiBot:
-    def __init__(self, move_num):
+    def __init__(self, move_num, time_manager=None, tt_size_bits=17, evaluator=None, workers=1):
         self.move_num = move_num # aka player
         self.opponent = 3 - move_num
-        self.max_depth = 3
+        self.max_depth = 3 # used when the state carries no clock
+        self.time_manager = time_manager or TimeManager()
+        self.tt = TranspositionTable(tt_size_bits) # kept between moves
+        self.orderer = MoveOrderer()
+        self.evaluator = evaluator or WeightedEvaluator()
+        self.aspiration_window = 30
+        self.endgame = EndgameSolver()
+        self.endgame_empties = 12 # solve exactly at or below this many empties
+        self.wld_empties = 14 # prove win/loss/draw at or below this many
+        self.book = None # an opening_book.OpeningBook to try before searching
+        self.batch_frontier = False # score the leaves under depth 1 nodes with evaluate_many
+        self.probcut = None # a probcut.ProbCut model to cut null-window nodes early with
+        self.lmr = False # search late moves of a node with a reduced depth first
+        self.lmr_min_depth = 3 # only reduce at nodes with at least this many plies to go
+        self.lmr_full_moves = 3 # the first moves in order are never reduced
+        self.workers = workers # more than one splits the root moves over processes
+        self.pool = None # created on first use and kept for the whole game
+        self.deadline = None
+        self.nodes = 0
+        self.depth_reached = 0
+        self.stopped = False # set from another thread to end a ponder search
+        self.collect_stats = False # fill in self.stats for every move
+        self.stats = None # SearchStats of the last move, if collect_stats is on
+        self.profile_dir = None # write a cProfile dump per move here if set
+        self.profiled_moves = 0
+        self.stats_start = None
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def ponder(self, state, time_left, answers, stop_event):
+        '''
+        Runs on a background thread while the opponent thinks. state is the
+        position after our move. For each opponent reply, most likely first,
+        our answer is searched as if it were our turn and stored in answers
+        under the resulting position. Whatever isn't finished still leaves
+        its results in the transposition table.
+        '''
+        self.stopped = False
+        self.stats = None # pondering isn't part of any move's stats
+        state = state.with_hash()
+        if time_left is None or not state.center_filled() or \
+                state.empties() - 1 <= self.wld_empties:
+            return
+
+        entry = self.tt.probe(state.key)
+        hash_square = entry[3] if entry is not None else None
+        for square in self.orderer.order(state.valid_moves_mask(), hash_square, 0, state.turn):
+            if stop_event.is_set():
+                return
+            child = state.play(square)
+            if not child.valid_moves_mask():
+                continue
+            self.tt.new_search()
+            budget, hard_limit = self.move_budget(child, time_left)
+            results = self.deepen(child, self.order_root_moves(child), budget, hard_limit)
+            if results and not self.stopped:
+                answers[(child.p1, child.p2, child.turn)] = results[-1][0]
+
+    def interrupt(self):
+        '''Makes a running search (e.g. on the ponder thread) give up soon.'''
+        self.stopped = True
 
     def make_move(self, state):
         '''
@@ -26,126 +103,420 @@ class ReversiBot:
         moves for that state is returned in the form of a list of tuples.
 
         Move should be a tuple (row, col) of the move you want the bot to make.
+
+        Internally the search runs on a bitboard.BitboardState, which is
+        built once here from the numpy board.
         '''
+        return instrumented_move(self, self.choose_move, state)
+
+    def choose_move(self, state):
+        self.stopped = False
+        self.depth_reached = 0 # stays 0 unless the heuristic search runs here
+        time_left = None
+        if isinstance(state, reversi.ReversiGameState):
+            time_left = state.time_remaining(self.move_num)
+        state = bitboard.as_bitboard(state).with_hash()
         valid_moves = state.get_valid_moves()
-        
-        if not valid_moves: 
+
+        if not valid_moves:
             return None
 
+        if self.book is not None:
+            move = self.book.choose(state)
+            if move is not None:
+                self.note(source='book')
+                return move
+
         # avoid errors by handling first four moves here
-        center_moves = [(3, 3), (3, 4), (4, 3), (4, 4)]
-        if any(state.board[row, col] == 0 for row, col in center_moves):
-            for move in center_moves:
-                if move in valid_moves:
-                    return move  
+        if not state.center_filled():
+            self.note(source='opening')
+            return valid_moves[0]
+
+        if state.empties() <= self.wld_empties:
+            start = time.perf_counter()
+            move = self.solve_endgame(state, time_left)
+            self.note(source='endgame', endgame_nodes=self.endgame.nodes, endgame_seconds=self.endgame.elapsed)
+            if move is not None:
+                return move
+            if time_left is not None:
+                time_left -= time.perf_counter() - start
+
+        self.tt.new_search()
+        self.orderer.new_search()
+        valid_moves = self.order_root_moves(state)
+
+        if self.workers > 1 and len(valid_moves) > 1:
+            self.note(source='parallel')
+            return self.parallel_search(state, valid_moves, time_left)
+
+        self.note(source='search')
+        # Without a clock (e.g. local testing) search to a fixed depth
+        if time_left is None:
+            self.deadline = None
+            best_move, _ = self.search_root(state, valid_moves, self.max_depth)
+            self.depth_reached = self.max_depth + 1
+            return best_move if best_move is not None else rand.choice(valid_moves)
+
+        return self.iterative_deepening(state, valid_moves, time_left)
+
+    def solve_endgame(self, state, time_left):
+        '''
+        Plays perfectly near the end of the game. Returns None if the solver
+        ran out of time, or if it only proved that every move loses, in
+        which case the heuristic search picks the move that fights best.
+        '''
+        deadline = None
+        if time_left is not None:
+            deadline = time.perf_counter() + self.time_manager.budget(time_left, state.empties())
+
+        try:
+            if state.empties() <= self.endgame_empties:
+                square, _ = self.endgame.solve(state, deadline)
+            else:
+                square, score = self.endgame.solve_wld(state, deadline)
+                if score < 0:
+                    square = None
+        except SearchTimeout:
+            return None
 
-        best_move = None
-        best_value = float('-inf')
-        alpha = float('-inf')
-        beta = float('inf')
+        if square is None:
+            return None
+        return bitboard.square_to_move(square)
+
+    def iterative_deepening(self, state, valid_moves, time_left):
+        '''
+        Searches one ply deeper at a time until the move's time budget is
+        spent and returns the best move of the deepest completed iteration.
+        An iteration that runs past the hard deadline is abandoned.
+        '''
+        budget, hard_limit = self.move_budget(state, time_left)
+        results = self.deepen(state, valid_moves, budget, hard_limit)
+        return results[-1][0] if results else valid_moves[0]
 
-        for move in valid_moves:
-            new_state = self.simulate_move(state, move, self.move_num)
-            move_value = self.minmax(new_state, self.max_depth, False, alpha, beta)
+    def parallel_search(self, state, valid_moves, time_left):
+        '''
+        Splits the ordered root moves over the worker pool. Each worker runs
+        its own iterative deepening (or fixed-depth search without a clock)
+        and the best move at the deepest depth all workers finished wins.
+        '''
+        if self.pool is None:
+            self.pool = parallel.SearchPool(self.workers)
+
+        budget = hard_limit = fixed_depth = None
+        if time_left is None:
+            fixed_depth = self.max_depth
+        else:
+            budget, hard_limit = self.move_budget(state, time_left)
+
+        tasks = [(state.p1, state.p2, state.turn, self.move_num, moves,
+                  budget, hard_limit, fixed_depth, self.evaluator, self.probcut, self.lmr)
+                 for moves in parallel.split_round_robin(valid_moves, self.workers)]
+        move = parallel.merge_alphabeta_results(self.pool.map(parallel.alphabeta_worker, tasks))
+        return move if move is not None else valid_moves[0]
+
+    def move_budget(self, state, time_left):
+        '''
+        Returns the soft budget for this move and a hard limit that lets an
+        iteration overrun the budget a little but never eats into the
+        clock's safety margin.
+        '''
+        budget = self.time_manager.budget(time_left, state.empties())
+        hard_limit = min(budget * 2, max(time_left - self.time_manager.safety_margin, budget))
+        return budget, hard_limit
 
-            if move_value is not None and move_value > best_value:  
+    def deepen(self, state, valid_moves, budget, hard_limit):
+        '''
+        The iterative-deepening loop. Returns one (move, value) per completed
+        iteration, shallowest first.
+
+        From the third iteration on the root is searched with an aspiration
+        window around the previous score and re-searched with an open
+        bound on whichever side it fails.
+        '''
+        start = time.perf_counter()
+        self.deadline = start + hard_limit
+        valid_moves = list(valid_moves)
+
+        results = []
+        best_value = None
+        self.depth_reached = 0
+        last_iteration = 0.0
+        for depth in range(state.empties()):
+            iteration_start = time.perf_counter()
+            iteration_nodes = self.nodes
+            alpha, beta = -INF, INF
+            if depth >= 2 and best_value is not None:
+                alpha = best_value - self.aspiration_window
+                beta = best_value + self.aspiration_window
+            try:
+                while True:
+                    move, value = self.search_root(state, valid_moves, depth, alpha, beta)
+                    if value <= alpha:
+                        alpha = -INF
+                    elif value >= beta:
+                        beta = INF
+                    else:
+                        break
+            except SearchTimeout:
+                break
+            if move is not None:
+                best_value = value
+                # Search the previous best move first next iteration
+                valid_moves.remove(move)
+                valid_moves.insert(0, move)
+            results.append((move, value))
+            self.depth_reached = depth + 1
+
+            now = time.perf_counter()
+            last_iteration = now - iteration_start
+            if self.stats is not None:
+                self.stats.iterations.append((depth + 1, last_iteration, self.nodes - iteration_nodes))
+            if not self.time_manager.should_start_iteration(now - start, last_iteration, budget):
+                break
+
+        self.deadline = None
+        return results
+
+    def order_root_moves(self, state):
+        entry = self.tt.probe(state.key)
+        hash_square = entry[3] if entry is not None else None
+        squares = self.orderer.order(state.valid_moves_mask(), hash_square, 0, state.turn)
+        return [bitboard.square_to_move(square) for square in squares]
+
+    def search_root(self, state, valid_moves, depth, alpha=-INF, beta=INF):
+        '''
+        Principal-variation search over the root moves, in the given order.
+        Returns the best move and its value for this bot; the value is a
+        bound rather than exact if it falls outside (alpha, beta).
+        '''
+        alpha_orig = alpha
+        best_move = None
+        best_value = -INF
+
+        # The whole search makes and unmakes moves on this one board
+        board = state.copy()
+        for i, move in enumerate(valid_moves):
+            square = bitboard.move_to_square(move)
+            flipped = board.make_move(square)
+            if i == 0:
+                move_value = -self.negamax(board, depth, -beta, -alpha, 1)
+            else:
+                move_value = -self.negamax(board, depth, -alpha - 1, -alpha, 1)
+                if alpha < move_value < beta:
+                    move_value = -self.negamax(board, depth, -beta, -move_value, 1)
+            board.unmake_move(square, flipped)
+
+            if move_value > best_value:
                 best_value = move_value
-                best_move = move 
+                best_move = move
 
             alpha = max(alpha, best_value)
+            if alpha >= beta:
+                break
 
-        rand_choice = rand.choice(valid_moves) # moves randomly
+        if best_move is not None:
+            self.store(state.key, depth + 1, best_value, alpha_orig, beta,
+                       bitboard.move_to_square(best_move))
         # print(f"DEBUG: Player {self.move_num} placed at {best_move}")
+        return best_move, best_value
 
-        if best_move is not None:
-            return best_move
-        else:
-            return rand_choice
-    
     def minmax(self, state, depth, is_max_player, alpha, beta):
-        valid_moves = state.get_valid_moves()
-
-        if depth == 0 or not valid_moves:
-            return self.evaluate(state)
-            #return self.evaluate_lookup_table(state)
-
+        '''
+        Value of state for this bot. Kept for callers of the old minimax
+        interface; the search itself is negamax.
+        '''
         if is_max_player:
-            max_eval = float('-inf')
-            for move in valid_moves:
-                new_state = self.simulate_move(state, move, self.move_num)
-                eval_value = self.minmax(new_state, depth - 1, False, alpha, beta)
-                max_eval = max(max_eval, eval_value)
-                alpha = max(alpha, eval_value)
-                if beta <= alpha:
-                    break  # AB pruning
-            return max_eval 
+            return self.negamax(state, depth, alpha, beta)
+        return -self.negamax(state, depth, -beta, -alpha)
+
+    def negamax(self, state, depth, alpha, beta, ply=0):
+        '''
+        Fail-soft principal-variation search. Returns the value of state for
+        the player to move. After the first move every sibling is searched
+        with a null window and only re-searched if it beats alpha.
 
+        Children are visited with make_move/unmake_move on state itself,
+        which is back in its original position when this returns.
+        '''
+        self.nodes += 1
+        if self.deadline is not None and self.nodes & 255 == 0 \
+                and (self.stopped or time.perf_counter() > self.deadline):
+            raise SearchTimeout()
+
+        # Positions reached by another move order may already be searched
+        alpha_orig = alpha
+        hash_square = None
+        entry = self.tt.probe(state.key)
+        if entry is not None:
+            entry_depth, bound, score, hash_square, _ = entry
+            if entry_depth >= depth:
+                if bound == EXACT:
+                    return score
+                if bound == LOWER:
+                    alpha = max(alpha, score)
+                else:
+                    beta = min(beta, score)
+                if alpha >= beta:
+                    return score
+
+        moves = state.valid_moves_mask()
+
+        if depth == 0 or not moves:
+            own, opp = state.pieces(state.turn)
+            return self.evaluator.evaluate(own, opp, moves)
+
+        stats = self.stats
+        if stats is not None:
+            stats.expanded += 1
+            stats.children += bitboard.popcount(moves)
+
+        if depth == 1 and self.batch_frontier and state.center_filled():
+            return self.search_frontier(state, moves, alpha_orig, beta, hash_square, ply)
+
+        if self.probcut is not None and beta - alpha <= 1:
+            checks = self.probcut.lookup(depth, bitboard.popcount(state.p1 | state.p2))
+            if checks is not None:
+                value = self.probcut_search(state, checks, alpha, beta, ply)
+                if value is not None:
+                    return value
+
+        reduce = self.lmr and depth >= self.lmr_min_depth
+        best_value = -INF
+        best_square = None
+        for i, square in enumerate(self.orderer.order(moves, hash_square, ply, state.turn)):
+            flipped = state.make_move(square)
+            if i == 0:
+                value = -self.negamax(state, depth - 1, -beta, -alpha, ply + 1)
+            else:
+                if reduce and i >= self.lmr_full_moves:
+                    # A late move is expected to fail low; it gets the
+                    # full depth only if the reduced search says otherwise
+                    value = -self.negamax(state, depth - 2, -alpha - 1, -alpha, ply + 1)
+                    if stats is not None:
+                        stats.lmr_reductions += 1
+                    if value > alpha:
+                        if stats is not None:
+                            stats.lmr_researches += 1
+                        value = -self.negamax(state, depth - 1, -alpha - 1, -alpha, ply + 1)
+                else:
+                    value = -self.negamax(state, depth - 1, -alpha - 1, -alpha, ply + 1)
+                if alpha < value < beta:
+                    value = -self.negamax(state, depth - 1, -beta, -value, ply + 1)
+            state.unmake_move(square, flipped)
+
+            if value > best_value:
+                best_value = value
+                best_square = square
+                if value > alpha:
+                    alpha = value
+                    if alpha >= beta:
+                        self.orderer.record_cutoff(square, ply, depth, state.turn)
+                        if stats is not None:
+                            stats.record_cutoff(i)
+                        break  # AB pruning
+
+        self.store(state.key, depth, best_value, alpha_orig, beta, best_square)
+        return best_value
+
+    def probcut_search(self, state, checks, alpha, beta, ply):
+        '''
+        Multi-ProbCut for a null-window node. Each check predicts the
+        node's value from a shallower search as a * v + b, give or take
+        sigma. If the shallow value is far enough past beta (or alpha)
+        that the prediction clears it by threshold sigmas, the deep search
+        is skipped and the bound returned. Returns None if no check cuts.
+        '''
+        threshold = self.probcut.threshold
+        for shallow, a, b, sigma in checks:
+            bound = math.ceil((beta + threshold * sigma - b) / a)
+            if self.negamax(state, shallow, bound - 1, bound, ply) >= bound:
+                if self.stats is not None:
+                    self.stats.probcut_cuts += 1
+                return beta
+            bound = math.floor((alpha - threshold * sigma - b) / a)
+            if self.negamax(state, shallow, bound, bound + 1, ply) <= bound:
+                if self.stats is not None:
+                    self.stats.probcut_cuts += 1
+                return alpha
+        return None
+
+    def search_frontier(self, state, moves, alpha, beta, hash_square, ply):
+        '''
+        negamax for a depth 1 node, whose children are all leaves. The first
+        move in the usual order is scored on its own, since a well-ordered
+        node usually cuts off right there. If it doesn't, the node is likely
+        to need every child, so the rest are scored together: they are
+        built as arrays of packed bitboards and passed to one evaluate_many
+        call. The best move goes into the transposition table, so the next
+        iteration and the parent's re-searches try it first.
+        '''
+        own, opp = state.pieces(state.turn)
+        squares = self.orderer.order(moves, hash_square, ply, state.turn)
+        # Children are scored for the opponent, who moves next in them
+        child_own = []
+        child_opp = []
+        for square in squares:
+            flipped = bitboard.flips_mask(square, own, opp)
+            child_own.append(opp ^ flipped)
+            child_opp.append(own | flipped | 1 << square)
+
+        best_value = -INF
+        best_square = None
+        i = 0
+        while i < len(squares) and best_value < beta:
+            if i > 0 and len(squares) - i >= MIN_BATCH:
+                self.nodes += len(squares) - i
+                scores = self.evaluator.evaluate_many(np.array(child_own[i:], dtype=np.uint64),
+                                                      np.array(child_opp[i:], dtype=np.uint64))
+                best = int(np.argmin(scores))
+                if -scores[best] > best_value:
+                    best_value = -int(scores[best])
+                    best_square = squares[i + best]
+                break
+            self.nodes += 1
+            value = -self.evaluator.evaluate(child_own[i], child_opp[i])
+            if value > best_value:
+                best_value = value
+                best_square = squares[i]
+            i += 1
+
+        if best_value >= beta:
+            self.orderer.record_cutoff(best_square, ply, 1, state.turn)
+            if self.stats is not None:
+                self.stats.record_cutoff(squares.index(best_square))
+        self.store(state.key, 1, best_value, alpha, beta, best_square)
+        return best_value
+
+    def store(self, key, depth, value, alpha, beta, best_square):
+        if value <= alpha:
+            bound = UPPER
+        elif value >= beta:
+            bound = LOWER
         else:
-            min_eval = float('inf')
-            for move in valid_moves:
-                new_state = self.simulate_move(state, move, self.opponent)
-                eval_value = self.minmax(new_state, depth - 1, True, alpha, beta)
-                min_eval = min(min_eval, eval_value)
-                beta = min(beta, eval_value)
-                if beta <= alpha:
-                    break  # AB pruning
-            return min_eval
-        
-    def simulate_move(self, state, move, player):
-        new_board = np.copy(state.board)
-        new_board[move] = player  
-        
-        # flip opponent pieces in all directions
-        for xdir in range(-1, 2):
-            for ydir in range(-1, 2):
-                if xdir == ydir == 0:
-                    continue
-                if state.capture_will_occur(move[0] + ydir, move[1] + xdir, xdir, ydir):
-                    row, col = move
-                    while True:
-                        row += ydir
-                        col += xdir
-                        if state.board[row, col] == player:
-                            break
-                        new_board[row, col] = player
-
-        return reversi.ReversiGameState(new_board, 3 - player)  # switch turns    
+            bound = EXACT
+        self.tt.store(key, depth, bound, value, best_square)
 
     def evaluate(self, state):
-        if state.board is None:
-            return 0
-        
-        board = state.board
-        score = 0
-
-        # prioritize corners
-        corners = [(0, 0), (0, 7), (7, 0), (7, 7)]
-        for x, y in corners:
-            if board[x, y] == self.move_num:
-                score += 50  # high weight for corners
-            elif board[x, y] == self.opponent:
-                score -= 50
-
-        # prioritize edges
-        edges = [(0, y) for y in range(8)] + [(7, y) for y in range(8)] + \
-                [(x, 0) for x in range(8)] + [(x, 7) for x in range(8)]
-        for x, y in edges:
-            if board[x, y] == self.move_num:
-                score += 10
-            elif board[x, y] == self.opponent:
-                score -= 10
-
-        # number of moves available
-        my_moves = len(state.get_valid_moves())
-        opponent_moves = len(self.simulate_move(state, (0, 0), self.opponent).get_valid_moves())
-        score += (my_moves - opponent_moves) * 5
-
-        # count number of pieces
-        my_pieces = np.count_nonzero(board == self.move_num)
-        opponent_pieces = np.count_nonzero(board == self.opponent)
-        score += (my_pieces - opponent_pieces)
-
-        return score
+        '''Static value of state for this bot.'''
+        own, opp = state.pieces(self.move_num)
+        return self.evaluator.evaluate(own, opp)
+
+    def note(self, **fields):
+        '''Sets fields of this move's stats, if they are being collected.'''
+        if self.stats is not None:
+            for name, value in fields.items():
+                setattr(self.stats, name, value)
+
+    def begin_stats(self):
+        self.stats_start = (self.nodes, self.tt.probes, self.tt.hits)
+        self.depth_reached = 0
+
+    def end_stats(self):
+        nodes, probes, hits = self.stats_start
+        self.stats.nodes = self.nodes - nodes + self.stats.endgame_nodes
+        self.stats.tt_probes = self.tt.probes - probes
+        self.stats.tt_hits = self.tt.hits - hits
+        self.stats.depth = self.depth_reached
 
 
     #############################
@@ -154,68 +525,122 @@ class ReversiBot:
 
 ### exported to class for testing purposes
 class MonteCarloReversiBot:
-    def __init__(self, move_num):
+    def __init__(self, move_num, exploration=1.4, playouts=1000, time_manager=None,
+                 rollout_batch=None, workers=1, max_nodes=DEFAULT_MAX_NODES):
         self.move_num = move_num # aka player
         self.opponent = 3 - move_num
-        self.max_depth = 3
+        self.playouts = playouts # per move when the state carries no clock
+        self.time_manager = time_manager or TimeManager()
+        # tree is kept between moves, in a pool of at most max_nodes nodes;
+        # rollout_batch turns on vectorized playouts
+        self.mcts = MCTS(exploration, rollout_batch=rollout_batch, max_nodes=max_nodes)
+        self.max_nodes = max_nodes
+        self.exploration = exploration
+        self.rollout_batch = rollout_batch
+        self.workers = workers # more than one runs root-parallel MCTS
+        self.pool = None
+        self.collect_stats = False
+        self.stats = None
+        self.profile_dir = None
+        self.profiled_moves = 0
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def ponder(self, state, time_left, answers, stop_event):
+        '''
+        Keeps growing the tree from the position after our move while the
+        opponent thinks. The next make_move re-roots onto the opponent's
+        reply and reuses those playouts, so no answers are stored.
+        '''
+        if self.workers > 1 or not state.center_filled():
+            return
+        self.mcts.set_root(state)
+        while not stop_event.is_set():
+            self.mcts.search(max_playouts=64)
 
-    # monte carlo moves instead of AB pruning
-    # plays random games to find the move that wins the most
-    def make_move(self, state, simulations=50):
+    def interrupt(self):
+        pass
+
+    def make_move(self, state):
+        return instrumented_move(self, self.choose_move, state)
+
+    # UCT search instead of AB pruning. The tree from the previous move is
+    # reused when the new state is our move plus the opponent's reply.
+    def choose_move(self, state):
+        time_left = None
+        if isinstance(state, reversi.ReversiGameState):
+            time_left = state.time_remaining(self.move_num)
+        state = bitboard.as_bitboard(state)
         valid_moves = state.get_valid_moves()
         if not valid_moves:
             return None
-        
+
         # avoid errors by handling first four moves here
-        center_moves = [(3, 3), (3, 4), (4, 3), (4, 4)]
-        if any(state.board[row, col] == 0 for row, col in center_moves):
-            for move in center_moves:
-                if move in valid_moves:
-                    return move 
-
-        move_scores = {move: 0 for move in valid_moves}
-
-        for move in valid_moves:
-            for _ in range(simulations):
-                new_state = self.simulate_move(state, move, self.move_num)
-                winner = self.simulate_random_game(new_state)
-                if winner == self.move_num:
-                    move_scores[move] += 1
-
-        best_move = max(move_scores, key=move_scores.get)
+        if not state.center_filled():
+            self.note(source='opening')
+            return valid_moves[0]
+
+        budget = None
+        if time_left is not None:
+            budget = self.time_manager.budget(time_left, state.empties())
+
+        if self.workers > 1:
+            best_square = self.parallel_search(state, budget)
+        else:
+            reused = self.mcts.set_root(state)
+            if budget is None:
+                self.mcts.search(max_playouts=self.playouts)
+            else:
+                self.mcts.search(deadline=time.perf_counter() + budget)
+            best_square = self.mcts.best_square()
+            self.note(source='mcts', playouts=self.mcts.playouts, tree_reused=reused)
+            if self.stats is not None:
+                self.stats.tree_size = self.mcts.tree_size()
+                self.stats.pool = self.mcts.pool.occupancy()
+        if best_square is None:
+            return valid_moves[0]
+        best_move = bitboard.square_to_move(best_square)
         #print(f"DEBUG: MonteCarlo Bot (Player {self.move_num}) placed at {best_move}")
 
         return best_move
-    
-    def simulate_move(self, state, move, player):
-        new_board = np.copy(state.board)
-        new_board[move] = player  
-        
-        # flip opponent pieces in all directions
-        for xdir in range(-1, 2):
-            for ydir in range(-1, 2):
-                if xdir == ydir == 0:
-                    continue
-                if state.capture_will_occur(move[0] + ydir, move[1] + xdir, xdir, ydir):
-                    row, col = move
-                    while True:
-                        row += ydir
-                        col += xdir
-                        if state.board[row, col] == player:
-                            break
-                        new_board[row, col] = player
-
-        return reversi.ReversiGameState(new_board, 3 - player)  # switch turns
-
-    def simulate_random_game(self, state):
-        while True:
-            valid_moves = state.get_valid_moves()
-            if not valid_moves:
-                return self.determine_winner(state)
-            state = self.simulate_move(state, rand.choice(valid_moves), state.turn)
-
-    def determine_winner(self, state):
-        count_me = np.count_nonzero(state.board == self.move_num)
-        count_opponent = np.count_nonzero(state.board == self.opponent)
-        return self.move_num if count_me > count_opponent else self.opponent
 
+    def parallel_search(self, state, budget):
+        '''
+        Root parallelism: every worker grows its own tree from the root and
+        the root visit counts are summed before picking the move.
+        '''
+        if self.pool is None:
+            self.pool = parallel.SearchPool(self.workers)
+
+        max_playouts = None
+        if budget is None:
+            max_playouts = -(-self.playouts // self.workers)
+        tasks = [(state.p1, state.p2, state.turn, (id(self), i), self.exploration,
+                  budget, max_playouts, self.rollout_batch, rand.getrandbits(32), self.max_nodes)
+                 for i in range(self.workers)]
+        stats = parallel.merge_root_statistics(self.pool.map(parallel.mcts_worker, tasks))
+        self.note(source='parallel', playouts=sum(visits for visits, _ in stats.values()))
+        if not stats:
+            return None
+        return max(stats, key=lambda square: stats[square][0])
+
+    def note(self, **fields):
+        if self.stats is not None:
+            for name, value in fields.items():
+                setattr(self.stats, name, value)
+
+    def begin_stats(self):
+        pass
+
+    def end_stats(self):
+        pass
+
+
+# Bots by the names used on command lines (async_client, arena)
+BOTS = {
+    'minimax': ReversiBot,
+    'mcts': MonteCarloReversiBot,
+}
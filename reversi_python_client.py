@@ -4,6 +4,34 @@ import sys
 if __name__ == '__main__':
     server_address = sys.argv[1]
     bot_move_number = int(sys.argv[2])
+    # Optional extra arguments: "ponder" searches on the opponent's time,
+    # "telemetry=FILE" logs search stats for every move as JSON lines and
+    # "profile=DIR" writes a cProfile dump of every move, "book=FILE"
+    # plays from an opening book built with opening_book.py and
+    # "patterns=FILE" evaluates with weights trained by pattern_eval.py,
+    # "record=FILE" appends the game's moves to FILE for game_records.py,
+    # "workers=N" splits every search over N processes and
+    # "port=N" connects somewhere other than the usual 3333 + player
+    options = sys.argv[3:]
+    ponder = 'ponder' in options
+    telemetry = profile_dir = book = patterns = port = record = None
+    workers = 1
+    for option in options:
+        if option.startswith('telemetry='):
+            telemetry = option.split('=', 1)[1]
+        elif option.startswith('profile='):
+            profile_dir = option.split('=', 1)[1]
+        elif option.startswith('book='):
+            book = option.split('=', 1)[1]
+        elif option.startswith('patterns='):
+            patterns = option.split('=', 1)[1]
+        elif option.startswith('record='):
+            record = option.split('=', 1)[1]
+        elif option.startswith('workers='):
+            workers = int(option.split('=', 1)[1])
+        elif option.startswith('port='):
+            port = int(option.split('=', 1)[1])
 
-    reversi_game = reversi.ReversiGame(server_address, bot_move_number)
+    reversi_game = reversi.ReversiGame(server_address, bot_move_number, ponder, telemetry,
+                                       profile_dir, book, patterns, port, record, workers)
     reversi_game.play()
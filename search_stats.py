@@ -0,0 +1,129 @@
+import cProfile
+import json
+import os
+import time
+
+CUTOFF_SLOTS = 8 # cutoffs at move index 7 or later share the last slot
+
+
+class SearchStats:
+    '''
+    What happened while a bot chose one move. Bots only fill one of these
+    in when their collect_stats flag is on; otherwise their "stats" stays
+    None and the search pays a single "is None" test per interior node.
+    '''
+    def __init__(self):
+        self.move = None
+        self.source = None # 'opening', 'endgame', 'search', 'parallel' or 'mcts'
+        self.seconds = 0.0
+        self.nodes = 0
+        self.expanded = 0 # interior nodes whose moves were generated
+        self.children = 0 # legal moves summed over expanded nodes
+        self.cutoffs = 0
+        self.cutoff_index = [0] * CUTOFF_SLOTS
+        self.probcut_cuts = 0 # nodes cut by a ProbCut check
+        self.lmr_reductions = 0 # late moves searched with a reduced depth
+        self.lmr_researches = 0 # ...that had to be searched again to full depth
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.depth = 0
+        self.iterations = [] # (depth, seconds, nodes) per completed iteration
+        self.endgame_nodes = 0
+        self.endgame_seconds = 0.0 # time spent in the endgame solver
+        self.playouts = 0
+        self.tree_size = 0
+        self.tree_reused = False
+        self.pool = None # NodePool.occupancy() after an MCTS move
+
+    def record_cutoff(self, index):
+        self.cutoffs += 1
+        self.cutoff_index[min(index, CUTOFF_SLOTS - 1)] += 1
+
+    def branching_factor(self):
+        return self.children / self.expanded if self.expanded else 0.0
+
+    def tt_hit_rate(self):
+        return self.tt_hits / self.tt_probes if self.tt_probes else 0.0
+
+    def first_move_cutoff_rate(self):
+        '''Share of cutoffs caused by the first move searched, a measure of ordering quality.'''
+        return self.cutoff_index[0] / self.cutoffs if self.cutoffs else 0.0
+
+    def nodes_per_second(self):
+        return self.nodes / self.seconds if self.seconds > 0 else 0.0
+
+    def endgame_nodes_per_second(self):
+        return self.endgame_nodes / self.endgame_seconds if self.endgame_seconds > 0 else 0.0
+
+    def to_dict(self):
+        return {
+            'move': list(self.move) if self.move is not None else None,
+            'source': self.source,
+            'seconds': round(self.seconds, 6),
+            'nodes': self.nodes,
+            'nps': round(self.nodes_per_second()),
+            'depth': self.depth,
+            'branching_factor': round(self.branching_factor(), 3),
+            'cutoffs': self.cutoffs,
+            'cutoff_index': self.cutoff_index,
+            'first_move_cutoff_rate': round(self.first_move_cutoff_rate(), 4),
+            'probcut_cuts': self.probcut_cuts,
+            'lmr_reductions': self.lmr_reductions,
+            'lmr_researches': self.lmr_researches,
+            'tt_probes': self.tt_probes,
+            'tt_hit_rate': round(self.tt_hit_rate(), 4),
+            'iterations': [[depth, round(seconds, 6), nodes] for depth, seconds, nodes in self.iterations],
+            'endgame_nodes': self.endgame_nodes,
+            'endgame_seconds': round(self.endgame_seconds, 6),
+            'endgame_nps': round(self.endgame_nodes_per_second()),
+            'playouts': self.playouts,
+            'tree_size': self.tree_size,
+            'tree_reused': self.tree_reused,
+            'pool': self.pool,
+        }
+
+
+def instrumented_move(bot, choose_move, state):
+    '''
+    Calls choose_move(state) for bot. With bot.collect_stats on, bot.stats
+    is a fresh SearchStats filled in through the bot's begin_stats() and
+    end_stats() hooks. With bot.profile_dir set, the call runs under
+    cProfile and the profile is written there, one file per move.
+    '''
+    if not bot.collect_stats and bot.profile_dir is None:
+        bot.stats = None
+        return choose_move(state)
+
+    if bot.collect_stats:
+        bot.stats = SearchStats()
+        bot.begin_stats()
+    profiler = cProfile.Profile() if bot.profile_dir is not None else None
+    start = time.perf_counter()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        move = choose_move(state)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            bot.profiled_moves += 1
+            os.makedirs(bot.profile_dir, exist_ok=True)
+            profiler.dump_stats(os.path.join(bot.profile_dir, f'move_{bot.profiled_moves:03d}.prof'))
+    if bot.stats is not None:
+        bot.stats.move = move
+        bot.stats.seconds = time.perf_counter() - start
+        bot.end_stats()
+    return move
+
+
+class TelemetryLog:
+    '''Appends one JSON line per move: the game context plus the bot's SearchStats.'''
+    def __init__(self, path):
+        self.file = open(path, 'a')
+
+    def write(self, **record):
+        self.file.write(json.dumps(record) + '\n')
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
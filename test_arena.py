@@ -0,0 +1,49 @@
+import math
+import arena
+
+
+def test_opening_pairs_share_seed_and_swap_colors():
+    tasks = arena.game_tasks(('minimax', {}), ('mcts', {}), 5, 8, 3, None)
+    assert [t[2] for t in tasks] == [1, 2, 1, 2, 1]
+    assert tasks[0][3] == tasks[1][3] != tasks[2][3]
+    state, squares = arena.random_opening(tasks[0][3], 8)
+    assert len(squares) == 8 and state.center_filled()
+
+
+def test_stats_elo_and_sprt():
+    stats = arena.MatchStats()
+    for result in [1.0] * 60 + [0.5] * 20 + [0.0] * 20:
+        stats.add(result)
+    assert stats.score() == 0.7
+    assert math.isclose(stats.elo(), -400 * math.log10(1 / 0.7 - 1))
+    low, high = stats.elo_interval()
+    assert low < stats.elo() < high
+
+    sprt = arena.SPRT(0, 30)
+    assert stats.llr(0, 30) > 0
+    assert sprt.decision(stats) == 'H1'
+    assert arena.SPRT(250, 400).decision(stats) == 'H0'
+
+
+def test_forfeit_on_illegal_move_and_output(tmp_path):
+    class Illegal:
+        def __init__(self, move_num):
+            self.move_num = move_num
+
+        def make_move(self, state):
+            return (0, 0)
+
+        def close(self):
+            pass
+
+    arena.reversi_bot.BOTS['illegal'] = Illegal
+    try:
+        path = str(tmp_path / 'games.csv')
+        stats, records = arena.run_match(('illegal', {}), arena.parse_engine('minimax:depth=1'), 2,
+                                         opening_plies=4, output=path)
+    finally:
+        del arena.reversi_bot.BOTS['illegal']
+    assert stats.losses == 2
+    assert all(r['reason'] == 'illegal move' for r in records)
+    with open(path) as f:
+        assert f.readline().startswith('engine_a,engine_b')
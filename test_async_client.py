@@ -0,0 +1,58 @@
+import asyncio
+import async_client
+import parallel
+from test_protocol import state_message
+
+
+def test_game_over_fake_server():
+    # One empty square left (server row 0, col 0); player 1 to move takes it
+    cells = [1] * 64
+    cells[0], cells[1], cells[8], cells[9] = 0, 2, 2, 2
+    final = [1] * 64
+    received = []
+
+    async def serve(reader, writer):
+        writer.write(b'1 5\n' + state_message(1, 60, cells))
+        await writer.drain()
+        received.append(await reader.readline())
+        received.append(await reader.readline())
+        writer.write(b'-999\n1\n100.0\n100.0\n' + ''.join(f'{c}\n' for c in final).encode() + b'\n')
+        await writer.drain()
+        writer.close()
+
+    async def main():
+        server = await asyncio.start_server(serve, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        pool = parallel.SearchPool(1)
+        try:
+            result = await async_client.play_game('127.0.0.1', port, 'minimax', pool, 'test')
+        finally:
+            pool.shutdown()
+        server.close()
+        return result
+
+    result = asyncio.run(main())
+    assert received == [b'0\n', b'0\n']
+    assert result['player'] == 1 and result['winner'] == 1 and result['moves'] == 1
+    assert (result['discs'], result['opponent_discs']) == (64, 0)
+    assert async_client.format_result(result).endswith('win 64-0 in 1 moves, ' + f"{result['seconds']:.1f}s")
+
+
+def test_game_bot_is_kept_until_the_game_ends():
+    from test_bots import initial_board
+    board = initial_board()
+    for key in ('a', 'b'):
+        async_client.search_move(key, 'minimax', 1, board, 1, 0, None, None)
+    bot = async_client._worker_bots['a']
+    async_client.search_move('a', 'minimax', 1, board, 1, 0, None, None)
+    assert async_client._worker_bots['a'] is bot
+    async_client.forget_bot('a')
+    async_client.forget_bot('b')
+    assert not async_client._worker_bots
+
+    pool = parallel.SearchPool(3)
+    try:
+        assert all(pool.executor_for(('host', 3334, game)) is pool.executor_for(('host', 3334, game))
+                   for game in range(10))
+    finally:
+        pool.shutdown()
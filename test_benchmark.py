@@ -0,0 +1,36 @@
+import benchmark
+from test_bitboard import reference_play
+
+
+def reference_perft(state, depth):
+    '''perft on the numpy board with the original move generator.'''
+    moves = state.get_valid_moves()
+    if not moves:
+        passed = type(state)(state.board, 3 - state.turn)
+        if depth == 1 or not passed.get_valid_moves():
+            return 1
+        return reference_perft(passed, depth - 1)
+    if depth == 1:
+        return len(moves)
+    return sum(reference_perft(reference_play(state, move), depth - 1) for move in moves)
+
+
+def test_perft_known_values():
+    assert benchmark.check_perft(6) == []
+
+
+def test_perft_matches_array_move_generator():
+    for position in [benchmark.PERFT_POSITIONS['empty'][0]] + benchmark.BENCH_POSITIONS:
+        assert benchmark.perft(position.copy(), 3) == reference_perft(position.to_game_state(), 3)
+
+
+def test_compare_flags_slowdowns_only():
+    baseline = {'nps': benchmark.result(100.0, 'nodes/s', True),
+                'call': benchmark.result(10.0, 'us/call', False)}
+    results = {'nps': benchmark.result(80.0, 'nodes/s', True),
+               'call': benchmark.result(5.0, 'us/call', False),
+               'new': benchmark.result(1.0, 'us/call', False)}
+    rows = {row[0]: row for row in benchmark.compare(results, baseline, tolerance=0.1)}
+    assert set(rows) == {'nps', 'call'}
+    assert rows['nps'][4] and round(rows['nps'][3], 6) == -0.2
+    assert not rows['call'][4] and rows['call'][3] == 1.0
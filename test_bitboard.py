@@ -0,0 +1,108 @@
+import random
+import numpy as np
+import reversi
+import bitboard
+from test_bots import initial_board
+
+
+def reference_play(state, move):
+    '''Applies a move on the numpy board the way the old simulate_move did.'''
+    new_board = np.copy(state.board)
+    new_board[move] = state.turn
+    for xdir in range(-1, 2):
+        for ydir in range(-1, 2):
+            if xdir == ydir == 0:
+                continue
+            if state.capture_will_occur(move[0] + ydir, move[1] + xdir, xdir, ydir):
+                row, col = move
+                while True:
+                    row += ydir
+                    col += xdir
+                    if state.board[row, col] == state.turn:
+                        break
+                    new_board[row, col] = state.turn
+    return reversi.ReversiGameState(new_board, 3 - state.turn)
+
+
+def random_positions(num_games=20, seed=0):
+    rng = random.Random(seed)
+    for _ in range(num_games):
+        state = reversi.ReversiGameState(np.zeros((8, 8), dtype=int), 1)
+        passes = 0
+        while passes < 2:
+            yield state
+            moves = state.get_valid_moves()
+            if not moves:
+                state = reversi.ReversiGameState(state.board, 3 - state.turn)
+                passes += 1
+                continue
+            passes = 0
+            state = reference_play(state, rng.choice(moves))
+
+
+def test_round_trip_conversion():
+    board = initial_board()
+    converted = bitboard.BitboardState.from_board(board, 1)
+    assert np.array_equal(converted.board, board)
+    assert converted.to_game_state().turn == 1
+
+
+def test_moves_and_flips_match_array_board():
+    for state in random_positions():
+        fast = bitboard.BitboardState.from_game_state(state)
+        assert fast.get_valid_moves() == state.get_valid_moves()
+        for move in state.get_valid_moves():
+            expected = reference_play(state, move)
+            child = fast.apply_move(move)
+            assert np.array_equal(child.board, expected.board)
+            assert child.turn == expected.turn
+
+
+def test_counts_and_winner():
+    state = bitboard.BitboardState.from_board(initial_board(), 1)
+    assert state.count(1) == state.count(2) == 2
+    assert state.empties() == 60
+    assert state.determine_winner() == 0
+
+
+def test_incremental_hash_matches_full_hash():
+    for state in random_positions(num_games=5, seed=1):
+        fast = bitboard.BitboardState.from_game_state(state).with_hash()
+        for move in fast.get_valid_moves():
+            child = fast.apply_move(move)
+            assert child.key == bitboard.zobrist_hash(child.p1, child.p2, child.turn)
+        passed = fast.pass_turn()
+        assert passed.key == bitboard.zobrist_hash(passed.p1, passed.p2, passed.turn)
+
+
+def test_unmake_move_restores_position():
+    for state in random_positions(num_games=5, seed=2):
+        board = bitboard.BitboardState.from_game_state(state).with_hash()
+        before = (board.p1, board.p2, board.turn, board.key)
+        for square in bitboard.iter_bits(board.valid_moves_mask()):
+            expected = board.play(square)
+            flipped = board.make_move(square)
+            assert (board.p1, board.p2, board.turn, board.key) == \
+                (expected.p1, expected.p2, expected.turn, expected.key)
+            board.unmake_move(square, flipped)
+            assert (board.p1, board.p2, board.turn, board.key) == before
+
+
+def test_array_board_ray_tables_match_recursive_walk():
+    for state in random_positions(num_games=5, seed=2):
+        moves = state.get_valid_moves()
+        if state.board[3:5, 3:5].all():
+            assert moves == [(row, col) for row in range(8) for col in range(8)
+                             if state.is_valid_move(row, col)]
+        for move in moves:
+            assert np.array_equal(state.apply_move(move).board, reference_play(state, move).board)
+
+
+def test_array_board_cache_follows_board_changes():
+    state = reversi.ReversiGameState(initial_board(), 1)
+    assert state.get_valid_moves() == state.get_valid_moves()
+    state.board[2, 3] = 2
+    state.board[3, 3] = 2
+    assert (2, 3) not in state.get_valid_moves()
+    assert state.get_valid_moves() == [(row, col) for row in range(8) for col in range(8)
+                                       if state.is_valid_move(row, col)]
@@ -0,0 +1,63 @@
+import random
+import bitboard
+import endgame
+from reversi_bot import ReversiBot
+from test_bots import create_initial_game_state
+
+
+def position_with_empties(empties, seed):
+    rng = random.Random(seed)
+    while True:
+        state = create_initial_game_state()
+        while state.empties() > empties:
+            moves = state.valid_moves_mask()
+            if not moves:
+                state = state.pass_turn()
+                if not state.valid_moves_mask():
+                    break
+                continue
+            state = state.play(rng.choice(list(bitboard.iter_bits(moves))))
+        if state.empties() == empties and state.valid_moves_mask():
+            return state
+
+
+def brute_force(state):
+    own, opp = state.pieces(state.turn)
+    moves = state.valid_moves_mask()
+    if not moves:
+        if not bitboard.moves_mask(opp, own):
+            return endgame.final_score(own, opp)
+        return -brute_force(state.pass_turn())
+    return max(-brute_force(state.play(sq)) for sq in bitboard.iter_bits(moves))
+
+
+def test_solver_matches_brute_force():
+    for seed in range(4):
+        state = position_with_empties(7, seed)
+        solver = endgame.EndgameSolver()
+        expected = brute_force(state)
+        square, score = solver.solve(state)
+        assert score == expected
+        assert -brute_force(state.play(square)) == expected
+        _, wld = solver.solve_wld(state)
+        assert (wld > 0) - (wld < 0) == (expected > 0) - (expected < 0)
+        assert solver.nodes_per_second() > 0
+
+
+def test_bot_plays_solver_move_in_endgame():
+    state = position_with_empties(9, 7)
+    bot = ReversiBot(state.turn)
+    move = bot.make_move(state)
+    expected = brute_force(state)
+    assert -brute_force(state.apply_move(move)) == expected
+
+
+def test_endgame_stats_report_solver_speed():
+    state = position_with_empties(9, 7)
+    bot = ReversiBot(state.turn)
+    bot.collect_stats = True
+    bot.make_move(state)
+    stats = bot.stats
+    assert stats.source == 'endgame'
+    assert stats.endgame_nodes > 0 and 0 < stats.endgame_seconds <= stats.seconds
+    assert stats.to_dict()['endgame_nps'] == round(stats.endgame_nodes / stats.endgame_seconds)
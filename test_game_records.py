@@ -0,0 +1,93 @@
+import asyncio
+import json
+import threading
+import reversi
+import game_records
+from arena import play_game
+from game_records import GameRecord, PhaseReport, RecordWriter, analyze, iter_records, read_records
+from bitboard import BitboardState, PASS
+from headless_server import HeadlessGame
+
+GAME_LOG = 'Reversi/ReversiServer/GameLog.txt'
+
+
+def test_records_round_trip_through_binary_format(tmp_path):
+    arena_record = play_game(('minimax', {'depth': 1}), ('minimax', {'depth': 1}), 1, 7, 8)
+    jsonl = tmp_path / 'games.jsonl'
+    jsonl.write_text(json.dumps(arena_record) + '\n')
+    originals = list(iter_records([GAME_LOG, str(jsonl)]))
+    assert [record.winner for record in originals] == [2, arena_record['winner']]
+    assert originals[0].times is None
+
+    path = str(tmp_path / 'games.bin')
+    writer = RecordWriter(path)
+    for record in originals:
+        writer.write(record)
+    writer.close()
+    copies = list(read_records(path))
+    assert [record.squares for record in copies] == [record.squares for record in originals]
+    assert [t is None for t in copies[1].times] == [t is None for t in arena_record['times']]
+    assert [d for d in copies[1].depths if d] == [d for d in arena_record['depths'] if d]
+
+
+def test_analysis_searches_every_choice():
+    record = next(iter_records([GAME_LOG]))
+    rows = game_records.analyze_game(record.squares, depth=2)
+    assert len(rows) == sum(1 for square in record.squares if square != PASS)
+    searched = [row for row in rows if row[5] is not None]
+    assert searched and all(row[5] >= 0 for row in searched)
+
+    report = PhaseReport(threshold=0)
+    blunders = report.add(0, record, rows)
+    assert len(blunders) == len(searched)
+    assert sum(totals['moves'] for totals in report.totals.values()) == len(rows)
+    assert 'midgame' in report.summary()
+
+
+def test_analysis_pool_streams_every_game():
+    record = next(iter_records([GAME_LOG]))
+    records = [GameRecord(record.squares[:30], 0) for _ in range(3)]
+    results = list(analyze(iter(records), depth=1, workers=2))
+    assert sorted(index for index, _, _ in results) == [0, 1, 2]
+    assert all(len(rows) == len(results[0][2]) for _, _, rows in results)
+
+
+def test_client_records_the_game_it_played(tmp_path):
+    path = str(tmp_path / 'client.jsonl')
+
+    def client(player, port):
+        game = reversi.ReversiGame('127.0.0.1', player, port=port, record=path if player == 2 else None)
+        try:
+            game.play()
+        except SystemExit:
+            pass
+        finally:
+            game.server_conn.close()
+
+    async def main():
+        game = HeadlessGame(minutes=0.1)
+        ports = await game.open()
+        threads = [threading.Thread(target=client, args=(player, port))
+                   for player, port in zip((1, 2), ports)]
+        for thread in threads:
+            thread.start()
+        result = await game.play()
+        await asyncio.get_running_loop().run_in_executor(None, lambda: [t.join() for t in threads])
+        return result
+
+    result = asyncio.run(main())
+    record = next(iter_records([path]))
+    assert record.player == 2
+    assert record.squares == result['moves']
+    assert record.winner == result['winner']
+    # Player 1's first move comes before player 2 sees a clock; depths are
+    # only known for player 2's own moves
+    state = BitboardState(0, 0, 1)
+    for ply, square in enumerate(record.squares):
+        if square == -1:
+            assert record.times[ply] is None and record.depths[ply] is None
+            state.make_pass()
+            continue
+        assert (record.times[ply] is None) == (ply == 0)
+        assert (record.depths[ply] is not None) == (state.turn == 2)
+        state.make_move(square)
@@ -0,0 +1,109 @@
+import asyncio
+import threading
+import numpy as np
+import protocol
+import reversi
+import async_client
+from bitboard import BitboardState
+from headless_server import HeadlessGame, TIE
+
+
+async def connect(port):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    messages = protocol.MessageBuffer()
+    greeting = await async_client.read(reader, messages, messages.next_line)
+    return reader, writer, messages, greeting
+
+
+def test_real_clients_play_a_game():
+    finished = []
+    bots = {}
+
+    def client(player, port):
+        # Player 1 splits its searches over two processes
+        game = reversi.ReversiGame('127.0.0.1', player, port=port, workers=2 if player == 1 else 1)
+        bots[player] = game.bot
+        try:
+            game.play()
+        except SystemExit:
+            finished.append(player)
+        finally:
+            game.server_conn.close()
+
+    async def main():
+        game = HeadlessGame(minutes=0.1)
+        ports = await game.open()
+        threads = [threading.Thread(target=client, args=(player, port))
+                   for player, port in zip((1, 2), ports)]
+        for thread in threads:
+            thread.start()
+        result = await game.play()
+        await asyncio.get_running_loop().run_in_executor(None, lambda: [t.join() for t in threads])
+        return result
+
+    result = asyncio.run(main())
+    assert sorted(finished) == [1, 2]
+    assert bots[1].workers == 2 and bots[1].pool is None # shut down at the end
+    assert result['reason'] is None
+    assert result['invalid_moves'] == 0
+    assert sum(result['discs']) == 64 or result['winner'] == 0
+
+    # The record replays to the same final position
+    state = BitboardState(0, 0, 1)
+    for square in result['moves']:
+        if square == -1:
+            state.make_pass()
+        else:
+            assert state.valid_moves_mask() >> square & 1
+            state.make_move(square)
+    assert state.is_game_over()
+    assert result['winner'] == state.determine_winner()
+
+
+def test_invalid_move_is_resent_and_clock_forfeits():
+    async def main():
+        game = HeadlessGame(minutes=0.01)
+        ports = await game.open()
+        play = asyncio.ensure_future(game.play())
+        (reader1, writer1, messages1, greeting1), (reader2, writer2, messages2, greeting2) = \
+            await asyncio.gather(connect(ports[0]), connect(ports[1]))
+        assert greeting1 == '1 0.01' and greeting2 == '2 0.01'
+
+        first = await async_client.read(reader1, messages1, messages1.next_message)
+        assert first[:2] == (1, 0)
+        writer1.write(b'0\n0\n') # not a center square
+        again = await async_client.read(reader1, messages1, messages1.next_message)
+        assert again[:2] == (1, 0) and np.array_equal(again[4], first[4])
+        writer1.write(b'3\n3\n')
+
+        # Both players get the update, then player 2 never answers
+        for reader, messages, update_turn in ((reader1, messages1, 0), (reader2, messages2, -1)):
+            turn, round_num, _, _, cells = await async_client.read(reader, messages, messages.next_message)
+            assert (turn, round_num) == (update_turn, 1)
+            assert cells[3 * 8 + 3] == 1
+        turn, _, _, _, _ = await async_client.read(reader2, messages2, messages2.next_message)
+        assert turn == 2
+
+        result = await play
+        assert await async_client.read(reader1, messages1, messages1.next_message) == \
+            (protocol.GAME_OVER, None, None, None, None)
+        winner, t1, t2, cells = await async_client.read(reader1, messages1, messages1.next_final)
+        writer1.close()
+        writer2.close()
+        return result, winner, t2, cells
+
+    result, winner, t2, cells = asyncio.run(main())
+    assert result['reason'] == 'time' and result['winner'] == 1
+    assert result['invalid_moves'] == 1
+    assert result['moves'] == [(7 - 3) * 8 + 3]
+    assert winner == 1 and t2 == 0.0
+    assert np.count_nonzero(cells == 2) == 0
+
+
+def test_final_board():
+    full_tie = BitboardState(0x00000000FFFFFFFF, 0xFFFFFFFF00000000, 1)
+    assert HeadlessGame.final_board(full_tie, None, {1: 1.0, 2: 1.0})[0] == TIE
+
+    state = BitboardState(0b111, 0b1000, 1)
+    winner, final = HeadlessGame.final_board(state, None, {1: 1.0, 2: 1.0})
+    assert winner == 1 and final.count(1) == 63
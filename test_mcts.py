@@ -0,0 +1,138 @@
+import random
+import time
+import bitboard
+import mcts
+from reversi_bot import MonteCarloReversiBot
+from test_bots import create_initial_game_state
+
+
+def test_playouts_are_counted_in_root_visits():
+    state = create_initial_game_state()
+    tree = mcts.MCTS(rng=random.Random(0))
+    tree.set_root(state)
+    tree.search(max_playouts=200)
+    assert tree.pool.visits[tree.root] == 200
+    assert sum(visits for visits, _ in tree.root_statistics().values()) == 200
+    assert tree.best_square() in bitboard.iter_bits(state.valid_moves_mask())
+
+
+def test_tree_is_reused_after_reply():
+    state = create_initial_game_state()
+    bot = MonteCarloReversiBot(1, playouts=300)
+    move = bot.make_move(state)
+    after_move = state.apply_move(move)
+    reply = after_move.get_valid_moves()[0]
+    after_reply = after_move.apply_move(reply)
+    assert bot.mcts.set_root(after_reply)
+    assert bot.mcts.pool.visits[bot.mcts.root] > 0
+    assert bot.make_move(after_reply) in after_reply.get_valid_moves()
+
+
+def test_rollout_handles_passes_and_draws():
+    tree = mcts.MCTS(rng=random.Random(1))
+    # Full board, equal counts: no one can move and the game is a draw
+    board = bitboard.BitboardState(0x00000000FFFFFFFF, 0xFFFFFFFF00000000, 1)
+    assert tree.rollout(board) == 0
+
+
+def test_batch_move_generation_matches_scalar():
+    import numpy as np
+    import batch_rollout
+    from test_bitboard import random_positions
+    states = [bitboard.BitboardState.from_game_state(s) for s in random_positions(num_games=3, seed=3)]
+    states = [s for s in states if s.center_filled()]
+    own = np.array([s.pieces(s.turn)[0] for s in states], dtype=np.uint64)
+    opp = np.array([s.pieces(s.turn)[1] for s in states], dtype=np.uint64)
+    moves = batch_rollout.moves_mask(own, opp)
+    for i, s in enumerate(states):
+        assert int(moves[i]) == s.valid_moves_mask()
+        for square in bitboard.iter_bits(s.valid_moves_mask()):
+            bits = np.array([1 << square], dtype=np.uint64)
+            flipped = batch_rollout.flips_mask(bits, own[i:i + 1], opp[i:i + 1])
+            assert int(flipped[0]) == bitboard.flips_mask(square, int(own[i]), int(opp[i]))
+
+
+def test_root_move_counts_cover_every_move():
+    import batch_rollout
+    state = create_initial_game_state()
+    counts = batch_rollout.BatchRollouts(seed=0).root_move_counts(state, 64)
+    assert set(counts) == set(bitboard.iter_bits(state.valid_moves_mask()))
+    assert all(sum(result) == 64 for result in counts.values())
+
+
+def test_batched_tree_search():
+    state = create_initial_game_state()
+    tree = mcts.MCTS(rng=random.Random(0), rollout_batch=32)
+    tree.set_root(state)
+    tree.search(max_playouts=320)
+    assert tree.pool.visits[tree.root] == tree.playouts == 320
+
+
+def test_batched_search_keeps_to_deadline():
+    # 16 batches of 256 playouts take far longer than the deadline
+    tree = mcts.MCTS(rng=random.Random(0), rollout_batch=256)
+    tree.set_root(create_initial_game_state())
+    start = time.perf_counter()
+    tree.search(deadline=start + 0.05)
+    assert time.perf_counter() - start < 0.25
+    assert tree.playouts % 256 == 0 and tree.playouts < 16 * 256
+
+
+def test_node_pool_respects_cap():
+    state = create_initial_game_state()
+    tree = mcts.MCTS(rng=random.Random(0), max_nodes=50)
+    tree.set_root(state)
+    tree.search(max_playouts=500)
+    assert tree.pool.visits[tree.root] == 500
+    assert tree.pool.allocated == tree.tree_size() == 50
+    assert tree.pool.occupancy()['bytes'] == 50 * mcts.NodePool.BYTES_PER_NODE
+
+
+def test_full_pool_keeps_every_legal_move():
+    state = create_initial_game_state()
+    tree = mcts.MCTS(rng=random.Random(0), max_nodes=20)
+    tree.set_root(state)
+    tree.search(max_playouts=3000)
+    pool = tree.pool
+    stack = [(tree.root, bitboard.as_bitboard(state))]
+    while stack:
+        node, board = stack.pop()
+        legal = set(bitboard.iter_bits(board.valid_moves_mask()))
+        if not legal and not board.is_game_over():
+            legal = {bitboard.PASS}
+        kept = set(bitboard.iter_bits(pool.untried[node]))
+        if pool.must_pass[node]:
+            kept.add(bitboard.PASS)
+        for child in pool.children(node):
+            kept.add(pool.square[child])
+            child_board = board.copy()
+            mcts.play_square(child_board, pool.square[child])
+            stack.append((child, child_board))
+        assert kept == legal
+
+
+def test_released_subtrees_are_reused():
+    state = create_initial_game_state()
+    tree = mcts.MCTS(rng=random.Random(2), max_nodes=300)
+    tree.set_root(state)
+    for _ in range(8):
+        tree.search(max_playouts=400)
+        assert tree.pool.occupancy()['allocated'] <= 300
+        # Play the most visited move and the most visited reply
+        pool = tree.pool
+        node = tree.root
+        for _ in range(2):
+            node = max(pool.children(node), key=lambda child: pool.visits[child])
+            state = state.copy()
+            mcts.play_square(state, pool.square[node])
+        reused = tree.set_root(state)
+        kept = tree.tree_size()
+        assert reused and kept > 1
+        # Detaching keeps the new root's subtree intact
+        assert tree.pool.parent[tree.root] == mcts.NONE
+    assert tree.pool.allocated == 300
+    # Every node outside the tree comes back from allocate before it fails
+    returned = 0
+    while tree.pool.allocate() != mcts.NONE:
+        returned += 1
+    assert returned == 300 - tree.tree_size()
@@ -0,0 +1,47 @@
+import bitboard
+import opening_book
+from bitboard import BitboardState
+from reversi_bot import ReversiBot
+
+GAME_LOG = 'Reversi/ReversiServer/GameLog.txt'
+
+
+def test_game_log_replays_to_logged_score():
+    with open(GAME_LOG) as f:
+        games = list(opening_book.read_game_log(f))
+    assert len(games) == 1
+    positions, final = opening_book.replay(games[0])
+    assert len(positions) == sum(1 for _, square in games[0] if square != bitboard.PASS)
+    # The log ends with "Black: 13" and "White: 51"
+    assert (final.count(1), final.count(2)) == (13, 51)
+
+
+def test_canonical_is_shared_by_all_symmetries():
+    state = BitboardState(0x20400244a1820, 0x8283a58000000, 1)
+    images = {bitboard.canonical(symmetry(state.p1), symmetry(state.p2))[:2]
+              for symmetry in bitboard.SYMMETRIES}
+    assert len(images) == 1
+
+
+def test_book_lookup_in_every_orientation(tmp_path):
+    with open(GAME_LOG) as f:
+        moves = next(opening_book.read_game_log(f))
+    builder = opening_book.BookBuilder(max_plies=12)
+    builder.add_game(moves)
+    path = str(tmp_path / 'book.bin')
+    assert builder.write(path) == 12
+
+    book = opening_book.OpeningBook(path, min_games=1)
+    positions, _ = opening_book.replay(moves)
+    state, square = positions[8]
+    for symmetry, squares in zip(bitboard.SYMMETRIES, bitboard.SYMMETRY_SQUARES):
+        image = BitboardState(symmetry(state.p1), symmetry(state.p2), state.turn)
+        assert [entry[0] for entry in book.lookup(image)] == [squares[square]]
+        assert book.choose(image) == bitboard.square_to_move(squares[square])
+    assert book.lookup(positions[20][0]) == []
+
+    bot = ReversiBot(state.turn)
+    bot.book = book
+    bot.collect_stats = True
+    assert bot.make_move(state) == bitboard.square_to_move(square)
+    assert bot.stats.source == 'book'
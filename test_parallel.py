@@ -0,0 +1,46 @@
+import os
+import parallel
+from reversi_bot import ReversiBot, MonteCarloReversiBot
+from test_search import midgame_state
+import bitboard
+
+
+def test_merge_uses_deepest_common_depth():
+    results = [{0: ((2, 3), 5), 1: ((2, 3), 1)}, {0: ((4, 5), 9)}]
+    assert parallel.merge_alphabeta_results(results) == (4, 5)
+
+
+def test_parallel_alphabeta_matches_serial():
+    state = bitboard.as_bitboard(midgame_state(None))
+    serial = ReversiBot(state.turn)
+    threaded = ReversiBot(state.turn, workers=2)
+    try:
+        expected_state = state.with_hash()
+        moves = serial.order_root_moves(expected_state)
+        _, expected_value = serial.search_root(expected_state, moves, serial.max_depth)
+        move = threaded.make_move(state)
+        _, value = ReversiBot(state.turn).search_root(
+            expected_state, [move], serial.max_depth)
+        assert value == expected_value
+    finally:
+        threaded.close()
+
+
+def test_root_parallel_mcts_returns_legal_move():
+    state = bitboard.as_bitboard(midgame_state(None))
+    bot = MonteCarloReversiBot(state.turn, playouts=200, workers=2)
+    try:
+        assert bot.make_move(state) in state.get_valid_moves()
+        assert bot.make_move(state) in state.get_valid_moves()
+    finally:
+        bot.close()
+
+
+def test_search_pool_pins_each_slot_to_one_process():
+    pool = parallel.SearchPool(2)
+    try:
+        pids = pool.map(os.getpid, [(), ()])
+        assert len(set(pids)) == 2
+        assert pool.map(os.getpid, [(), ()]) == pids
+    finally:
+        pool.shutdown()
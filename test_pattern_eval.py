@@ -0,0 +1,77 @@
+import pickle
+import numpy as np
+import pytest
+import arena
+import bitboard
+import pattern_eval
+from reversi_bot import ReversiBot
+
+
+def sample_positions(count=100):
+    positions = [arena.random_opening(seed, 8 + seed % 50)[0] for seed in range(count)]
+    own = [state.pieces(state.turn)[0] for state in positions]
+    opp = [state.pieces(state.turn)[1] for state in positions]
+    return own, opp
+
+
+def test_every_instance_fits_its_view():
+    sizes = {number: 0 for number in range(len(pattern_eval.PATTERNS))}
+    for number, parts in pattern_eval.INSTANCES:
+        sizes[number] += 1
+        squares = sum(1 for _, _, table, _ in parts for bit in range(8) if table[1 << bit])
+        assert squares == len(pattern_eval.PATTERNS[number][1])
+    assert sizes[0] == 4 and sizes[2] == 8 and sizes[6] == 2
+
+
+def test_packed_views_match_single_board_views():
+    own, opp = sample_positions(20)
+    for o, p in zip(own, opp):
+        packed = pattern_eval.packed_view_bytes(o, p)
+        for v, view in enumerate(pattern_eval.VIEWS):
+            assert packed[16 * v:16 * v + 8] == view(o).to_bytes(8, 'little')
+            assert packed[16 * v + 8:16 * v + 16] == view(p).to_bytes(8, 'little')
+
+
+def test_scalar_and_batch_features_agree():
+    weights = np.random.default_rng(0).normal(size=(pattern_eval.PHASES, pattern_eval.PARAMS))
+    evaluator = pattern_eval.PatternEvaluator(weights)
+    weights = evaluator.weights
+    own, opp = sample_positions()
+    columns = pattern_eval.feature_columns(own, opp)
+    for i, (o, p) in enumerate(zip(own, opp)):
+        phase = pattern_eval.PHASE_OF_DISCS[bitboard.popcount(o | p)]
+        expected = weights[phase, 0] + weights[phase, columns[i]].sum(dtype=np.float64)
+        assert evaluator.evaluate(o, p) == pytest.approx(expected, abs=1e-3)
+
+
+def test_symmetric_images():
+    own, opp = sample_positions(3)
+    images_own, images_opp = pattern_eval.symmetric_images(own, opp)
+    for i, (o, p) in enumerate(zip(own, opp)):
+        found = {(int(images_own[k * 3 + i]), int(images_opp[k * 3 + i])) for k in range(8)}
+        assert found == {(symmetry(o), symmetry(p)) for symmetry in bitboard.SYMMETRIES}
+
+
+def test_fit_save_load(tmp_path):
+    own, opp = sample_positions(300)
+    own = np.array(own, dtype=np.uint64)
+    opp = np.array(opp, dtype=np.uint64)
+    targets = np.array([bitboard.popcount(int(o)) - bitboard.popcount(int(p)) for o, p in zip(own, opp)], dtype=float)
+    evaluator, errors = pattern_eval.fit(own, opp, targets, epochs=30)
+    assert all(error is None or error < targets.std() for error in errors)
+
+    path = str(tmp_path / 'weights.bin')
+    evaluator.save(path)
+    loaded = pattern_eval.PatternEvaluator.load(path)
+    o, p = int(own[5]), int(opp[5])
+    assert loaded.evaluate(o, p) == pytest.approx(evaluator.evaluate(o, p), abs=0.1)
+    assert pickle.loads(pickle.dumps(loaded)).evaluate(o, p) == loaded.evaluate(o, p)
+
+    bot = ReversiBot(1, evaluator=loaded)
+    state = bitboard.BitboardState(0x810000000, 0x1008000000, 1)
+    assert bot.make_move(state) in state.get_valid_moves()
+
+    with open(path, 'r+b') as f:
+        f.write(b'XXXX')
+    with pytest.raises(ValueError):
+        pattern_eval.PatternEvaluator.load(path)
@@ -0,0 +1,28 @@
+import json
+from arena import random_opening
+from probcut import ProbCut, STAGE_OF_DISCS, calibrate, record_positions, sample_positions
+from opening_book import read_arena_records
+
+
+def test_sample_positions_streams_records():
+    lines = [json.dumps({'moves': random_opening(seed, 30)[1]}) for seed in range(5)]
+    states = sample_positions(record_positions(read_arena_records(lines)), 20, min_empties=40)
+    assert len(states) == 20
+    assert all(state.center_filled() and state.empties() >= 40 and state.valid_moves_mask()
+               for state in states)
+
+
+def test_calibration_fits_every_pair(tmp_path):
+    states = sample_positions((random_opening(seed, 10 + seed % 20)[0] for seed in range(40)), 40)
+    model, checks = calibrate(states, ((2, 0), (3, 1)), min_samples=5)
+    assert {(check['depth'], check['shallow']) for check in checks} == {(2, 0), (3, 1)}
+    # Deeper searches track shallower ones closely
+    assert all(0.5 < check['a'] < 2 and check['sigma'] > 0 for check in checks)
+
+    path = str(tmp_path / 'probcut.json')
+    model.save(path)
+    loaded = ProbCut.load(path)
+    assert loaded.checks == model.checks
+    discs = next(discs for discs in range(65) if (3, STAGE_OF_DISCS[discs]) in model.checks)
+    assert loaded.lookup(3, discs)[0][0] == 1
+    assert loaded.lookup(6, discs) is None
@@ -0,0 +1,55 @@
+import numpy as np
+import protocol
+
+
+def state_message(turn, round, cells):
+    '''A state message exactly as the Java server's println writes it.'''
+    return (f'{turn}\n{round}\n179.5\n180.0\n' + ''.join(f'{c}\n' for c in cells) + '\n').encode()
+
+
+def test_messages_split_and_coalesced():
+    cells = [0] * 64
+    cells[27], cells[28], cells[35], cells[36] = 1, 2, 2, 1
+    stream = state_message(1, 4, cells) + state_message(0, 5, cells) + b'-999\n'
+
+    for chunk_size in (1, 7, 100, len(stream)):
+        buffer = protocol.MessageBuffer()
+        messages = []
+        for i in range(0, len(stream), chunk_size):
+            buffer.feed(stream[i:i + chunk_size])
+            while True:
+                message = buffer.next_message()
+                if message is None:
+                    break
+                messages.append(message)
+        assert [m[0] for m in messages] == [1, 0, protocol.GAME_OVER]
+        assert messages[0][1:4] == (4, 179.5, 180.0)
+        assert np.array_equal(messages[0][4], cells)
+
+
+def test_greeting_and_crlf_line_endings():
+    buffer = protocol.MessageBuffer()
+    buffer.feed(b'1 5\r\n' + state_message(1, 0, [0] * 64).replace(b'\n', b'\r\n'))
+    assert buffer.next_line() == '1 5'
+    turn, round, _, _, cells = buffer.next_message()
+    assert (turn, round) == (1, 0)
+    assert len(cells) == 64
+
+
+def test_format_move_flips_row():
+    assert protocol.format_move((0, 3)) == b'7\n3\n'
+
+
+def test_final_message_after_game_over():
+    cells = [1] * 40 + [2] * 24
+    buffer = protocol.MessageBuffer()
+    buffer.feed(b'-999\n1\n0.0\n12.5\n' + ''.join(f'{c}\n' for c in cells).encode() + b'\n')
+    assert buffer.next_message()[0] == protocol.GAME_OVER
+    winner, t1, t2, final_cells = buffer.next_final()
+    assert (winner, t1, t2) == (1, 0.0, 12.5)
+    assert np.array_equal(final_cells, cells)
+
+
+def test_format_message_matches_server():
+    cells = list(range(64))
+    assert protocol.format_message((1, 4, 179.5, 180.0), cells) == state_message(1, 4, cells)
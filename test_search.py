@@ -0,0 +1,183 @@
+import time
+import numpy as np
+import reversi
+import bitboard
+from reversi_bot import ReversiBot, MonteCarloReversiBot
+from time_manager import TimeManager
+from test_bots import initial_board
+
+
+def midgame_state(time_left):
+    board = initial_board()
+    state = bitboard.BitboardState.from_board(board, 1)
+    for _ in range(6):
+        state = state.apply_move(state.get_valid_moves()[-1])
+    game_state = state.to_game_state()
+    return reversi.ReversiGameState(game_state.board, state.turn, 10, time_left, time_left)
+
+
+def test_budget_respects_safety_margin():
+    manager = TimeManager()
+    assert manager.budget(0.5, 40) == manager.min_budget
+    assert manager.budget(300.0, 40) < 300.0 * manager.max_fraction + 1e-9
+    assert manager.budget(300.0, 40) > manager.budget(300.0, 60)
+
+
+def test_iterative_deepening_stays_within_budget():
+    state = midgame_state(10.0)
+    bot = ReversiBot(state.turn)
+    budget = bot.time_manager.budget(10.0, int(np.count_nonzero(state.board == 0)))
+    start = time.perf_counter()
+    move = bot.make_move(state)
+    elapsed = time.perf_counter() - start
+    assert move in state.get_valid_moves()
+    assert bot.depth_reached >= 1
+    assert elapsed < budget * 2 + 0.05
+
+
+def test_transposition_table_does_not_change_result():
+    state = bitboard.as_bitboard(midgame_state(None)).with_hash()
+    with_table = ReversiBot(state.turn)
+    without_table = ReversiBot(state.turn, tt_size_bits=0)
+    without_table.tt.store = lambda *args: None
+    moves = state.get_valid_moves()
+    for depth in range(4):
+        assert with_table.search_root(state, list(moves), depth)[1] == \
+            without_table.search_root(state, list(moves), depth)[1]
+    assert with_table.tt.hits > 0
+
+
+def plain_minimax(bot, state, depth):
+    '''Reference search without pruning, ordering or a table.'''
+    moves = state.valid_moves_mask()
+    if depth == 0 or not moves:
+        return bot.evaluate(state)
+    values = [plain_minimax(bot, state.play(sq), depth - 1) for sq in bitboard.iter_bits(moves)]
+    return max(values) if state.turn == bot.move_num else min(values)
+
+
+def test_principal_variation_search_matches_minimax():
+    state = bitboard.as_bitboard(midgame_state(None)).with_hash()
+    bot = ReversiBot(state.turn)
+    moves = bot.order_root_moves(state)
+    for depth in range(3):
+        expected = max(plain_minimax(bot, state.apply_move(move), depth) for move in moves)
+        assert bot.search_root(state, moves, depth)[1] == expected
+
+
+def test_batched_frontier_matches_minimax():
+    state = bitboard.as_bitboard(midgame_state(None)).with_hash()
+    bot = ReversiBot(state.turn)
+    bot.batch_frontier = True
+    moves = bot.order_root_moves(state)
+    for depth in range(4):
+        expected = max(plain_minimax(bot, state.apply_move(move), depth) for move in moves)
+        assert bot.search_root(state, moves, depth)[1] == expected
+
+
+def test_evaluate_many_matches_evaluate():
+    from evaluation import Evaluator, WeightedEvaluator
+    from test_bitboard import random_positions
+    positions = [bitboard.as_bitboard(s) for s in random_positions(num_games=3)]
+    positions = [s.pieces(s.turn) for s in positions if s.center_filled()]
+    own = np.array([p[0] for p in positions], dtype=np.uint64)
+    opp = np.array([p[1] for p in positions], dtype=np.uint64)
+    evaluator = WeightedEvaluator()
+    expected = [evaluator.evaluate(o, p) for o, p in positions]
+    assert evaluator.evaluate_many(own, opp).tolist() == expected
+    assert Evaluator.evaluate_many(evaluator, own, opp).tolist() == expected
+
+
+def test_weighted_evaluator_matches_original_formula():
+    from evaluation import WeightedEvaluator
+    from bitboard import popcount, CORNERS, EDGES, moves_mask
+    evaluator = WeightedEvaluator()
+    state = bitboard.as_bitboard(midgame_state(None))
+    own, opp = state.pieces(1)
+    expected = (popcount(own & CORNERS) - popcount(opp & CORNERS)) * 60 \
+        + (popcount(own & EDGES) - popcount(opp & EDGES)) * 10 \
+        + (popcount(moves_mask(own, opp)) - popcount(moves_mask(opp, own))) * 5 \
+        + popcount(own) - popcount(opp)
+    assert evaluator.evaluate(own, opp) == expected
+    assert evaluator.evaluate(opp, own) == -expected
+
+
+def test_ponder_answers_opponent_replies():
+    from ponder import Ponderer
+    state = bitboard.as_bitboard(midgame_state(None))
+    bot = ReversiBot(3 - state.turn, TimeManager(safety_margin=0.0, max_fraction=0.05))
+    ponderer = Ponderer(bot)
+    ponderer.start(state, 2.0)
+    time.sleep(0.5)
+    ponderer.stop()
+    assert ponderer.answers
+    for (p1, p2, turn), move in ponderer.answers.items():
+        assert move in bitboard.BitboardState(p1, p2, turn).get_valid_moves()
+    hit = bitboard.BitboardState(*next(iter(ponderer.answers)))
+    assert ponderer.take(hit) == ponderer.answers[(hit.p1, hit.p2, hit.turn)]
+    assert ponderer.hits == 1
+    # The bot searches normally again after pondering was interrupted
+    assert bot.make_move(hit) in hit.get_valid_moves()
+
+
+def test_search_stats_only_when_enabled(tmp_path):
+    state = midgame_state(30.0)
+    bot = ReversiBot(state.turn)
+    bot.make_move(state)
+    assert bot.stats is None
+
+    bot = ReversiBot(state.turn)
+    bot.collect_stats = True
+    bot.profile_dir = str(tmp_path)
+    move = bot.make_move(state)
+    stats = bot.stats
+    assert stats.move == move and stats.source == 'search'
+    assert stats.nodes > 0 and stats.depth == len(stats.iterations) > 0
+    assert stats.iterations[-1][0] == stats.depth
+    assert stats.cutoffs == sum(stats.cutoff_index) > 0
+    assert 1 < stats.branching_factor() < 20
+    assert 0 < stats.tt_hit_rate() <= 1
+    assert (tmp_path / 'move_001.prof').exists()
+
+
+def test_mcts_stats():
+    bot = MonteCarloReversiBot(1, playouts=100)
+    bot.collect_stats = True
+    bot.make_move(bitboard.BitboardState.from_board(initial_board(), 1))
+    assert bot.stats.source == 'mcts'
+    assert bot.stats.playouts >= 100 and bot.stats.tree_size > 1
+    assert bot.stats.to_dict()['playouts'] == bot.stats.playouts
+
+
+def test_probcut_that_never_cuts_matches_search():
+    from probcut import ProbCut, STAGES
+    state = bitboard.as_bitboard(midgame_state(None)).with_hash()
+    plain = ReversiBot(state.turn)
+    bot = ReversiBot(state.turn)
+    checks = [{'depth': depth, 'shallow': depth - 2, 'stage': stage, 'a': 1.0, 'b': 0.0, 'sigma': 10.0}
+              for depth in (2, 3) for stage in range(STAGES)]
+    bot.probcut = ProbCut(checks, threshold=1e6)
+    moves = plain.order_root_moves(state)
+    for depth in range(4):
+        assert bot.search_root(state, list(moves), depth)[1] == plain.search_root(state, list(moves), depth)[1]
+
+
+def test_selective_search_is_off_by_default_and_prunes_when_on():
+    from probcut import ProbCut, STAGES
+    from search_stats import SearchStats
+    state = bitboard.as_bitboard(midgame_state(None)).with_hash()
+    plain = ReversiBot(state.turn)
+    assert plain.probcut is None and not plain.lmr
+    moves = plain.order_root_moves(state)
+    plain.search_root(state, list(moves), 4)
+
+    bot = ReversiBot(state.turn)
+    bot.stats = SearchStats()
+    bot.lmr = True
+    bot.probcut = ProbCut([{'depth': 3, 'shallow': 1, 'stage': stage, 'a': 1.0, 'b': 0.0, 'sigma': 0.0}
+                           for stage in range(STAGES)])
+    move, _ = bot.search_root(state, list(moves), 4)
+    assert move in moves
+    assert bot.nodes < plain.nodes
+    assert bot.stats.probcut_cuts > 0
+    assert bot.stats.lmr_reductions > 0
@@ -0,0 +1,42 @@
+class SearchTimeout(Exception):
+    '''Raised inside a search when the move's hard deadline has passed.'''
+    pass
+
+
+class TimeManager:
+    '''
+    Decides how many seconds a single move may take given the time left on
+    our clock and the number of empty squares.
+
+    The remaining time is split evenly over the moves we still expect to
+    make (about half the empties, plus a small reserve), with a bonus for
+    the midgame where extra depth matters most. A fixed safety margin is
+    never touched so that network latency and the server's own sleeps
+    can't make us flag.
+    '''
+    def __init__(self, safety_margin=1.0, min_budget=0.02, max_fraction=0.15,
+                 reserve_moves=3, midgame_factor=1.5):
+        self.safety_margin = safety_margin
+        self.min_budget = min_budget
+        self.max_fraction = max_fraction
+        self.reserve_moves = reserve_moves
+        self.midgame_factor = midgame_factor
+
+    def budget(self, time_left, empties):
+        usable = time_left - self.safety_margin
+        if usable <= self.min_budget:
+            return self.min_budget
+
+        moves_left = max(empties // 2, 1) + self.reserve_moves
+        budget = usable / moves_left
+        if 20 <= empties <= 44:
+            budget *= self.midgame_factor
+
+        return max(self.min_budget, min(budget, usable * self.max_fraction))
+
+    def should_start_iteration(self, elapsed, last_iteration, budget, growth=4.0):
+        '''
+        Returns True if another, deeper iteration is likely to finish in
+        time. Each extra ply costs roughly "growth" times the last one.
+        '''
+        return elapsed + last_iteration * growth < budget
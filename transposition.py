@@ -0,0 +1,47 @@
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+class TranspositionTable:
+    '''
+    Fixed-size hash table of search results keyed by Zobrist hash.
+
+    Each slot holds the full key (to detect index collisions) and an entry
+    tuple of (depth, bound, score, best_square, generation). The table never
+    grows: a new result replaces the slot's entry if the slot is empty, holds
+    the same position, was written during an earlier move, or was searched
+    no deeper than the new result.
+    '''
+    def __init__(self, size_bits=17):
+        self.size = 1 << size_bits
+        self.mask = self.size - 1
+        self.keys = [None] * self.size
+        self.entries = [None] * self.size
+        self.generation = 0
+        self.probes = 0
+        self.hits = 0
+
+    def new_search(self):
+        '''Marks existing entries as old so fresh results can replace them.'''
+        self.generation = (self.generation + 1) & 0xFF
+
+    def probe(self, key):
+        self.probes += 1
+        index = key & self.mask
+        if self.keys[index] == key:
+            self.hits += 1
+            return self.entries[index]
+        return None
+
+    def store(self, key, depth, bound, score, best_square):
+        index = key & self.mask
+        entry = self.entries[index]
+        if entry is None or self.keys[index] == key or \
+                entry[4] != self.generation or depth >= entry[0]:
+            self.keys[index] = key
+            self.entries[index] = (depth, bound, score, best_square, self.generation)
+
+    def clear(self):
+        self.keys = [None] * self.size
+        self.entries = [None] * self.size
+        self.probes = 0
+        self.hits = 0